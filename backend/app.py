@@ -1,14 +1,27 @@
 # app.py
 import os
 
+from cli import register_commands
 from config import Config
 from flask import Flask
 from flask import jsonify
 from flask_cors import CORS
 
 from routes.book_routes import book_bp
+from routes.etag import make_etag
+from routes.export_routes import export_bp
+from routes.etag import not_modified
+from routes.etag import with_etag
 from routes.loan_routes import loan_bp
 from routes.member_routes import member_bp
+from routes.metrics_routes import metrics_bp
+from routes.pagination import NEXT_CURSOR_HEADER
+from routes.profiling_routes import PROFILE_DUMP_HEADER
+from routes.profiling_routes import PROFILE_TOP_HEADER
+from routes.profiling_routes import profiling_bp
+from routes.tracing_routes import TRACE_ID_HEADER
+from routes.tracing_routes import trace_views
+from routes.tracing_routes import tracing_bp
 
 
 def create_app(config_class=Config):
@@ -16,56 +29,53 @@ def create_app(config_class=Config):
     app.config.from_object(config_class)
 
     # Extensions
-    CORS(app)
+    CORS(app, expose_headers=[NEXT_CURSOR_HEADER, TRACE_ID_HEADER,
+                              PROFILE_TOP_HEADER, PROFILE_DUMP_HEADER])
 
-    # Register blueprints
+    # Register blueprints. Profiling comes first, so that its hooks wrap
+    # those of the others.
+    app.register_blueprint(profiling_bp, url_prefix='/api/debug/profiles')
     app.register_blueprint(book_bp, url_prefix='/api/books')
     app.register_blueprint(member_bp, url_prefix='/api/members')
     app.register_blueprint(loan_bp, url_prefix='/api/loans')
+    app.register_blueprint(export_bp, url_prefix='/api/export')
+    app.register_blueprint(metrics_bp, url_prefix='/api/metrics')
+    app.register_blueprint(tracing_bp, url_prefix='/api/debug/traces')
+
+    # Maintenance commands (flask reconcile-stats, ...)
+    register_commands(app)
 
     @app.route('/api/health')
     def health_check():
         return jsonify({"status": "ok"})
 
+    @app.route('/api/cache')
+    def get_cache():
+        from services.cache import get_cache_stats
+
+        return jsonify(get_cache_stats())
+
     @app.route('/api/stats')
     def get_stats():
-        from models import db
-        from models.book import COLLECTION_NAME as BOOK_COLLECTION
-        from models.member import COLLECTION_NAME as MEMBER_COLLECTION
-        from models.loan import COLLECTION_NAME as LOAN_COLLECTION
-
-        # Mode test pour éviter les erreurs Firestore
-        if os.environ.get('TESTING', 'False').lower() == 'true':
-            return jsonify({
-                "totalBooks": 0,
-                "availableBooks": 0,
-                "totalMembers": 0,
-                "activeLoans": 0
-            })
-
-        total_books = len(list(db.collection(BOOK_COLLECTION).stream()))
-        available_books = len(
-            list(
-                db.collection(BOOK_COLLECTION)
-                .where('is_available', '==', True)
-                .stream()
-            )
-        )
-        total_members = len(list(db.collection(MEMBER_COLLECTION).stream()))
-        active_loans = len(
-            list(
-                db.collection(LOAN_COLLECTION)
-                .where('returned', '==', False)
-                .stream()
-            )
-        )
-
-        return jsonify({
-            "totalBooks": total_books,
-            "availableBooks": available_books,
-            "totalMembers": total_members,
-            "activeLoans": active_loans
-        })
+        from services.stats_service import get_library_stats
+
+        stats = get_library_stats()
+
+        etag = make_etag(*stats.values())
+        response = not_modified(etag)
+        if response:
+            return response
+
+        return with_etag(jsonify({
+            "totalBooks": stats['total_books'],
+            "availableBooks": stats['available_books'],
+            "totalMembers": stats['total_members'],
+            "activeLoans": stats['active_loans'],
+            "overdueLoans": stats['overdue_loans']
+        }), etag)
+
+    # Route handlers appear as spans of the request traces
+    trace_views(app)
 
     return app
 
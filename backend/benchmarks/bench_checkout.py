@@ -0,0 +1,140 @@
+"""Compare loan checkout paths on the in-memory store with simulated latency.
+
+Every Firestore RPC (document get, batched get, direct write, batch commit)
+sleeps for --rtt milliseconds, so the timings reflect the number of
+sequential round trips of each path. The race run then lets --threads
+workers check out the same copy at once and counts the loans created.
+
+Usage: TESTING=true python -m benchmarks.bench_checkout [--rtt 10]
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from models import db
+from models import memory
+
+from models.book import COLLECTION_NAME as BOOK_COLLECTION
+from models.loan import COLLECTION_NAME as LOAN_COLLECTION
+from models.loan import Loan
+
+from services.book_service import create_new_book
+from services.loan_service import LoanError
+from services.loan_service import create_new_loan
+from services.member_service import create_new_member
+from services.stats_service import increment_counters
+
+
+def add_latency(rtt):
+    """Make each storage RPC sleep for one round trip."""
+    def rpc(method):
+        def wrapper(*args, **kwargs):
+            time.sleep(rtt)
+            return method(*args, **kwargs)
+        return wrapper
+
+    for cls, names in [
+        (memory.DocumentReference, ['get', 'set', 'update']),
+        (memory.MemoryClient, ['get_all']),
+        (memory.WriteBatch, ['commit']),
+    ]:
+        for name in names:
+            setattr(cls, name, rpc(getattr(cls, name)))
+
+
+def sequential_checkout(book_id, member_id):
+    """Checkout as it was first written: read, set, then update."""
+    book_ref = db.collection(BOOK_COLLECTION).document(book_id)
+    if not book_ref.get().to_dict().get('is_available'):
+        raise LoanError("Ce livre n'est pas disponible")
+
+    loan = Loan(book_id=book_id, member_id=member_id, returned=False)
+    doc_ref = db.collection(LOAN_COLLECTION).document()
+    doc_ref.set(loan.to_dict())
+    book_ref.update({
+        'is_available': False,
+        'updated_at': datetime.utcnow().isoformat()
+    })
+    loan.id = doc_ref.id
+    return loan
+
+
+def batched_checkout(book_id, member_id):
+    """Checkout with the book read and one unconditional batch."""
+    book_ref = db.collection(BOOK_COLLECTION).document(book_id)
+    if not book_ref.get().to_dict().get('is_available'):
+        raise LoanError("Ce livre n'est pas disponible")
+
+    loan = Loan(book_id=book_id, member_id=member_id, returned=False)
+    doc_ref = db.collection(LOAN_COLLECTION).document()
+    batch = db.batch()
+    batch.set(doc_ref, loan.to_dict())
+    batch.update(book_ref, {
+        'is_available': False,
+        'updated_at': datetime.utcnow().isoformat()
+    })
+    increment_counters(batch, active_loans=1, available_books=-1)
+    batch.commit()
+    loan.id = doc_ref.id
+    return loan
+
+
+PATHS = {
+    'sequential': sequential_checkout,
+    'batched': batched_checkout,
+    'conditional': create_new_loan,
+}
+
+
+def make_book():
+    book = create_new_book(title='Bench', author='Bench')
+    return book.id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rtt', type=float, default=10.0,
+                        help="Simulated round trip, in milliseconds.")
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--threads', type=int, default=16)
+    args = parser.parse_args()
+
+    member_id = create_new_member(
+        first_name='Bench', last_name='Bench', email='bench@example.com'
+    ).id
+    add_latency(args.rtt / 1000)
+
+    for label, checkout in PATHS.items():
+        samples = []
+        for _ in range(args.repeat):
+            book_id = make_book()
+            start = time.perf_counter()
+            checkout(book_id, member_id)
+            samples.append((time.perf_counter() - start) * 1000)
+        samples.sort()
+        print(
+            f"{label:12} p50={statistics.median(samples):.1f}ms "
+            f"p95={samples[int(len(samples) * 0.95) - 1]:.1f}ms"
+        )
+
+    for label, checkout in PATHS.items():
+        book_id = make_book()
+
+        def attempt(_):
+            try:
+                return checkout(book_id, member_id)
+            except LoanError:
+                return None
+
+        with ThreadPoolExecutor(max_workers=args.threads) as executor:
+            loans = [loan for loan in executor.map(attempt,
+                                                   range(args.threads))
+                     if loan]
+        print(f"{label:12} race: {len(loans)} loan(s) of one copy "
+              f"by {args.threads} concurrent checkouts")
+
+
+if __name__ == '__main__':
+    main()
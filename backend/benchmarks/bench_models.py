@@ -0,0 +1,138 @@
+"""Measure per-row cost and memory of decoding and serializing book lists.
+
+Compares the slotted Book, decoded by from_dict() and serialized by
+to_response(), with the dict-backed model it replaced, serialized the way
+the routes used to: {**book.to_dict(), 'id': book.id}.
+
+Usage: TESTING=true python -m benchmarks.bench_models [--rows 1000000]
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+from datetime import datetime
+
+from models.book import Book
+
+# Distinct source documents, cycled so the input stays small
+POOL_SIZE = 1000
+
+
+class DictBook:
+    """The Book model before __slots__ and to_response()."""
+
+    def __init__(self, id=None, title=None, author=None, isbn=None,
+                 publication_year=None, category=None, description=None,
+                 is_available=True, created_at=None, updated_at=None):
+        self.id = id
+        self.title = title
+        self.author = author
+        self.isbn = isbn
+        self.publication_year = publication_year
+        self.category = category
+        self.description = description
+        self.is_available = is_available
+        self.created_at = created_at or datetime.utcnow()
+        self.updated_at = updated_at or datetime.utcnow()
+
+    @staticmethod
+    def from_dict(source, id=None):
+        book = DictBook(
+            id=id,
+            title=source.get('title'),
+            author=source.get('author'),
+            isbn=source.get('isbn'),
+            publication_year=source.get('publication_year'),
+            category=source.get('category'),
+            description=source.get('description'),
+            is_available=source.get('is_available', True),
+            created_at=source.get('created_at'),
+            updated_at=source.get('updated_at')
+        )
+        if 'created_at' in source and isinstance(source['created_at'], str):
+            book.created_at = datetime.fromisoformat(source['created_at'])
+        if 'updated_at' in source and isinstance(source['updated_at'], str):
+            book.updated_at = datetime.fromisoformat(source['updated_at'])
+        return book
+
+    def to_dict(self):
+        return {
+            'title': self.title,
+            'author': self.author,
+            'isbn': self.isbn,
+            'publication_year': self.publication_year,
+            'category': self.category,
+            'description': self.description,
+            'is_available': self.is_available,
+            'created_at': (
+                self.created_at.isoformat()
+                if isinstance(self.created_at, datetime)
+                else self.created_at
+            ),
+            'updated_at': (
+                self.updated_at.isoformat()
+                if isinstance(self.updated_at, datetime)
+                else self.updated_at
+            )
+        }
+
+
+def make_sources():
+    now = datetime(2025, 1, 1, 12, 30)
+    book = Book(title='Titre', author='Auteur', isbn='978-2-07-036822-8',
+                publication_year=1999, category='Roman',
+                description='Description', created_at=now, updated_at=now)
+    return [(book.to_dict(), f"doc{index}") for index in range(POOL_SIZE)]
+
+
+def decode(cls, sources, rows):
+    from_dict = cls.from_dict
+    return [
+        from_dict(*sources[index % POOL_SIZE]) for index in range(rows)
+    ]
+
+
+def measure(label, cls, sources, rows, encode):
+    # Collections triggered by a million new objects would dominate
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        books = decode(cls, sources, rows)
+        decoded = time.perf_counter()
+        for book in books:
+            encode(book)
+        encoded = time.perf_counter()
+        del books
+
+        # Memory is traced on a second pass: tracing slows allocations down
+        tracemalloc.start()
+        books = decode(cls, sources, rows)
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del books
+    finally:
+        gc.enable()
+
+    per_row = 1e9 / rows
+    print(
+        f"{label:7} from_dict={(decoded - start) * per_row:5.0f}ns "
+        f"encode={(encoded - decoded) * per_row:5.0f}ns "
+        f"memory={memory / rows:4.0f}B/row"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1000000)
+    args = parser.parse_args()
+
+    sources = make_sources()
+    measure('before', DictBook, sources, args.rows,
+            lambda book: {**book.to_dict(), 'id': book.id})
+    measure('after', Book, sources, args.rows,
+            lambda book: book.to_response())
+
+
+if __name__ == '__main__':
+    main()
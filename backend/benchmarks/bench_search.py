@@ -0,0 +1,70 @@
+"""Measure book search latency on a synthetic catalog.
+
+Usage: TESTING=true python -m benchmarks.bench_search [--books 500000]
+"""
+import argparse
+import random
+import statistics
+import time
+
+from services.search_service import BookSearchIndex
+
+WORDS = [
+    'amour', 'guerre', 'paix', 'nuit', 'jour', 'mer', 'ciel', 'terre',
+    'prince', 'roi', 'reine', 'ville', 'jardin', 'secret', 'histoire',
+    'voyage', 'ombre', 'lumiere', 'temps', 'monde', 'chemin', 'maison',
+    'silence', 'memoire', 'etoile', 'hiver', 'printemps', 'ete', 'automne',
+    'riviere', 'montagne', 'foret', 'desert', 'ile', 'port', 'train',
+]
+CATEGORIES = ['Roman', 'Poésie', 'Essai', 'Histoire', 'Science', 'Jeunesse']
+
+
+def make_catalog(count, seed=42):
+    rng = random.Random(seed)
+    surnames = [f"auteur{i}" for i in range(count // 20 + 1)]
+    for index in range(count):
+        title = ' '.join(rng.sample(WORDS, rng.randint(2, 5)))
+        yield f"book{index}", {
+            'title': f"{title} {index}",
+            'author': rng.choice(surnames),
+            'category': rng.choice(CATEGORIES),
+            'isbn': f"978-2-{index:07d}-{rng.randint(0, 9)}",
+        }
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--books', type=int, default=500000)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    index = BookSearchIndex()
+    start = time.perf_counter()
+    for book_id, fields in make_catalog(args.books):
+        index.add(book_id, fields)
+    print(f"build: {args.books} books in {time.perf_counter() - start:.1f}s")
+
+    queries = {
+        'selective word': f"{args.books - 1}",
+        'author': 'auteur123',
+        'isbn prefix': '978-2-00012',
+        'two words': 'prince etoile',
+        'common word': 'nuit',
+    }
+    for label, query in queries.items():
+        samples = [timed(index.search, query, 20) for _ in range(args.repeat)]
+        samples.sort()
+        print(
+            f"{label:15} p50={statistics.median(samples):.3f}ms "
+            f"p95={samples[int(len(samples) * 0.95) - 1]:.3f}ms"
+        )
+
+
+if __name__ == '__main__':
+    main()
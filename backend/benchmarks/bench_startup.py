@@ -0,0 +1,72 @@
+"""Measure the cold start of the app: import time and first requests.
+
+Each sample runs in a fresh interpreter, which imports app.py and serves
+--path twice through the test client. The first request pays for the
+storage client creation, the second one shows the steady state. With
+--budget-ms, exits with status 1 when the median import plus first
+request exceeds the budget, so CI can hold a cold-start budget.
+
+Usage: TESTING=true python -m benchmarks.bench_startup [--budget-ms 800]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+SAMPLE = """
+import json, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+client = app.app.test_client()
+status = client.get({path!r}).status_code
+first = time.perf_counter()
+client.get({path!r})
+second = time.perf_counter()
+print(json.dumps({{
+    'import': (imported - start) * 1000,
+    'first_request': (first - imported) * 1000,
+    'second_request': (second - first) * 1000,
+    'status': status,
+}}))
+"""
+
+
+def sample(path):
+    output = subprocess.run(
+        [sys.executable, '-c', SAMPLE.format(path=path)],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--path', default='/api/stats')
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--budget-ms', type=float, default=None,
+                        help="Maximum import + first request time.")
+    args = parser.parse_args()
+
+    samples = [sample(args.path) for _ in range(args.repeat)]
+    medians = {
+        name: statistics.median(item[name] for item in samples)
+        for name in ('import', 'first_request', 'second_request')
+    }
+    cold_start = medians['import'] + medians['first_request']
+    print(
+        f"GET {args.path} -> {samples[0]['status']}: "
+        f"import={medians['import']:.0f}ms "
+        f"first_request={medians['first_request']:.1f}ms "
+        f"second_request={medians['second_request']:.1f}ms "
+        f"cold_start={cold_start:.0f}ms"
+    )
+
+    if args.budget_ms is not None and cold_start > args.budget_ms:
+        print(f"Cold start over budget ({args.budget_ms:.0f}ms)")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
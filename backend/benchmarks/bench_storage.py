@@ -0,0 +1,112 @@
+"""Compare the in-memory and SQLite storage engines on the catalogue.
+
+Loads --books books through 500-write batches, then times the reads the
+routes issue: batched gets by ID, an availability filter, a keyset page
+ordered by title and a count. The SQLite database is created in a
+temporary directory.
+
+Usage: TESTING=true python -m benchmarks.bench_storage [--books 100000]
+"""
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from models import book
+from models.memory import MAX_BATCH_WRITES
+from models.memory import MemoryClient
+from models.sqlite import SqliteClient
+
+
+def make_documents(count):
+    rng = random.Random(42)
+    return [
+        (f'book{index:08d}', {
+            'title': f'Titre {rng.randrange(count):08d}',
+            'author': f'Auteur {rng.randrange(1000)}',
+            'isbn': f'978{index:010d}',
+            'publication_year': rng.randrange(1900, 2025),
+            'category': rng.choice(['Roman', 'Essai', 'Poésie']),
+            'is_available': rng.random() < 0.7,
+            'created_at': '2025-01-01T00:00:00',
+            'updated_at': '2025-01-01T00:00:00',
+        })
+        for index in range(count)
+    ]
+
+
+def load(client, documents):
+    books = client.collection(book.COLLECTION_NAME)
+    for start in range(0, len(documents), MAX_BATCH_WRITES):
+        batch = client.batch()
+        for doc_id, data in documents[start:start + MAX_BATCH_WRITES]:
+            batch.set(books.document(doc_id), data)
+        batch.commit()
+
+
+def timed(operation, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        operation()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def run(label, client, documents, repeat):
+    start = time.perf_counter()
+    load(client, documents)
+    loaded = time.perf_counter() - start
+
+    books = client.collection(book.COLLECTION_NAME)
+    rng = random.Random(7)
+    ids = [doc_id for doc_id, _ in documents]
+    page = books.order_by('title').limit(100)
+    middle = documents[len(documents) // 2][1]['title']
+
+    operations = {
+        'get_all(100)': lambda: client.get_all([
+            books.document(doc_id) for doc_id in rng.sample(ids, 100)
+        ]),
+        'available(100)': lambda: list(
+            books.where('is_available', '==', True).limit(100).stream()
+        ),
+        'title page': lambda: list(page.start_after(
+            {'title': middle, '__name__': ''}
+        ).stream()),
+        'count available': lambda: books.where(
+            'is_available', '==', True
+        ).count().get(),
+    }
+    results = ' '.join(
+        f"{name}={timed(operation, repeat):.2f}ms"
+        for name, operation in operations.items()
+    )
+    print(
+        f"{label:7} load={len(documents) / loaded:8.0f} docs/s {results}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--books', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    documents = make_documents(args.books)
+    indexes = {book.COLLECTION_NAME: book.INDEXES}
+    run('memory', MemoryClient(indexes=indexes), documents, args.repeat)
+
+    with tempfile.TemporaryDirectory() as directory:
+        client = SqliteClient(str(Path(directory) / 'bench.db'),
+                              indexes=indexes)
+        try:
+            run('sqlite', client, documents, args.repeat)
+        finally:
+            client.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+"""Synthetic library generator for the benchmarks.
+
+Writes books, members and loans with the models' own encoding, in
+500-write batches, into any storage client (the in-memory or SQLite
+engine). The data is deterministic for a given seed, with skewed
+distributions like a real library: a few authors write many books, a few
+books and members account for most loans, and recent loans are the ones
+still active (some of them overdue).
+
+Usage: python -m benchmarks.generator --books 100000 --sqlite library.db
+"""
+import argparse
+import itertools
+import random
+from datetime import datetime
+from datetime import timedelta
+
+from models.book import COLLECTION_NAME as BOOK_COLLECTION
+from models.book import Book
+from models.loan import COLLECTION_NAME as LOAN_COLLECTION
+from models.loan import Loan
+from models.member import COLLECTION_NAME as MEMBER_COLLECTION
+from models.member import Member
+from models.memory import MAX_BATCH_WRITES
+
+WORDS = [
+    'amour', 'guerre', 'paix', 'nuit', 'jour', 'mer', 'ciel', 'terre',
+    'prince', 'roi', 'reine', 'ville', 'jardin', 'secret', 'histoire',
+    'voyage', 'ombre', 'lumiere', 'temps', 'monde', 'chemin', 'maison',
+    'silence', 'memoire', 'etoile', 'hiver', 'printemps', 'ete', 'automne',
+    'riviere', 'montagne', 'foret', 'desert', 'ile', 'port', 'train',
+]
+FIRST_NAMES = [
+    'Camille', 'Louise', 'Jade', 'Alice', 'Chloé', 'Léa', 'Emma', 'Inès',
+    'Gabriel', 'Léo', 'Raphaël', 'Louis', 'Arthur', 'Jules', 'Adam', 'Hugo',
+]
+LAST_NAMES = [
+    'Martin', 'Bernard', 'Thomas', 'Petit', 'Robert', 'Richard', 'Durand',
+    'Dubois', 'Moreau', 'Laurent', 'Simon', 'Michel', 'Lefebvre', 'Leroy',
+]
+# Category: relative share of the catalogue
+CATEGORIES = {
+    'Roman': 40, 'Jeunesse': 20, 'Policier': 12, 'Histoire': 8,
+    'Essai': 8, 'Science': 6, 'Poésie': 4, 'Bande dessinée': 2,
+}
+
+LOAN_DAYS = 14
+# Loans span this period before the reference time
+HISTORY_DAYS = 365
+
+
+def zipf_weights(count, exponent=1.0):
+    """Cumulative weights of ranks 1..count under a Zipf law."""
+    return list(itertools.accumulate(
+        1 / (rank ** exponent) for rank in range(1, count + 1)
+    ))
+
+
+def _write(client, collection, documents):
+    reference = client.collection(collection)
+    documents = iter(documents)
+    while True:
+        chunk = list(itertools.islice(documents, MAX_BATCH_WRITES))
+        if not chunk:
+            return
+        batch = client.batch()
+        for doc_id, data in chunk:
+            batch.set(reference.document(doc_id), data)
+        batch.commit()
+
+
+def _books(rng, count, now, unavailable):
+    authors = [
+        f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {index}"
+        for index in range(max(count // 8, 1))
+    ]
+    author_weights = zipf_weights(len(authors))
+    categories = list(CATEGORIES)
+    category_weights = list(itertools.accumulate(CATEGORIES.values()))
+    for index in range(count):
+        doc_id = f'book{index:08d}'
+        created_at = now - timedelta(days=rng.uniform(0, 5 * 365))
+        yield doc_id, Book(
+            title=' '.join(rng.sample(WORDS, rng.randint(1, 4))).capitalize(),
+            author=rng.choices(authors, cum_weights=author_weights)[0],
+            isbn=f'978-2-{index:08d}-{rng.randint(0, 9)}',
+            # Most of the catalogue is recent
+            publication_year=int(rng.triangular(1900, 2025, 2020)),
+            category=rng.choices(categories,
+                                 cum_weights=category_weights)[0],
+            description=' '.join(rng.choices(WORDS, k=12)),
+            is_available=doc_id not in unavailable,
+            created_at=created_at,
+            updated_at=created_at,
+        ).to_dict()
+
+
+def _members(rng, count, now):
+    for index in range(count):
+        first_name = rng.choice(FIRST_NAMES)
+        last_name = rng.choice(LAST_NAMES)
+        created_at = now - timedelta(days=rng.uniform(0, 3 * 365))
+        yield f'member{index:08d}', Member(
+            first_name=first_name,
+            last_name=last_name,
+            email=f'{first_name.lower()}.{last_name.lower()}.{index}'
+                  f'@example.com',
+            phone=f'06{rng.randint(0, 99999999):08d}',
+            address=f'{rng.randint(1, 200)} rue {rng.choice(WORDS)}',
+            created_at=created_at,
+            updated_at=created_at,
+        ).to_dict()
+
+
+def _loans(rng, count, now, book_ids, member_ids):
+    """Loans in chronological order; a book has at most one active loan."""
+    books = rng.choices(book_ids, cum_weights=zipf_weights(len(book_ids)),
+                        k=count)
+    members = rng.choices(member_ids,
+                          cum_weights=zipf_weights(len(member_ids)), k=count)
+    ages = sorted((rng.uniform(0, HISTORY_DAYS) for _ in range(count)),
+                  reverse=True)
+    active = {}
+    loans = []
+    for index, (book_id, member_id, age) in enumerate(
+        zip(books, members, ages)
+    ):
+        loan_date = now - timedelta(days=age)
+        previous = active.get(book_id)
+        if previous is not None:
+            # The previous borrower returned the book before this loan
+            previous.returned = True
+            previous.return_date = loan_date
+        loan = Loan(
+            id=f'loan{index:08d}', book_id=book_id, member_id=member_id,
+            loan_date=loan_date,
+            due_date=loan_date + timedelta(days=LOAN_DAYS),
+        )
+        # Most loans come back before they are due, a few much later
+        kept = rng.expovariate(1 / (LOAN_DAYS * 0.8))
+        if kept < age:
+            loan.returned = True
+            loan.return_date = loan_date + timedelta(days=kept)
+            active.pop(book_id, None)
+        else:
+            active[book_id] = loan
+        loans.append(loan)
+    return loans, active
+
+
+def generate_library(client, books, members, loans, seed=42, now=None):
+    """Write a synthetic library; returns the IDs the benchmarks need."""
+    rng = random.Random(seed)
+    now = now or datetime.utcnow()
+    book_ids = [f'book{index:08d}' for index in range(books)]
+    member_ids = [f'member{index:08d}' for index in range(members)]
+
+    loan_objects, active = _loans(rng, loans, now, book_ids, member_ids)
+    _write(client, BOOK_COLLECTION, _books(rng, books, now, active))
+    _write(client, MEMBER_COLLECTION, _members(rng, members, now))
+    _write(client, LOAN_COLLECTION, (
+        (loan.id, loan.to_dict(now=now)) for loan in loan_objects
+    ))
+    return {
+        'book_ids': book_ids,
+        'member_ids': member_ids,
+        'available_book_ids': [
+            book_id for book_id in book_ids if book_id not in active
+        ],
+        'active_loan_ids': [loan.id for loan in active.values()],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--books', type=int, default=100000)
+    parser.add_argument('--members', type=int, default=None,
+                        help="Defaults to a tenth of the books.")
+    parser.add_argument('--loans', type=int, default=None,
+                        help="Defaults to the number of books.")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--sqlite', required=True,
+                        help="SQLite database to fill.")
+    args = parser.parse_args()
+
+    from models import indexes
+    from models.sqlite import SqliteClient
+
+    client = SqliteClient(args.sqlite, indexes=indexes)
+    try:
+        library = generate_library(
+            client, args.books,
+            args.members or max(args.books // 10, 1),
+            args.loans if args.loans is not None else args.books,
+            seed=args.seed,
+        )
+    finally:
+        client.close()
+    print(f"{args.books} books, {len(library['member_ids'])} members, "
+          f"{len(library['active_loan_ids'])} active loans")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,27 @@
+"""The API app with simulated storage latency, served by the load test.
+
+Every storage RPC of the SQLite engine (document reads, queries, counts
+and commits) sleeps for LOAD_TEST_RTT_MS milliseconds first, like a
+Firestore round trip, so that the load test shows how workers and threads
+overlap the time spent waiting on storage.
+"""
+import os
+import time
+
+from models import sqlite
+
+from app import app  # noqa: F401
+
+RTT = float(os.environ.get('LOAD_TEST_RTT_MS', 0)) / 1000
+
+
+def _rpc(method):
+    def wrapper(*args, **kwargs):
+        time.sleep(RTT)
+        return method(*args, **kwargs)
+    return wrapper
+
+
+for _name in ['_snapshots', '_run_query', '_count', '_commit']:
+    setattr(sqlite.SqliteClient, _name,
+            _rpc(getattr(sqlite.SqliteClient, _name)))
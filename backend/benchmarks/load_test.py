@@ -0,0 +1,186 @@
+"""Load test of the API server under gunicorn worker/thread profiles.
+
+For each WORKERSxTHREADS profile, starts gunicorn with gunicorn.conf.py on
+a SQLite database holding a synthetic library of --books books, then
+lets --concurrency client threads send keep-alive requests for
+--duration seconds (book pages, single books and stats). Reports
+throughput and latency per profile. --rtt-ms adds a simulated round trip
+to every storage RPC (see benchmarks/latency_app.py), as with Firestore.
+With --url, only drives an already running server.
+
+Usage: python -m benchmarks.load_test [--profiles 1x1,1x8,2x8] [--rtt-ms 20]
+"""
+import argparse
+import http.client
+import itertools
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from benchmarks.generator import generate_library
+from models import indexes
+from models.sqlite import SqliteClient
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def seed(path, count):
+    client = SqliteClient(path, indexes=indexes)
+    try:
+        library = generate_library(client, books=count,
+                                   members=max(count // 10, 1), loans=count)
+    finally:
+        client.close()
+    return library['book_ids']
+
+
+def request_paths(ids):
+    return ['/api/books?limit=20', '/api/stats'] + [
+        f'/api/books/{doc_id}' for doc_id in ids[:100]
+    ]
+
+
+def drive(url, paths, concurrency, duration):
+    """Send requests from `concurrency` threads; return the latencies."""
+    target = urlsplit(url)
+    deadline = time.perf_counter() + duration
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def client(offset):
+        connection = http.client.HTTPConnection(target.hostname, target.port)
+        samples, failures = [], 0
+        # Each client starts at a different place of the path rotation
+        for path in itertools.cycle(paths[offset:] + paths[:offset]):
+            if time.perf_counter() >= deadline:
+                break
+            start = time.perf_counter()
+            try:
+                connection.request('GET', path)
+                response = connection.getresponse()
+                response.read()
+                if response.status >= 500:
+                    failures += 1
+            except (OSError, http.client.HTTPException):
+                failures += 1
+                connection.close()
+                connection = http.client.HTTPConnection(
+                    target.hostname, target.port
+                )
+            samples.append(time.perf_counter() - start)
+        connection.close()
+        with lock:
+            latencies.extend(samples)
+            errors.append(failures)
+
+    threads = [
+        threading.Thread(target=client, args=(index,))
+        for index in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, sum(errors)
+
+
+def report(label, latencies, errors, duration):
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1] if latencies else 0
+    print(
+        f"{label:8} {len(latencies) / duration:8.0f} req/s "
+        f"p50={statistics.median(latencies) * 1000 if latencies else 0:.1f}ms "
+        f"p99={p99 * 1000:.1f}ms errors={errors}"
+    )
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(url, timeout=30):
+    target = urlsplit(url)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection(
+                target.hostname, target.port, timeout=1
+            )
+            connection.request('GET', '/api/health')
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server at {url} did not start")
+
+
+def run_profile(profile, database, paths, args):
+    workers, threads = profile.split('x')
+    port = free_port()
+    env = {
+        key: value for key, value in os.environ.items() if key != 'TESTING'
+    }
+    env.update({
+        'STORAGE_BACKEND': 'sqlite',
+        'SQLITE_PATH': database,
+        'GUNICORN_ACCESS_LOG': '',
+        'LOAD_TEST_RTT_MS': str(args.rtt_ms),
+    })
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py',
+         '--workers', workers, '--threads', threads,
+         '--bind', f'127.0.0.1:{port}', 'benchmarks.latency_app:app'],
+        cwd=BACKEND_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        url = f'http://127.0.0.1:{port}'
+        wait_until_ready(url)
+        # Warm the workers' clients and caches before measuring
+        drive(url, paths, args.concurrency, 1)
+        latencies, errors = drive(url, paths, args.concurrency,
+                                  args.duration)
+        report(profile, latencies, errors, args.duration)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--profiles', default='1x1,1x8,2x1,2x8',
+                        help="Comma-separated WORKERSxTHREADS profiles.")
+    parser.add_argument('--url', help="Drive this server instead.")
+    parser.add_argument('--books', type=int, default=10000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--rtt-ms', type=float, default=0.0,
+                        help="Simulated storage round trip.")
+    args = parser.parse_args()
+
+    if args.url:
+        paths = ['/api/books?limit=20', '/api/stats', '/api/health']
+        latencies, errors = drive(args.url, paths, args.concurrency,
+                                  args.duration)
+        report('server', latencies, errors, args.duration)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        database = str(Path(directory) / 'load.db')
+        paths = request_paths(seed(database, args.books))
+        print(f"{os.cpu_count()} CPU(s), {args.concurrency} clients")
+        for profile in args.profiles.split(','):
+            run_profile(profile, database, paths, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,240 @@
+"""Benchmark suite of the API endpoints on a synthetic library.
+
+Generates a library at the chosen scale (see benchmarks/generator.py) in
+the local storage engine, then sends --requests requests to each
+endpoint scenario through create_app()'s test client: lists, single
+documents, creations, updates, checkouts, returns, search and stats.
+Records the throughput and p50/p95/p99 latency of each scenario and
+saves them as JSON.
+
+With a baseline (benchmarks/baselines/<scale>.json by default), exits
+with status 1 when a scenario's p95 latency grew, or its throughput fell,
+by more than --tolerance; --save-baseline replaces the baseline with this
+run. Baselines are only comparable on the machine that recorded them.
+
+Usage: TESTING=true python -m benchmarks.suite [--scale 10k]
+       [--output results.json] [--save-baseline]
+"""
+import argparse
+import itertools
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+from benchmarks.generator import generate_library
+
+BASELINE_DIR = Path(__file__).resolve().parent / 'baselines'
+
+# Books at each scale; members are a tenth of them, loans as many
+SCALES = {
+    '10k': 10000,
+    '100k': 100000,
+    '1m': 1000000,
+}
+
+# Queries of the search scenario: a word, two words and a prefix
+SEARCHES = ['prince', 'nuit%20mer', 'print']
+
+# Requests sent to a scenario before it is measured
+WARMUP_REQUESTS = 20
+
+
+def _json(client, method, path, body=None):
+    return client.open(path, method=method, json=body)
+
+
+def scenarios(library, rng):
+    """Endpoint scenarios: name -> (expected status, request function)."""
+    book_ids = library['book_ids']
+    member_ids = library['member_ids']
+    available = library['available_book_ids']
+    active = library['active_loan_ids']
+    counter = itertools.count()
+
+    def checkout(client):
+        # Available books are taken from the end: each one is lent once
+        response = _json(client, 'POST', '/api/loans', {
+            'book_id': available.pop(),
+            'member_id': rng.choice(member_ids),
+        })
+        if response.status_code == 201:
+            active.append(response.get_json()['id'])
+        return response
+
+    def return_loan(client):
+        return _json(client, 'PUT', f'/api/loans/{active.pop()}/return')
+
+    return {
+        'list_books': (200, lambda client: client.get(
+            '/api/books?limit=50&sort=title'
+        )),
+        'list_members': (200, lambda client: client.get(
+            '/api/members?limit=50'
+        )),
+        'list_active_loans': (200, lambda client: client.get(
+            '/api/loans?status=active&limit=50&expand=book,member'
+        )),
+        'get_book': (200, lambda client: client.get(
+            f'/api/books/{rng.choice(book_ids)}'
+        )),
+        'get_member': (200, lambda client: client.get(
+            f'/api/members/{rng.choice(member_ids)}'
+        )),
+        'search_books': (200, lambda client: client.get(
+            f"/api/books/search?q={rng.choice(SEARCHES)}"
+        )),
+        'create_book': (201, lambda client: _json(
+            client, 'POST', '/api/books', {
+                'title': f'Benchmark {next(counter)}', 'author': 'Benchmark',
+            }
+        )),
+        'update_book': (200, lambda client: _json(
+            client, 'PUT', f'/api/books/{rng.choice(book_ids)}',
+            {'description': f'Mise à jour {next(counter)}'}
+        )),
+        'create_member': (201, lambda client: _json(
+            client, 'POST', '/api/members', {
+                'first_name': 'Benchmark', 'last_name': 'Benchmark',
+                'email': f'benchmark{next(counter)}@example.com',
+            }
+        )),
+        'checkout': (201, checkout),
+        'return': (200, return_loan),
+        'stats': (200, lambda client: client.get('/api/stats')),
+    }
+
+
+def measure(client, expected, send, count):
+    for _ in range(WARMUP_REQUESTS):
+        send(client)
+
+    latencies, errors = [], 0
+    start = time.perf_counter()
+    for _ in range(count):
+        request_start = time.perf_counter()
+        response = send(client)
+        latencies.append((time.perf_counter() - request_start) * 1000)
+        if response.status_code != expected:
+            errors += 1
+    elapsed = time.perf_counter() - start
+
+    percentiles = statistics.quantiles(latencies, n=100)
+    return {
+        'requests': count,
+        'errors': errors,
+        'throughput': count / elapsed,
+        'p50_ms': percentiles[49],
+        'p95_ms': percentiles[94],
+        'p99_ms': percentiles[98],
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Regressions of this run against the baseline, as messages."""
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        if result['p95_ms'] > reference['p95_ms'] * (1 + tolerance):
+            regressions.append(
+                f"{name}: p95 {result['p95_ms']:.2f}ms "
+                f"> baseline {reference['p95_ms']:.2f}ms"
+            )
+        if result['throughput'] < reference['throughput'] * (1 - tolerance):
+            regressions.append(
+                f"{name}: {result['throughput']:.0f} req/s "
+                f"< baseline {reference['throughput']:.0f} req/s"
+            )
+        if result['errors'] > reference['errors']:
+            regressions.append(f"{name}: {result['errors']} error(s)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--scale', choices=SCALES, default='10k')
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--only', help="Comma-separated scenarios to run.")
+    parser.add_argument('--output', help="Write the results to this file.")
+    parser.add_argument('--baseline', help="Baseline file to compare to.")
+    parser.add_argument('--tolerance', type=float, default=0.3,
+                        help="Allowed relative regression (0.3 = 30%%).")
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--reset-storage', action='store_true',
+                        help="Allow erasing a SQLite database.")
+    args = parser.parse_args()
+
+    from app import create_app
+    from models import db
+    from models import storage_backend
+    from services.stats_service import reconcile_stats
+
+    if storage_backend == 'firestore':
+        sys.exit("The suite writes a synthetic library: run it on a local "
+                 "engine (TESTING=true or STORAGE_BACKEND=sqlite).")
+    if storage_backend == 'sqlite' and not args.reset_storage:
+        sys.exit("The suite erases the SQLite database first: pass "
+                 "--reset-storage to confirm.")
+
+    books = SCALES[args.scale]
+    counts = {'books': books, 'members': books // 10, 'loans': books}
+    start = time.perf_counter()
+    db.reset()
+    library = generate_library(db, seed=args.seed, **counts)
+    reconcile_stats()
+    print(f"{args.scale}: generated in {time.perf_counter() - start:.1f}s "
+          f"({len(library['active_loan_ids'])} active loans)")
+
+    client = create_app().test_client()
+    rng = random.Random(args.seed)
+    selected = args.only.split(',') if args.only else None
+    results = {}
+    for name, (expected, send) in scenarios(library, rng).items():
+        if selected and name not in selected:
+            continue
+        results[name] = result = measure(client, expected, send,
+                                         args.requests)
+        print(
+            f"{name:18} {result['throughput']:8.0f} req/s "
+            f"p50={result['p50_ms']:.2f}ms p95={result['p95_ms']:.2f}ms "
+            f"p99={result['p99_ms']:.2f}ms errors={result['errors']}"
+        )
+
+    report = {
+        'scale': args.scale,
+        'counts': counts,
+        'storage': storage_backend,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'date': datetime.utcnow().isoformat(),
+        'results': results,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2) + '\n')
+
+    baseline_path = Path(
+        args.baseline or BASELINE_DIR / f'{args.scale}.json'
+    )
+    if args.save_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(report, indent=2) + '\n')
+        print(f"Baseline saved to {baseline_path}")
+    elif baseline_path.exists():
+        baseline = json.loads(baseline_path.read_text())['results']
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regression against {baseline_path}")
+
+
+if __name__ == '__main__':
+    main()
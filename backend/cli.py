@@ -0,0 +1,78 @@
+import os
+
+import click
+
+from config import Config
+from services.export_service import EXPORTS
+from services.export_service import FORMATS as EXPORT_FORMATS
+from services.export_service import export_chunks
+from services.export_service import parse_since
+from services.import_service import FORMATS as IMPORT_FORMATS
+from services.import_service import import_books
+
+
+def register_commands(app):
+    @app.cli.command('reconcile-stats')
+    def reconcile_stats_command():
+        """Recompute the /api/stats counters from the collections."""
+        from services.stats_service import reconcile_stats
+
+        stats = reconcile_stats()
+        for field, value in stats.items():
+            click.echo(f"{field}: {value}")
+
+    @app.cli.command('sweep-overdue')
+    def sweep_overdue_command():
+        """Flag the loans that became overdue since the last sweep."""
+        from services.loan_service import sweep_overdue_loans
+
+        report = sweep_overdue_loans()
+        for field, value in report.items():
+            click.echo(f"{field}: {value}")
+
+    @app.cli.command('import-books')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--format', 'fmt', type=click.Choice(IMPORT_FORMATS),
+                  help="Defaults to the file extension.")
+    @click.option('--workers', default=Config.IMPORT_WORKERS,
+                  show_default=True, help="Concurrent write batches.")
+    def import_books_command(path, fmt, workers):
+        """Import books from a CSV or NDJSON file."""
+        fmt = fmt or os.path.splitext(path)[1].lstrip('.').lower()
+        if fmt not in IMPORT_FORMATS:
+            raise click.BadParameter(
+                f"cannot infer the format of {path}", param_hint='--format'
+            )
+
+        with open(path, encoding='utf-8-sig', newline='') as lines:
+            report = import_books(lines, fmt, workers=workers)
+
+        click.echo(f"imported: {report['imported']}")
+        for error in report['errors']:
+            click.echo(f"row {error['row']}: {error['error']}", err=True)
+        if report['errors']:
+            raise click.exceptions.Exit(1)
+
+    @app.cli.command('export')
+    @click.argument('collection', type=click.Choice(list(EXPORTS)))
+    @click.option('--format', 'fmt', type=click.Choice(EXPORT_FORMATS),
+                  default='ndjson', show_default=True)
+    @click.option('--since',
+                  help="Only export documents updated (loans: borrowed) "
+                       "at or after this ISO 8601 date.")
+    @click.option('--gzip', 'compress', is_flag=True,
+                  help="Compress the output with gzip.")
+    @click.option('--output', '-o', type=click.Path(dir_okay=False),
+                  help="Defaults to the standard output.")
+    def export_command(collection, fmt, since, compress, output):
+        """Export a collection as CSV or NDJSON."""
+        try:
+            since = parse_since(since)
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint='--since')
+
+        chunks = export_chunks(collection, fmt, since=since,
+                               compress=compress)
+        with click.open_file(output or '-', 'wb') as out:
+            for chunk in chunks:
+                out.write(chunk)
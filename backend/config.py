@@ -8,3 +8,70 @@ load_dotenv()
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-key-change-in-production'
     PROJECT_ID = os.environ.get('PROJECT_ID') or 'library-management-dev'
+
+    # Storage engine: 'firestore', 'sqlite' (on-premise) or 'memory'
+    STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'firestore').lower()
+    SQLITE_PATH = os.environ.get('SQLITE_PATH', 'library.db')
+    # Connect to storage in the background when a gunicorn worker starts,
+    # instead of on its first request
+    STORAGE_WARMUP = os.environ.get(
+        'STORAGE_WARMUP', 'false'
+    ).lower() == 'true'
+
+    # Pagination of the list endpoints
+    DEFAULT_PAGE_SIZE = int(os.environ.get('DEFAULT_PAGE_SIZE', 100))
+    MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE', 1000))
+
+    # Book search index; a refresh re-reads the books updated this many
+    # seconds before the previous one, to tolerate clock skew
+    SEARCH_RESULTS_LIMIT = int(os.environ.get('SEARCH_RESULTS_LIMIT', 20))
+    SEARCH_INDEX_REFRESH_SECONDS = int(
+        os.environ.get('SEARCH_INDEX_REFRESH_SECONDS', 5)
+    )
+    # Build the index when a gunicorn worker starts, instead of in its
+    # first search. Each build reads the whole books collection, so on
+    # Firestore a cold start would cost workers x books document reads:
+    # there it is off by default and only searching workers pay for it.
+    SEARCH_INDEX_WARMUP = os.environ.get(
+        'SEARCH_INDEX_WARMUP',
+        'false' if STORAGE_BACKEND == 'firestore' else 'true'
+    ).lower() == 'true'
+
+    # Read-through cache of single-document lookups (0 disables it)
+    CACHE_TTL_SECONDS = float(os.environ.get('CACHE_TTL_SECONDS', 10))
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 10000))
+
+    # Concurrent write batches of the bulk book import
+    IMPORT_WORKERS = int(os.environ.get('IMPORT_WORKERS', 4))
+
+    # Request and storage metrics served at /api/metrics. Under gunicorn,
+    # workers write their counters to METRICS_DIR every
+    # METRICS_FLUSH_SECONDS, and a scrape sums those of all workers.
+    METRICS_ENABLED = os.environ.get(
+        'METRICS_ENABLED', 'true'
+    ).lower() == 'true'
+    METRICS_DIR = os.environ.get('METRICS_DIR', '')
+    METRICS_FLUSH_SECONDS = float(os.environ.get('METRICS_FLUSH_SECONDS', 5))
+
+    # Per-request traces (route handler, service functions and storage
+    # calls), kept in a ring buffer served at /api/debug/traces and, if
+    # TRACING_FILE is set, appended to that file as NDJSON
+    TRACING_ENABLED = os.environ.get(
+        'TRACING_ENABLED', 'false'
+    ).lower() == 'true'
+    TRACING_BUFFER_SIZE = int(os.environ.get('TRACING_BUFFER_SIZE', 200))
+    TRACING_FILE = os.environ.get('TRACING_FILE', '')
+
+    # On-demand profiling: requests whose X-Profile header carries
+    # PROFILING_TOKEN get their top functions in X-Profile-Top, and a share
+    # PROFILING_SAMPLE_RATE (0 to 1) of all requests is profiled. Profiles
+    # are saved to PROFILING_DIR as pstats files when it is set.
+    PROFILING_TOKEN = os.environ.get('PROFILING_TOKEN', '')
+    PROFILING_SAMPLE_RATE = float(
+        os.environ.get('PROFILING_SAMPLE_RATE', 0)
+    )
+    PROFILING_DIR = os.environ.get('PROFILING_DIR', '')
+
+    # Token expected in the X-Cron-Token header of scheduled jobs
+    # (POST /api/loans/overdue/sweep); the endpoint is disabled without it
+    CRON_TOKEN = os.environ.get('CRON_TOKEN', '')
@@ -0,0 +1,96 @@
+"""Gunicorn settings of the API server.
+
+Requests mostly wait on storage round trips, so each worker process runs
+a pool of threads (gthread): one worker per available CPU, each serving
+GUNICORN_THREADS requests at once. The app is imported once in the master
+(preload_app) and shared by the forked workers; the storage client is not
+created before the fork, and each worker creates its own (see
+models.LazyClient).
+
+Every setting can be overridden from the environment, e.g. to select the
+gevent worker (GUNICORN_WORKER_CLASS=gevent, with gevent installed).
+"""
+import os
+import shutil
+import tempfile
+import threading
+
+
+def _cpu_count():
+    try:
+        # CPUs this container may run on, not the host's
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8080')}"
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.environ.get('WEB_CONCURRENCY', _cpu_count()))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+if worker_class == 'gevent':
+    worker_connections = int(os.environ.get('GUNICORN_CONNECTIONS', 1000))
+
+# The in-memory engine keeps its data in the process: workers would not
+# see each other's writes. The engine is resolved as the app does, which
+# also runs on memory when TESTING=true (no client is created here).
+from models import storage_backend  # noqa: E402
+
+if storage_backend == 'memory':
+    workers = 1
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+# Streamed exports can run for long: the timeout only bounds a stuck
+# worker, gthread workers keep notifying the master while serving
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Workers publish their metrics counters in this directory, so that
+# /api/metrics on any of them serves the sum (see services.metrics)
+_metrics_dir = None
+if not os.environ.get('METRICS_DIR'):
+    _metrics_dir = tempfile.mkdtemp(prefix='library-metrics-')
+    os.environ['METRICS_DIR'] = _metrics_dir
+
+# An empty GUNICORN_ACCESS_LOG disables the access log (for load tests)
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-') or None
+
+
+def on_starting(server):
+    # Counters of a previous run would be summed with the new workers'
+    from services import metrics
+
+    metrics.clear_process_files()
+
+
+def post_fork(server, worker):
+    # The client inherited from the master, if any, was dropped by
+    # LazyClient; optionally connect now rather than on the first request
+    from config import Config
+    from models import warmup
+    from services import metrics
+    from services.search_service import warmup_search_index
+
+    # Publish this worker's counters for /api/metrics scrapes
+    metrics.start_flusher()
+    if Config.STORAGE_WARMUP:
+        threading.Thread(target=warmup, name='storage-warmup',
+                         daemon=True).start()
+    if Config.SEARCH_INDEX_WARMUP:
+        threading.Thread(target=warmup_search_index,
+                         name='search-index-warmup', daemon=True).start()
+    server.log.info("Worker %s ready (%s, %s threads)",
+                    worker.pid, worker_class, threads)
+
+
+def worker_exit(server, worker):
+    from services import metrics
+
+    metrics.flush()
+
+
+def on_exit(server):
+    if _metrics_dir:
+        shutil.rmtree(_metrics_dir, ignore_errors=True)
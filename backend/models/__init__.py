@@ -1,109 +1,147 @@
 import os
-from google.cloud import firestore
+import threading
+
+from config import Config
+from models import book
+from models import loan
+from models import member
+from models.aio import StorageLoop
 
 # Check if we're in a testing environment
 testing = os.environ.get('TESTING', 'False').lower() == 'true'
 
-if testing:
-    # Improved mock for tests
-    class MockDB:
-        """Global store for our mock database"""
-        collections = {}
-
-    class MockCollection:
-        def __init__(self, name):
-            self.name = name
-            # Initialize collection if it doesn't exist
-            if name not in MockDB.collections:
-                MockDB.collections[name] = {}
-
-        def document(self, doc_id=None):
-            if doc_id is None:
-                # Generate a random ID like Firestore would
-                import uuid
-                doc_id = str(uuid.uuid4())
-            return MockDocument(self.name, doc_id)
-
-        def stream(self):
-            # Return all documents in the collection
-            return [
-                MockDocument(self.name, doc_id, data)
-                for doc_id, data in MockDB.collections[self.name].items()
-            ]
-
-        def where(self, field, op, value):
-            # Simple filter implementation
-            results = []
-            for doc_id, data in MockDB.collections[self.name].items():
-                if field in data:
-                    if op == '==' and data[field] == value:
-                        results.append(MockDocument(self.name, doc_id, data))
-
-            # Return a new collection-like object with filtered results
-            mock_filtered = MockCollection(self.name)
-            mock_filtered.stream = lambda: results
-            return mock_filtered
-
-    class MockDocument:
-        def __init__(self, collection_name, doc_id, data=None):
-            self.collection_name = collection_name
-            self.id = doc_id
-            self.exists = doc_id in MockDB.collections.get(collection_name, {})
-
-        def get(self):
-            # Setup for the document after get()
-            self.exists = self.id in MockDB.collections.get(
-                self.collection_name, {}
-            )
-            return self
-
-        def set(self, data):
-            # Ensure collection exists
-            if self.collection_name not in MockDB.collections:
-                MockDB.collections[self.collection_name] = {}
-
-            # Store data
-            MockDB.collections[self.collection_name][self.id] = data.copy()
-            self.exists = True
-            return self
-
-        def update(self, data):
-            # Ensure document exists
-            if (
-                self.collection_name not in MockDB.collections
-                or self.id not in MockDB.collections[self.collection_name]
-            ):
-                return self
-
-            # Update data
-            MockDB.collections[self.collection_name][self.id].update(data)
-            return self
-
-        def delete(self):
-            # Remove document if it exists
-            if (
-                self.collection_name in MockDB.collections
-                and self.id in MockDB.collections[self.collection_name]
-            ):
-
-                del MockDB.collections[self.collection_name][self.id]
-                self.exists = False
-
-        def to_dict(self):
-            # Return stored data or empty dict
-            if (
-                self.collection_name in MockDB.collections
-                and self.id in MockDB.collections[self.collection_name]
-            ):
-
-                return MockDB.collections[self.collection_name][self.id].copy()
-            return {}
-
-    class MockFirestore:
-        def collection(self, name):
-            return MockCollection(name)
-
-    db = MockFirestore()
-else:
+# Storage engine from the configuration. Tests never reach Firestore: they
+# run on the in-memory engine, or on SQLite when it is selected.
+storage_backend = Config.STORAGE_BACKEND
+if testing and storage_backend == 'firestore':
+    storage_backend = 'memory'
+if storage_backend not in ('firestore', 'sqlite', 'memory'):
+    raise ValueError(f"Unknown STORAGE_BACKEND: {storage_backend}")
+
+# Secondary indexes of the local engines, declared by the models
+indexes = {
+    book.COLLECTION_NAME: book.INDEXES,
+    book.DELETIONS_COLLECTION: book.DELETIONS_INDEXES,
+    member.COLLECTION_NAME: member.INDEXES,
+    loan.COLLECTION_NAME: loan.INDEXES,
+}
+
+
+def _create_engine_client():
+    if storage_backend == 'memory':
+        from models.memory import MemoryClient
+
+        return MemoryClient(indexes=indexes)
+    if storage_backend == 'sqlite':
+        from models.sqlite import SqliteClient
+
+        return SqliteClient(Config.SQLITE_PATH, indexes=indexes)
+
     # Real Firestore client for production
-    db = firestore.Client()
+    from google.cloud import firestore
+
+    return firestore.Client()
+
+
+def create_client():
+    """Create the storage client. The engine modules, and the Firestore
+    library with them, are only imported here."""
+    client = _create_engine_client()
+
+    from models.instrumentation import InstrumentedClient
+
+    return InstrumentedClient(client, recorders())
+
+
+def recorders():
+    """Storage round trips are counted for /api/metrics, and recorded in
+    the trace of the current request when tracing is on."""
+    from services import metrics
+    from services import tracing
+
+    if Config.METRICS_ENABLED:
+        return [tracing, metrics]
+    return [tracing]
+
+
+def create_async_client():
+    """Create the async storage client, on the storage event loop."""
+    from models.aio import AsyncClientProxy
+
+    if storage_backend == 'firestore':
+        from google.cloud import firestore
+
+        return AsyncClientProxy(firestore.AsyncClient())
+
+    # Same data as db: the in-memory engine only lives in its client
+    from models.aio import LocalAsyncClient
+
+    return AsyncClientProxy(LocalAsyncClient(db.get()._wrapped))
+
+
+class LazyClient:
+    """Storage client created on first use, once per process.
+
+    A Firestore client discovers credentials when it is created and opens
+    a gRPC channel on its first call, neither of which survives fork():
+    forked children drop the inherited client (reset_on_fork) and create
+    their own on first use. The in-memory engine is kept, since its data
+    only lives in the process.
+    """
+
+    def __init__(self, factory, reset_on_fork=True):
+        self._factory = factory
+        self._client = None
+        self._lock = threading.Lock()
+        if reset_on_fork:
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def initialized(self):
+        return self._client is not None
+
+    def get(self):
+        client = self._client
+        if client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._factory()
+                client = self._client
+        return client
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+
+db = LazyClient(create_client, reset_on_fork=storage_backend != 'memory')
+
+# Concurrent reads (see models.aio); its event loop and client are started
+# on first use
+async_storage = StorageLoop(create_async_client, recorders)
+
+
+def warmup():
+    """Create the client and open its connection with one document read,
+    so that the first request does not pay for them."""
+    from models.stats import COLLECTION_NAME
+    from models.stats import COUNTERS_DOCUMENT
+
+    db.collection(COLLECTION_NAME).document(COUNTERS_DOCUMENT).get()
+
+
+def increment(value):
+    """Server-side increment of a numeric field, for set() and update()."""
+    from google.cloud import firestore
+
+    return firestore.Increment(value)
+
+
+async def count_documents_async(query):
+    """Count the documents matched by a query of the async client without
+    downloading them."""
+    results = await query.count(alias='count').get()
+    return results[0][0].value
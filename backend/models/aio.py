@@ -0,0 +1,179 @@
+"""Async storage client, for independent reads issued together.
+
+Services write their concurrent reads as coroutines on an async client
+(firestore.AsyncClient in production) and hand them to
+StorageLoop.run(), which runs them on the process' storage event loop
+and waits for the result:
+
+    book, member = storage.run(asyncio.gather(book_ref.get(),
+                                              member_ref.get()))
+
+The loop lives in a background thread, so the views stay synchronous:
+the client's gRPC channel belongs to that one loop and is opened once per
+process, instead of once per request as with a loop per view. The local
+engines have no async API: LocalAsyncClient runs their calls inline on
+the loop, against the same data as models.db.
+
+Round trips are timed on the loop and reported to the recorders
+(services.metrics, services.tracing) by run(), in the calling thread,
+whose request and trace they belong to.
+"""
+import asyncio
+import contextvars
+import os
+import threading
+import time
+
+# Storage calls of the coroutine being run: (operation, target, seconds,
+# documents, writes), as expected by the recorders
+_calls = contextvars.ContextVar('storage_calls')
+
+
+def _record(operation, target, start, documents=0):
+    calls = _calls.get(None)
+    if calls is not None:
+        calls.append((operation, target, time.perf_counter() - start,
+                      documents, ()))
+
+
+async def _recording(coroutine, calls):
+    # Tasks created by the coroutine (asyncio.gather) inherit the list
+    _calls.set(calls)
+    return await coroutine
+
+
+class StorageLoop:
+    """Event loop of the async storage client, in a background thread.
+
+    `factory` creates the async client on the loop, on first use; it
+    does not survive fork(), so forked children start their own loop.
+    """
+
+    def __init__(self, factory, recorders):
+        self._factory = factory
+        self._recorders = recorders
+        self._client = None
+        self._loop = None
+        self._lock = threading.Lock()
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._client = None
+        self._loop = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        """The async client; only for coroutines running on the loop."""
+        if self._client is None:
+            self._client = self._factory()
+        return self._client
+
+    def _start(self):
+        loop = self._loop
+        if loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever,
+                                     name='storage-loop', daemon=True).start()
+                    self._loop = loop
+                loop = self._loop
+        return loop
+
+    def run(self, coroutine):
+        """Run a coroutine on the storage loop and return its result."""
+        calls = []
+        future = asyncio.run_coroutine_threadsafe(
+            _recording(coroutine, calls), self._start()
+        )
+        try:
+            return future.result()
+        finally:
+            recorders = self._recorders()
+            for call in calls:
+                for recorder in recorders:
+                    recorder.storage_call(*call)
+
+
+class AsyncClientProxy:
+    """Async client timing the reads of the wrapped client."""
+
+    def __init__(self, client):
+        self._client = client
+
+    def collection(self, name):
+        return _QueryProxy(self._client.collection(name), name)
+
+
+class _QueryProxy:
+    def __init__(self, query, target):
+        self._query = query
+        self._target = target
+
+    def where(self, *args, **kwargs):
+        return _QueryProxy(self._query.where(*args, **kwargs), self._target)
+
+    def document(self, document_id):
+        return _DocumentProxy(self._query.document(document_id),
+                              f'{self._target}/{document_id}')
+
+    def count(self, alias=None):
+        return _AggregationProxy(self._query.count(alias=alias),
+                                 self._target)
+
+
+class _DocumentProxy:
+    def __init__(self, reference, target):
+        self._reference = reference
+        self._target = target
+
+    async def get(self):
+        start = time.perf_counter()
+        snapshot = await self._reference.get()
+        _record('get', self._target, start, 1 if snapshot.exists else 0)
+        return snapshot
+
+
+class _AggregationProxy:
+    def __init__(self, aggregation, target):
+        self._aggregation = aggregation
+        self._target = target
+
+    async def get(self):
+        start = time.perf_counter()
+        results = await self._aggregation.get()
+        _record('count', self._target, start)
+        return results
+
+
+class LocalAsyncClient:
+    """Async surface of a local engine's client (memory or SQLite)."""
+
+    def __init__(self, client):
+        self._client = client
+
+    def collection(self, name):
+        return _LocalQuery(self._client.collection(name))
+
+
+class _LocalQuery:
+    def __init__(self, query):
+        self._query = query
+
+    def where(self, *args, **kwargs):
+        return _LocalQuery(self._query.where(*args, **kwargs))
+
+    def document(self, document_id):
+        return _LocalAwaitable(self._query.document(document_id))
+
+    def count(self, alias=None):
+        return _LocalAwaitable(self._query.count(alias=alias))
+
+
+class _LocalAwaitable:
+    def __init__(self, wrapped):
+        self._wrapped = wrapped
+
+    async def get(self):
+        return self._wrapped.get()
@@ -1,9 +1,38 @@
 from datetime import datetime
 
+from models.timestamps import Timestamp
+from models.timestamps import encode
+
 COLLECTION_NAME = 'books'
 
+# Fields accepted by the 'sort' parameter of the list endpoint
+SORTABLE_FIELDS = [
+    'title', 'author', 'publication_year', 'category',
+    'created_at', 'updated_at'
+]
+
+# Secondary indexes of the in-memory storage engine
+INDEXES = {
+    'is_available': 'hash',
+    **dict.fromkeys(SORTABLE_FIELDS, 'sorted'),
+}
+
+# IDs of deleted books, so that every worker's search index drops them;
+# expire_at is meant for a Firestore TTL policy
+DELETIONS_COLLECTION = 'book_deletions'
+DELETIONS_INDEXES = {'deleted_at': 'sorted'}
+
 
 class Book:
+    # Fixed attributes: no per-instance __dict__ for large listings
+    __slots__ = (
+        'id', 'title', 'author', 'isbn', 'publication_year', 'category',
+        'description', 'is_available', '_created_at', '_updated_at',
+    )
+
+    created_at = Timestamp()
+    updated_at = Timestamp()
+
     def __init__(self, id=None, title=None, author=None, isbn=None,
                  publication_year=None, category=None, description=None,
                  is_available=True, created_at=None, updated_at=None):
@@ -19,31 +48,34 @@ class Book:
         self.created_at = created_at or datetime.utcnow()
         self.updated_at = updated_at or datetime.utcnow()
 
-    @staticmethod
-    def from_dict(source, id=None):
-        book = Book(
-            id=id,
-            title=source.get('title'),
-            author=source.get('author'),
-            isbn=source.get('isbn'),
-            publication_year=source.get('publication_year'),
-            category=source.get('category'),
-            description=source.get('description'),
-            is_available=source.get('is_available', True),
-            created_at=source.get('created_at'),
-            updated_at=source.get('updated_at')
-        )
-
-        if 'created_at' in source and isinstance(source['created_at'], str):
-            book.created_at = datetime.fromisoformat(source['created_at'])
-
-        if 'updated_at' in source and isinstance(source['updated_at'], str):
-            book.updated_at = datetime.fromisoformat(source['updated_at'])
-
+    @classmethod
+    def from_dict(cls, source, id=None):
+        # Attributes are set directly: listings decode one per document
+        get = source.get
+        book = cls.__new__(cls)
+        book.id = id
+        book.title = get('title')
+        book.author = get('author')
+        book.isbn = get('isbn')
+        book.publication_year = get('publication_year')
+        book.category = get('category')
+        book.description = get('description')
+        book.is_available = get('is_available', True)
+        # Timestamps stay ISO strings until read as datetimes
+        book._created_at = get('created_at') or datetime.utcnow()
+        book._updated_at = get('updated_at') or datetime.utcnow()
         return book
 
     def to_dict(self):
+        book_dict = self.to_response()
+        del book_dict['id']
+        return book_dict
+
+    def to_response(self):
+        """Body of API responses, encoded in one pass: the ID and the
+        stored fields."""
         return {
+            'id': self.id,
             'title': self.title,
             'author': self.author,
             'isbn': self.isbn,
@@ -51,13 +83,6 @@ class Book:
             'category': self.category,
             'description': self.description,
             'is_available': self.is_available,
-            'created_at': (
-                self.created_at.isoformat()
-                if isinstance(self.created_at, datetime)
-                else self.created_at
-            ),
-            'updated_at': (
-                self.updated_at.isoformat()
-                if isinstance(self.updated_at, datetime)
-                else self.updated_at)
+            'created_at': encode(self._created_at),
+            'updated_at': encode(self._updated_at),
         }
@@ -0,0 +1,168 @@
+"""Storage client wrapper timing round trips and counting documents.
+
+Wraps any engine's client (Firestore, SQLite or in-memory): collections,
+queries, document references and write batches are returned as thin
+proxies, and everything else goes through to the wrapped objects
+unchanged. Each round trip is reported to every recorder
+(services.metrics, services.tracing) as
+
+    recorder.storage_call(operation, target, seconds, documents, writes)
+
+once it is over: `target` is the collection or document path, `documents`
+the number of documents read and `writes` the operations written.
+"""
+import time
+
+# Query methods returning a new query, which must stay instrumented
+QUERY_BUILDERS = (
+    'where', 'order_by', 'limit', 'limit_to_last', 'offset', 'select',
+    'start_at', 'start_after', 'end_at', 'end_before',
+)
+
+
+def _unwrap(reference):
+    return reference._wrapped if isinstance(reference, DocumentProxy) \
+        else reference
+
+
+class _Proxy:
+    def __init__(self, wrapped, recorders, target=''):
+        self._wrapped = wrapped
+        self._recorders = recorders
+        self._target = target
+
+    def __getattr__(self, name):
+        return getattr(self._wrapped, name)
+
+    def _record(self, operation, start, documents=0, writes=(),
+                target=None):
+        seconds = time.perf_counter() - start
+        for recorder in self._recorders:
+            recorder.storage_call(operation, target or self._target, seconds,
+                                  documents, writes)
+
+    def _read(self, operation, start, snapshots, target=None):
+        # Reads are streamed: the call is over with its last document
+        read = 0
+        try:
+            for snapshot in snapshots:
+                if snapshot.exists:
+                    read += 1
+                yield snapshot
+        finally:
+            self._record(operation, start, read, target=target)
+
+
+class InstrumentedClient(_Proxy):
+    def collection(self, name):
+        return CollectionProxy(self._wrapped.collection(name),
+                               self._recorders, name)
+
+    def batch(self):
+        return BatchProxy(self._wrapped.batch(), self._recorders)
+
+    def get_all(self, references, **kwargs):
+        references = [_unwrap(reference) for reference in references]
+        target = ','.join(sorted({
+            reference.path.split('/', 1)[0] for reference in references
+        }))
+        start = time.perf_counter()
+        return self._read('get_all', start, self._wrapped.get_all(
+            references, **kwargs
+        ), target)
+
+
+class QueryProxy(_Proxy):
+    def __getattr__(self, name):
+        attribute = getattr(self._wrapped, name)
+        if name not in QUERY_BUILDERS:
+            return attribute
+
+        def build(*args, **kwargs):
+            return QueryProxy(attribute(*args, **kwargs), self._recorders,
+                              self._target)
+
+        return build
+
+    def stream(self, *args, **kwargs):
+        start = time.perf_counter()
+        return self._read('stream', start,
+                          self._wrapped.stream(*args, **kwargs))
+
+    def get(self, *args, **kwargs):
+        return list(self.stream(*args, **kwargs))
+
+    def count(self, *args, **kwargs):
+        return AggregationProxy(self._wrapped.count(*args, **kwargs),
+                                self._recorders, self._target)
+
+
+class CollectionProxy(QueryProxy):
+    def document(self, *args, **kwargs):
+        reference = self._wrapped.document(*args, **kwargs)
+        return DocumentProxy(reference, self._recorders, reference.path)
+
+
+class AggregationProxy(_Proxy):
+    def get(self, *args, **kwargs):
+        start = time.perf_counter()
+        results = self._wrapped.get(*args, **kwargs)
+        self._record('count', start)
+        return results
+
+
+class DocumentProxy(_Proxy):
+    def get(self, *args, **kwargs):
+        start = time.perf_counter()
+        snapshot = self._wrapped.get(*args, **kwargs)
+        self._record('get', start, 1 if snapshot.exists else 0)
+        return snapshot
+
+    def _write(self, operation, *args, **kwargs):
+        start = time.perf_counter()
+        result = getattr(self._wrapped, operation)(*args, **kwargs)
+        self._record(operation, start, writes=(operation,))
+        return result
+
+    def set(self, *args, **kwargs):
+        return self._write('set', *args, **kwargs)
+
+    def update(self, *args, **kwargs):
+        return self._write('update', *args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        return self._write('delete', *args, **kwargs)
+
+
+class BatchProxy(_Proxy):
+    """Write batch: staged writes are reported with the commit."""
+
+    def __init__(self, wrapped, recorders):
+        super().__init__(wrapped, recorders)
+        self._writes = []
+        self._targets = set()
+
+    def _stage(self, operation, reference, *args, **kwargs):
+        reference = _unwrap(reference)
+        self._writes.append(operation)
+        self._targets.add(reference.path.split('/', 1)[0])
+        return getattr(self._wrapped, operation)(reference, *args, **kwargs)
+
+    def create(self, reference, *args, **kwargs):
+        return self._stage('create', reference, *args, **kwargs)
+
+    def set(self, reference, *args, **kwargs):
+        return self._stage('set', reference, *args, **kwargs)
+
+    def update(self, reference, *args, **kwargs):
+        return self._stage('update', reference, *args, **kwargs)
+
+    def delete(self, reference, *args, **kwargs):
+        return self._stage('delete', reference, *args, **kwargs)
+
+    def commit(self):
+        start = time.perf_counter()
+        results = self._wrapped.commit()
+        self._record('commit', start, writes=tuple(self._writes),
+                     target=','.join(sorted(self._targets)))
+        return results
@@ -1,12 +1,40 @@
 from datetime import datetime
 from datetime import timedelta
 
+from models.timestamps import Timestamp
+from models.timestamps import encode
+
 COLLECTION_NAME = 'loans'
 
+# Fields accepted by the 'sort' parameter of the list endpoint
+SORTABLE_FIELDS = ['loan_date', 'due_date']
+
+# Secondary indexes of the in-memory storage engine
+INDEXES = {
+    'returned': 'hash',
+    'overdue': 'hash',
+    'book_id': 'hash',
+    'member_id': 'hash',
+    **dict.fromkeys(SORTABLE_FIELDS, 'sorted'),
+}
+
+# Values accepted by the 'status' filter of the list endpoint
+STATUSES = ['active', 'returned', 'overdue']
+
 
 class Loan:
+    __slots__ = (
+        'id', 'book_id', 'member_id', '_loan_date', '_due_date',
+        '_return_date', 'returned', 'overdue',
+    )
+
+    loan_date = Timestamp()
+    due_date = Timestamp()
+    return_date = Timestamp()
+
     def __init__(self, id=None, book_id=None, member_id=None, loan_date=None,
-                 due_date=None, return_date=None, returned=False):
+                 due_date=None, return_date=None, returned=False,
+                 overdue=False):
 
         self.id = id
         self.book_id = book_id
@@ -15,56 +43,55 @@ class Loan:
         self.due_date = due_date or (self.loan_date + timedelta(days=14))
         self.return_date = return_date
         self.returned = returned
+        # Set by the overdue sweep (services/loan_service.py), while
+        # is_overdue in responses is computed at read time
+        self.overdue = overdue
 
-    @staticmethod
-    def from_dict(source, id=None):
-        loan = Loan(
-            id=id,
-            book_id=source.get('book_id'),
-            member_id=source.get('member_id'),
-            loan_date=source.get('loan_date'),
-            due_date=source.get('due_date'),
-            return_date=source.get('return_date'),
-            returned=source.get('returned', False)
+    @classmethod
+    def from_dict(cls, source, id=None):
+        # Attributes are set directly: listings decode one per document
+        get = source.get
+        loan = cls.__new__(cls)
+        loan.id = id
+        loan.book_id = get('book_id')
+        loan.member_id = get('member_id')
+        # Timestamps stay ISO strings until read as datetimes
+        loan._loan_date = get('loan_date') or datetime.utcnow()
+        loan._due_date = (
+            get('due_date') or loan.loan_date + timedelta(days=14)
         )
-
-        if 'loan_date' in source and isinstance(source['loan_date'], str):
-            loan.loan_date = datetime.fromisoformat(source['loan_date'])
-
-        if 'due_date' in source and isinstance(source['due_date'], str):
-            loan.due_date = datetime.fromisoformat(source['due_date'])
-
-        if 'return_date' in source and isinstance(source['return_date'], str):
-            loan.return_date = datetime.fromisoformat(source['return_date'])
-
+        loan._return_date = get('return_date')
+        loan.returned = get('returned', False)
+        loan.overdue = get('overdue', False)
         return loan
 
-    def to_dict(self):
+    def to_dict(self, now=None):
+        loan_dict = self.to_response(now=now)
+        del loan_dict['id']
+        loan_dict['overdue'] = self.overdue
+        return loan_dict
+
+    def to_response(self, now=None):
+        """Body of API responses, encoded in one pass: the ID, the stored
+        fields and whether the loan is overdue."""
         loan_dict = {
+            'id': self.id,
             'book_id': self.book_id,
             'member_id': self.member_id,
-            'loan_date': (
-                self.loan_date.isoformat()
-                if isinstance(self.loan_date, datetime)
-                else self.loan_date
-            ),
-            'due_date': (
-                self.due_date.isoformat()
-                if isinstance(self.due_date, datetime)
-                else self.due_date
-            ),
+            'loan_date': encode(self._loan_date),
+            'due_date': encode(self._due_date),
             'returned': self.returned,
         }
 
-        if self.return_date:
-            loan_dict['return_date'] = (
-                self.return_date.isoformat()
-                if isinstance(self.return_date, datetime)
-                else self.return_date
-            )
+        if self._return_date:
+            loan_dict['return_date'] = encode(self._return_date)
 
+        # List responses pass one reference time for every loan, ideally
+        # already encoded. ISO strings of naive UTC times sort like the
+        # times, so the stored due date is compared without parsing it.
+        now = encode(now or datetime.utcnow())
         loan_dict['is_overdue'] = (
-            datetime.utcnow() > self.due_date if not self.returned else False
+            now > loan_dict['due_date'] if not self.returned else False
         )
 
         return loan_dict
@@ -1,9 +1,29 @@
 from datetime import datetime
 
+from models.timestamps import Timestamp
+from models.timestamps import encode
+
 COLLECTION_NAME = 'members'
 
+# Fields accepted by the 'sort' parameter of the list endpoint
+SORTABLE_FIELDS = [
+    'last_name', 'first_name', 'email', 'created_at',
+    'updated_at'
+]
+
+# Secondary indexes of the in-memory storage engine
+INDEXES = dict.fromkeys(SORTABLE_FIELDS, 'sorted')
+
 
 class Member:
+    __slots__ = (
+        'id', 'first_name', 'last_name', 'email', 'phone', 'address',
+        'id_card_number', '_created_at', '_updated_at',
+    )
+
+    created_at = Timestamp()
+    updated_at = Timestamp()
+
     def __init__(self, id=None, first_name=None, last_name=None, email=None,
                  phone=None, address=None, id_card_number=None,
                  created_at=None, updated_at=None):
@@ -18,44 +38,39 @@ class Member:
         self.created_at = created_at or datetime.utcnow()
         self.updated_at = updated_at or datetime.utcnow()
 
-    @staticmethod
-    def from_dict(source, id=None):
-        member = Member(
-            id=id,
-            first_name=source.get('first_name'),
-            last_name=source.get('last_name'),
-            email=source.get('email'),
-            phone=source.get('phone'),
-            address=source.get('address'),
-            id_card_number=source.get('id_card_number'),
-            created_at=source.get('created_at'),
-            updated_at=source.get('updated_at')
-        )
-
-        if 'created_at' in source and isinstance(source['created_at'], str):
-            member.created_at = datetime.fromisoformat(source['created_at'])
-
-        if 'updated_at' in source and isinstance(source['updated_at'], str):
-            member.updated_at = datetime.fromisoformat(source['updated_at'])
-
+    @classmethod
+    def from_dict(cls, source, id=None):
+        # Attributes are set directly: listings decode one per document
+        get = source.get
+        member = cls.__new__(cls)
+        member.id = id
+        member.first_name = get('first_name')
+        member.last_name = get('last_name')
+        member.email = get('email')
+        member.phone = get('phone')
+        member.address = get('address')
+        member.id_card_number = get('id_card_number')
+        # Timestamps stay ISO strings until read as datetimes
+        member._created_at = get('created_at') or datetime.utcnow()
+        member._updated_at = get('updated_at') or datetime.utcnow()
         return member
 
     def to_dict(self):
+        member_dict = self.to_response()
+        del member_dict['id']
+        return member_dict
+
+    def to_response(self):
+        """Body of API responses, encoded in one pass: the ID and the
+        stored fields."""
         return {
+            'id': self.id,
             'first_name': self.first_name,
             'last_name': self.last_name,
             'email': self.email,
             'phone': self.phone,
             'address': self.address,
             'id_card_number': self.id_card_number,
-            'created_at': (
-                self.created_at.isoformat()
-                if isinstance(self.created_at, datetime)
-                else self.created_at
-            ),
-            'updated_at': (
-                self.updated_at.isoformat()
-                if isinstance(self.updated_at, datetime)
-                else self.updated_at
-            )
+            'created_at': encode(self._created_at),
+            'updated_at': encode(self._updated_at),
         }
@@ -0,0 +1,837 @@
+"""In-memory storage engine with the client surface of Firestore.
+
+The services only use the Firestore client API (collections, document
+references and snapshots, queries, batches, transactions), so this engine
+can stand in for Firestore in tests, local load tests or as a hot cache
+tier. Each client owns its data. Writes are applied atomically under the
+client's lock, and the fields declared for each collection are kept in
+secondary indexes:
+
+- 'hash' indexes serve ==, != and 'in' filters;
+- 'sorted' indexes also serve range filters, and orderings, which read a
+  limited page (or resume from a cursor) without sorting the collection.
+"""
+import bisect
+import copy
+import functools
+import itertools
+import random
+import string
+import threading
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+from operator import itemgetter
+
+from google.api_core.exceptions import Aborted
+from google.api_core.exceptions import FailedPrecondition
+from google.api_core.exceptions import InvalidArgument
+from google.api_core.exceptions import NotFound
+from google.cloud import firestore
+
+ASCENDING = 'ASCENDING'
+DESCENDING = 'DESCENDING'
+
+# Firestore's reserved field path for the document ID
+DOCUMENT_ID = '__name__'
+
+# Writes allowed in one batch or transaction, as in Firestore
+MAX_BATCH_WRITES = 500
+
+_ID_ALPHABET = string.ascii_letters + string.digits
+_RANGE_OPERATORS = {'<', '<=', '>', '>='}
+_OPERATORS = _RANGE_OPERATORS | {
+    '==', '!=', 'in', 'not-in', 'array_contains', 'array-contains'
+}
+_first = itemgetter(0)
+
+
+def order_key(value):
+    """Sort key of a field value, following Firestore's order of types."""
+    if value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, (int, float)):
+        return (2, value)
+    if isinstance(value, datetime):
+        return (3, value)
+    if isinstance(value, str):
+        return (4, value)
+    if isinstance(value, bytes):
+        return (5, value)
+    if isinstance(value, (list, tuple)):
+        return (8, tuple(order_key(item) for item in value))
+    if isinstance(value, dict):
+        return (9, tuple(sorted(
+            (key, order_key(item)) for key, item in value.items()
+        )))
+    return (7, str(value))
+
+
+def _matches(value, op, target):
+    if op in ('array_contains', 'array-contains'):
+        return isinstance(value, list) and any(
+            order_key(item) == order_key(target) for item in value
+        )
+    key = order_key(value)
+    if op == '==':
+        return key == order_key(target)
+    if op == '!=':
+        return value is not None and key != order_key(target)
+    if op == 'in':
+        return key in {order_key(item) for item in target}
+    if op == 'not-in':
+        return value is not None and key not in {
+            order_key(item) for item in target
+        }
+    # Range filters only match values of the same type
+    target_key = order_key(target)
+    if key[0] != target_key[0]:
+        return False
+    if op == '<':
+        return key < target_key
+    if op == '<=':
+        return key <= target_key
+    if op == '>':
+        return key > target_key
+    return key >= target_key
+
+
+def _copy_data(data):
+    return {
+        field: copy.deepcopy(value) if isinstance(value, (dict, list))
+        else value
+        for field, value in data.items()
+    }
+
+
+def _apply_update(data, changes):
+    """Apply set/update values, resolving field paths and transforms."""
+    result = dict(data)
+    for path, value in changes.items():
+        target = result
+        *parents, field = path.split('.')
+        for parent in parents:
+            child = target.get(parent)
+            child = dict(child) if isinstance(child, dict) else {}
+            target[parent] = child
+            target = child
+
+        if value is firestore.DELETE_FIELD:
+            target.pop(field, None)
+        elif value is firestore.SERVER_TIMESTAMP:
+            target[field] = datetime.now(timezone.utc)
+        elif isinstance(value, firestore.Increment):
+            current = target.get(field)
+            if not isinstance(current, (int, float)) or isinstance(
+                current, bool
+            ):
+                current = 0
+            target[field] = current + value.value
+        else:
+            target[field] = copy.deepcopy(value)
+    return result
+
+
+def _merge(data, changes):
+    # set(merge=True) merges nested maps instead of replacing them
+    result = dict(data)
+    for field, value in changes.items():
+        if isinstance(value, dict) and isinstance(result.get(field), dict):
+            result[field] = _merge(result[field], value)
+        else:
+            result.update(_apply_update(result, {field: value}))
+    return result
+
+
+class _Index:
+    """Secondary index of one field of a collection."""
+
+    def __init__(self, kind):
+        if kind not in ('hash', 'sorted'):
+            raise ValueError(f"Unknown index kind: {kind}")
+        self.kind = kind
+        self.hashed = {}
+        self.entries = []
+
+    def add(self, key, doc_id):
+        if self.kind == 'hash':
+            self.hashed.setdefault(key, set()).add(doc_id)
+        else:
+            bisect.insort(self.entries, (key, doc_id))
+
+    def remove(self, key, doc_id):
+        if self.kind == 'hash':
+            ids = self.hashed[key]
+            ids.discard(doc_id)
+            if not ids:
+                del self.hashed[key]
+        else:
+            del self.entries[bisect.bisect_left(self.entries, (key, doc_id))]
+
+    def lookup(self, op, value):
+        """IDs matching a filter, or None if this index cannot serve it."""
+        if op == '==':
+            return self._equal(order_key(value))
+        if op == 'in':
+            ids = set()
+            for item in value:
+                ids |= self._equal(order_key(item))
+            return ids
+        if op in _RANGE_OPERATORS and self.kind == 'sorted':
+            return {doc_id for _, doc_id in self._range(op, value)}
+        return None
+
+    def _equal(self, key):
+        if self.kind == 'hash':
+            # Callers only read it, under the client lock
+            return self.hashed.get(key, frozenset())
+        lo = bisect.bisect_left(self.entries, key, key=_first)
+        hi = bisect.bisect_right(self.entries, key, key=_first)
+        return {doc_id for _, doc_id in self.entries[lo:hi]}
+
+    def _range(self, op, value):
+        key = order_key(value)
+        entries = self.entries
+        # Bounds of the values of the same type as the filter value
+        lo = bisect.bisect_left(entries, (key[0],), key=_first)
+        hi = bisect.bisect_left(entries, (key[0] + 1,), key=_first)
+        if op == '<':
+            hi = bisect.bisect_left(entries, key, lo, hi, key=_first)
+        elif op == '<=':
+            hi = bisect.bisect_right(entries, key, lo, hi, key=_first)
+        elif op == '>':
+            lo = bisect.bisect_right(entries, key, lo, hi, key=_first)
+        else:
+            lo = bisect.bisect_left(entries, key, lo, hi, key=_first)
+        return entries[lo:hi]
+
+    def scan(self, direction, after=None):
+        """(key, ID) entries in order, strictly after a cursor entry."""
+        entries = self.entries
+        if direction == ASCENDING:
+            start = 0 if after is None else bisect.bisect_right(entries, after)
+            return itertools.islice(entries, start, None)
+        end = len(entries) if after is None else (
+            bisect.bisect_left(entries, after)
+        )
+        return (entries[i] for i in range(end - 1, -1, -1))
+
+
+class _Collection:
+    def __init__(self, indexes):
+        self.documents = {}
+        # Sorted document IDs, the default order of queries
+        self.ids = _Index('sorted')
+        self.indexes = {
+            field: _Index(kind) for field, kind in indexes.items()
+        }
+
+    def write(self, doc_id, data, update_time):
+        old = self.documents.get(doc_id)
+        for field, index in self.indexes.items():
+            old_data = old[0] if old else {}
+            new_data = data if data is not None else {}
+            had, has = field in old_data, field in new_data
+            old_key = order_key(old_data[field]) if had else None
+            new_key = order_key(new_data[field]) if has else None
+            if had and (not has or old_key != new_key):
+                index.remove(old_key, doc_id)
+            if has and (not had or old_key != new_key):
+                index.add(new_key, doc_id)
+
+        if data is None:
+            if old is not None:
+                self.ids.remove(order_key(doc_id), doc_id)
+            self.documents.pop(doc_id, None)
+        else:
+            if old is None:
+                self.ids.add(order_key(doc_id), doc_id)
+            self.documents[doc_id] = (data, update_time)
+
+
+class BaseClient:
+    """Client surface shared by the storage engines of this package.
+
+    Engines implement _snapshots(), _commit(), _run_query() and _count();
+    references, queries, batches and transactions only go through them.
+    """
+
+    def collection(self, name):
+        return CollectionReference(self, name)
+
+    def batch(self):
+        return WriteBatch(self)
+
+    def transaction(self, max_attempts=5, read_only=False):
+        return Transaction(self, max_attempts, read_only)
+
+    def write_option(self, last_update_time=None, exists=None):
+        return WriteOption(last_update_time, exists)
+
+    def get_all(self, references, field_paths=None, transaction=None):
+        references = list(references)
+        if transaction is not None:
+            return transaction.get_all(references, field_paths)
+        return self._snapshots(references, field_paths)
+
+    def _snapshot(self, reference, field_paths=None):
+        return self._snapshots([reference], field_paths)[0]
+
+
+def _project(data, field_paths):
+    roots = {path.split('.')[0] for path in field_paths}
+    return {field: data[field] for field in roots if field in data}
+
+
+class MemoryClient(BaseClient):
+    """In-memory database exposing the subset of the Firestore client
+    used by the services.
+
+    `indexes` maps collection names to {field: 'hash' | 'sorted'}.
+    """
+
+    def __init__(self, indexes=None):
+        self._lock = threading.RLock()
+        self._index_specs = indexes or {}
+        self._collections = {}
+        self._last_update = datetime.fromtimestamp(0, timezone.utc)
+
+    def _store(self, name):
+        store = self._collections.get(name)
+        if store is None:
+            store = self._collections[name] = _Collection(
+                self._index_specs.get(name, {})
+            )
+        return store
+
+    def _next_update_time(self):
+        # Strictly increasing, so update times identify document versions
+        now = datetime.now(timezone.utc)
+        if now <= self._last_update:
+            now = self._last_update + timedelta(microseconds=1)
+        self._last_update = now
+        return now
+
+    def _snapshots(self, references, field_paths=None):
+        with self._lock:
+            stored = [
+                self._store(reference._collection).documents.get(
+                    reference.id
+                )
+                for reference in references
+            ]
+        snapshots = []
+        for reference, row in zip(references, stored):
+            if row is None:
+                snapshots.append(DocumentSnapshot(reference, None, None))
+                continue
+            data, update_time = row
+            if field_paths is not None:
+                data = _project(data, field_paths)
+            snapshots.append(DocumentSnapshot(reference, data, update_time))
+        return snapshots
+
+    def reset(self):
+        """Drop every document, keeping the index declarations."""
+        with self._lock:
+            self._collections = {}
+
+    def _commit(self, writes, read_versions=None):
+        if len(writes) > MAX_BATCH_WRITES:
+            raise InvalidArgument(
+                f"maximum {MAX_BATCH_WRITES} writes allowed per request"
+            )
+        with self._lock:
+            for key, version in (read_versions or {}).items():
+                stored = self._store(key[0]).documents.get(key[1])
+                if (stored[1] if stored else None) != version:
+                    raise Aborted(
+                        f"{key[0]}/{key[1]} was modified concurrently"
+                    )
+
+            # Check every precondition before applying anything, so a
+            # failed write rejects the whole batch
+            staged = {}
+            for kind, reference, data, option in writes:
+                key = (reference._collection, reference.id)
+                if key in staged:
+                    current = staged[key]
+                else:
+                    stored = self._store(key[0]).documents.get(key[1])
+                    current = stored[0] if stored else None
+                    if option is not None:
+                        option.check(reference, stored)
+
+                if kind == 'update' and current is None:
+                    raise NotFound(f"No document to update: {key[0]}/{key[1]}")
+                if kind == 'delete':
+                    staged[key] = None
+                elif kind == 'update':
+                    staged[key] = _apply_update(current, data)
+                elif kind == 'merge':
+                    staged[key] = _merge(current or {}, data)
+                else:
+                    staged[key] = _apply_update({}, data)
+
+            update_time = self._next_update_time()
+            for (collection, doc_id), data in staged.items():
+                self._store(collection).write(doc_id, data, update_time)
+        return [WriteResult(update_time) for _ in writes]
+
+    def _run_query(self, query):
+        """Matching (ID, data, update time) rows, in the query's order."""
+        with self._lock:
+            store = self._store(query._collection)
+            return list(_QueryPlan(store, query).rows())
+
+    def _count(self, query):
+        with self._lock:
+            store = self._store(query._collection)
+            return _QueryPlan(store, query).count()
+
+
+class WriteResult:
+    def __init__(self, update_time):
+        self.update_time = update_time
+
+
+class WriteOption:
+    """Precondition of a write: last update time or (non-)existence."""
+
+    def __init__(self, last_update_time=None, exists=None):
+        self.last_update_time = last_update_time
+        self.exists = exists
+
+    def check(self, reference, stored):
+        path = f"{reference._collection}/{reference.id}"
+        if self.exists is not None and self.exists != (stored is not None):
+            raise FailedPrecondition(
+                f"{path} {'does not exist' if self.exists else 'exists'}"
+            )
+        if self.last_update_time is not None and (
+            stored is None or stored[1] != self.last_update_time
+        ):
+            raise FailedPrecondition(f"{path} was modified since it was read")
+
+
+class DocumentSnapshot:
+    def __init__(self, reference, data, update_time):
+        self.reference = reference
+        self._data = data
+        self.update_time = update_time
+
+    @property
+    def id(self):
+        return self.reference.id
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        if self._data is None:
+            return None
+        return _copy_data(self._data)
+
+    def get(self, field_path):
+        value = self._data
+        for field in field_path.split('.'):
+            value = value[field]
+        return copy.deepcopy(value)
+
+
+class DocumentReference:
+    def __init__(self, client, collection, doc_id):
+        self._client = client
+        self._collection = collection
+        self.id = doc_id
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, DocumentReference)
+            and other._client is self._client
+            and other.path == self.path
+        )
+
+    def __hash__(self):
+        return hash(self.path)
+
+    @property
+    def path(self):
+        return f"{self._collection}/{self.id}"
+
+    @property
+    def parent(self):
+        return CollectionReference(self._client, self._collection)
+
+    def get(self, field_paths=None, transaction=None):
+        if transaction is not None:
+            return transaction.get_all([self], field_paths)[0]
+        return self._client._snapshot(self, field_paths)
+
+    def set(self, document_data, merge=False):
+        return self._client._commit([
+            ('merge' if merge else 'set', self, document_data, None)
+        ])[0]
+
+    def update(self, field_updates, option=None):
+        return self._client._commit([
+            ('update', self, field_updates, option)
+        ])[0]
+
+    def delete(self, option=None):
+        self._client._commit([('delete', self, None, option)])
+
+
+class Query:
+    """Immutable query, built like a Firestore query."""
+
+    def __init__(self, client, collection, filters=(), orders=(),
+                 limit=None, cursor=None):
+        self._client = client
+        self._collection = collection
+        self._filters = filters
+        self._orders = orders
+        self._limit = limit
+        self._cursor = cursor
+
+    def _copy(self, **changes):
+        state = {
+            'filters': self._filters,
+            'orders': self._orders,
+            'limit': self._limit,
+            'cursor': self._cursor,
+        }
+        state.update(changes)
+        return Query(self._client, self._collection, **state)
+
+    def where(self, field_path, op_string, value):
+        if op_string not in _OPERATORS:
+            raise ValueError(f"Unsupported operator: {op_string}")
+        return self._copy(
+            filters=self._filters + ((field_path, op_string, value),)
+        )
+
+    def order_by(self, field_path, direction=ASCENDING):
+        if direction not in (ASCENDING, DESCENDING):
+            raise ValueError(f"Invalid direction: {direction}")
+        return self._copy(orders=self._orders + ((field_path, direction),))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def start_after(self, document_fields_or_snapshot):
+        cursor = document_fields_or_snapshot
+        if isinstance(cursor, DocumentSnapshot):
+            cursor = {**cursor.to_dict(), DOCUMENT_ID: cursor.id}
+        return self._copy(cursor=dict(cursor))
+
+    def count(self, alias=None):
+        return AggregationQuery(self, alias)
+
+    def stream(self, transaction=None):
+        if transaction is not None:
+            raise ValueError("Queries are not supported in transactions")
+        rows = self._client._run_query(self)
+        return (
+            DocumentSnapshot(
+                DocumentReference(self._client, self._collection, doc_id),
+                data, update_time
+            )
+            for doc_id, data, update_time in rows
+        )
+
+    def get(self, transaction=None):
+        return list(self.stream(transaction))
+
+
+class CollectionReference(Query):
+    def __init__(self, client, name):
+        super().__init__(client, name)
+        self.id = name
+
+    def document(self, document_id=None):
+        if document_id is None:
+            document_id = ''.join(random.choices(_ID_ALPHABET, k=20))
+        return DocumentReference(self._client, self.id, document_id)
+
+
+class AggregationResult:
+    def __init__(self, alias, value):
+        self.alias = alias
+        self.value = value
+
+
+class AggregationQuery:
+    def __init__(self, query, alias=None):
+        self._query = query
+        self._alias = alias or 'count'
+
+    def get(self):
+        count = self._query._client._count(self._query)
+        # Same shape as Firestore: one list of results per response
+        return [[AggregationResult(self._alias, count)]]
+
+
+class _QueryPlan:
+    """Evaluation of a query against a collection and its indexes."""
+
+    def __init__(self, store, query):
+        self.store = store
+        self.filters = query._filters
+        self.limit = query._limit
+        self.cursor = query._cursor
+
+        orders = list(query._orders)
+        if orders and DOCUMENT_ID not in [field for field, _ in orders]:
+            # Firestore breaks ties on the document ID, in the direction
+            # of the last ordering
+            orders.append((DOCUMENT_ID, orders[-1][1]))
+        self.orders = orders
+
+    def _index_lookups(self):
+        lookups = []
+        for field, op, value in self.filters:
+            index = self.store.ids if field == DOCUMENT_ID else (
+                self.store.indexes.get(field)
+            )
+            ids = index.lookup(op, value) if index else None
+            if ids is not None:
+                lookups.append(ids)
+        return lookups
+
+    def _candidates(self):
+        """Smallest set of IDs the indexes narrow the filters down to."""
+        return min(self._index_lookups(), key=len, default=None)
+
+    def count(self):
+        lookups = self._index_lookups()
+        if (len(lookups) == len(self.filters) and lookups
+                and not self.orders and self.cursor is None):
+            # Every filter is answered by an index: no document is read
+            lookups.sort(key=len)
+            count = len(lookups[0].intersection(*lookups[1:])
+                        if len(lookups) > 1 else lookups[0])
+            return count if self.limit is None else min(count, self.limit)
+        return sum(1 for _ in self.rows())
+
+    def _keep(self, doc_id, data):
+        for field, op, value in self.filters:
+            if field == DOCUMENT_ID:
+                if not _matches(doc_id, op, value):
+                    return False
+            elif field not in data or not _matches(data[field], op, value):
+                return False
+        # Ordering on a field skips documents that do not have it
+        return all(
+            field == DOCUMENT_ID or field in data for field, _ in self.orders
+        )
+
+    def _sort_values(self, doc_id, data):
+        return [
+            order_key(doc_id if field == DOCUMENT_ID else data[field])
+            for field, _ in self.orders
+        ]
+
+    def _after_cursor(self, values):
+        cursor = [
+            order_key(self.cursor.get(field)) for field, _ in self.orders
+        ]
+        for value, bound, (_, direction) in zip(values, cursor, self.orders):
+            if value != bound:
+                return (value > bound) == (direction == ASCENDING)
+        return False
+
+    def _index_scan(self):
+        """Ordered rows read from a sorted index, or None if none fits."""
+        if not self.orders or self.orders[0][0] == DOCUMENT_ID:
+            # Ordered by ID only
+            field = DOCUMENT_ID
+            direction = self.orders[0][1] if self.orders else ASCENDING
+            index = self.store.ids
+        elif len(self.orders) == 2 and self.orders[1][0] == DOCUMENT_ID:
+            (field, direction), (_, id_direction) = self.orders
+            index = self.store.indexes.get(field)
+            if index is None or index.kind != 'sorted' or direction != (
+                id_direction
+            ):
+                return None
+        else:
+            return None
+
+        candidates = self._candidates()
+        if field == DOCUMENT_ID and candidates is not None and (
+            self.limit is None
+            or self.limit * len(self.store.documents) > len(candidates) ** 2
+        ):
+            # A page scans about limit * documents / candidates IDs: past
+            # the number of candidates, sorting their IDs is cheaper
+            index = _Index('sorted')
+            index.entries = [
+                (order_key(doc_id), doc_id) for doc_id in sorted(candidates)
+            ]
+            candidates = None
+
+        after = None
+        if self.cursor is not None:
+            after = (order_key(self.cursor.get(field)),
+                     self.cursor.get(DOCUMENT_ID))
+        documents = self.store.documents
+
+        def rows():
+            for _, doc_id in index.scan(direction, after):
+                if candidates is not None and doc_id not in candidates:
+                    continue
+                data, update_time = documents[doc_id]
+                if self._keep(doc_id, data):
+                    yield doc_id, data, update_time
+        return rows()
+
+    def rows(self):
+        rows = self._index_scan()
+        if rows is None:
+            rows = self._sorted_rows()
+        if self.limit is not None:
+            rows = itertools.islice(rows, self.limit)
+        return rows
+
+    def _sorted_rows(self):
+        candidates = self._candidates()
+        documents = self.store.documents
+        if candidates is None:
+            items = documents.items()
+        else:
+            items = ((doc_id, documents[doc_id]) for doc_id in candidates)
+
+        rows = [
+            (doc_id, data, update_time)
+            for doc_id, (data, update_time) in items
+            if self._keep(doc_id, data)
+        ]
+
+        if not self.orders:
+            rows.sort(key=_first)
+            return iter(rows)
+
+        keyed = [(self._sort_values(row[0], row[1]), row) for row in rows]
+        # Stable sorts from the last ordering to the first
+        for position in range(len(self.orders) - 1, -1, -1):
+            keyed.sort(
+                key=lambda item: item[0][position],
+                reverse=self.orders[position][1] == DESCENDING
+            )
+        if self.cursor is not None:
+            keyed = [item for item in keyed if self._after_cursor(item[0])]
+        return (row for _, row in keyed)
+
+
+class WriteBatch:
+    def __init__(self, client):
+        self._client = client
+        self._writes = []
+
+    def set(self, reference, document_data, merge=False):
+        self._writes.append(
+            ('merge' if merge else 'set', reference, document_data, None)
+        )
+        return self
+
+    def update(self, reference, field_updates, option=None):
+        self._writes.append(('update', reference, field_updates, option))
+        return self
+
+    def delete(self, reference, option=None):
+        self._writes.append(('delete', reference, None, option))
+        return self
+
+    def commit(self):
+        # Writes are applied together, in the order they were staged
+        writes, self._writes = self._writes, []
+        return self._client._commit(writes)
+
+
+class Transaction(WriteBatch):
+    """Optimistic transaction: the commit is aborted if a document read
+    through the transaction changed in the meantime."""
+
+    def __init__(self, client, max_attempts=5, read_only=False):
+        super().__init__(client)
+        self._max_attempts = max_attempts
+        self._read_only = read_only
+        self._read_versions = {}
+
+    def _reset(self):
+        self._writes = []
+        self._read_versions = {}
+
+    def get_all(self, references, field_paths=None):
+        if self._writes:
+            raise ValueError("Transactions must read before they write")
+        snapshots = []
+        for reference in references:
+            snapshot = self._client._snapshot(reference)
+            self._read_versions.setdefault(
+                (reference._collection, reference.id), snapshot.update_time
+            )
+            if field_paths is not None:
+                snapshot = self._client._snapshot(reference, field_paths)
+            snapshots.append(snapshot)
+        return snapshots
+
+    def get(self, ref_or_query):
+        if isinstance(ref_or_query, DocumentReference):
+            return iter(self.get_all([ref_or_query]))
+        raise ValueError("Queries are not supported in transactions")
+
+    def _write(self, write):
+        if self._read_only:
+            raise ValueError("Cannot write in a read-only transaction")
+        self._writes.append(write)
+        return self
+
+    def set(self, reference, document_data, merge=False):
+        return self._write(
+            ('merge' if merge else 'set', reference, document_data, None)
+        )
+
+    def update(self, reference, field_updates, option=None):
+        return self._write(('update', reference, field_updates, option))
+
+    def delete(self, reference, option=None):
+        return self._write(('delete', reference, None, option))
+
+    def _commit(self):
+        writes, self._writes = self._writes, []
+        if not writes:
+            return []
+        return self._client._commit(writes, self._read_versions)
+
+    def commit(self):
+        return self._commit()
+
+
+def transactional(to_wrap):
+    """Run a function in a transaction, retried when its reads changed
+    before it could commit, like firestore.transactional."""
+
+    @functools.wraps(to_wrap)
+    def wrapper(transaction, *args, **kwargs):
+        last_error = None
+        for _ in range(transaction._max_attempts):
+            transaction._reset()
+            try:
+                result = to_wrap(transaction, *args, **kwargs)
+                transaction._commit()
+                return result
+            except Aborted as error:
+                last_error = error
+            finally:
+                transaction._writes = []
+        raise ValueError(
+            f"Failed to commit transaction in "
+            f"{transaction._max_attempts} attempts."
+        ) from last_error
+
+    return wrapper
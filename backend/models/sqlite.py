@@ -0,0 +1,514 @@
+"""SQLite storage engine with the client surface of Firestore.
+
+For deployments that cannot reach Google Cloud. Each collection is a
+table of JSON documents; the fields declared in the models' INDEXES are
+exposed as generated columns with a B-tree index, so their filters and
+orderings are served by SQLite's query planner. The database runs in WAL
+mode so readers never wait for the writer, and each thread uses its own
+connection, whose prepared statements are cached by the sqlite3 module.
+
+Batches and transactions are applied in one IMMEDIATE transaction: the
+preconditions are checked and the documents written with executemany()
+before a single commit.
+"""
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+from functools import lru_cache
+
+from google.api_core.exceptions import Aborted
+from google.api_core.exceptions import InvalidArgument
+from google.api_core.exceptions import NotFound
+from google.api_core.exceptions import ServiceUnavailable
+
+from models.memory import ASCENDING
+from models.memory import DOCUMENT_ID
+from models.memory import MAX_BATCH_WRITES
+from models.memory import BaseClient
+from models.memory import DocumentSnapshot
+from models.memory import WriteResult
+from models.memory import _apply_update
+from models.memory import _merge
+from models.memory import _project
+
+# Statements kept prepared by each connection
+STATEMENT_CACHE_SIZE = 256
+
+# Bound parameters per statement, below SQLite's default limit
+MAX_PARAMETERS = 900
+
+# Columns of every collection table, which document fields cannot shadow
+_RESERVED_COLUMNS = {'id', 'data', 'update_time'}
+
+_EPOCH = datetime.fromtimestamp(0, timezone.utc)
+
+
+def _quote(identifier):
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _json_path(field_path):
+    return '$' + ''.join(
+        '.' + _quote(field) for field in field_path.split('.')
+    )
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot store {type(value).__name__} values")
+
+
+def _dumps(data):
+    return json.dumps(data, separators=(',', ':'), default=_encode_value)
+
+
+def _write_error(error):
+    """The Firestore error callers handle for a failed SQLite write: lock
+    contention is retryable like a Firestore conflict, other engine
+    failures (disk full, I/O) mean the storage is unavailable."""
+    if 'locked' in str(error):
+        return Aborted(f"SQLite: {error}")
+    return ServiceUnavailable(f"SQLite: {error}")
+
+
+def _sql_types(value):
+    """SQLite storage classes comparable with a range filter value."""
+    if isinstance(value, (bool, int, float)):
+        return ('integer', 'real')
+    if isinstance(value, bytes):
+        return ('blob', 'blob')
+    return ('text', 'text')
+
+
+def _parameter(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _seeks(orders, cursor_nulls):
+    """Whether a keyset condition can be one row value comparison."""
+    if any(cursor_nulls) or len({direction for _, direction in orders}) > 1:
+        return False
+    # Nulls sort last in a descending order, which the comparison only
+    # accounts for on the first field
+    return orders[0][1] == ASCENDING or all(
+        field == DOCUMENT_ID for field, _ in orders[1:]
+    )
+
+
+class SqliteClient(BaseClient):
+    """SQLite database exposing the subset of the Firestore client used
+    by the services.
+
+    `indexes` maps collection names to the fields to index; the
+    'hash'/'sorted' kinds of the in-memory engine both map to a B-tree.
+    """
+
+    def __init__(self, path, indexes=None):
+        self._path = path
+        self._index_specs = indexes or {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._tables = {}
+        self._connections = []
+
+    # Connections
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self._path,
+                isolation_level=None,
+                # Only this thread uses it, but close() runs in another
+                check_same_thread=False,
+                cached_statements=STATEMENT_CACHE_SIZE,
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute('PRAGMA busy_timeout=5000')
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def close(self):
+        """Close the connections of every thread."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+        self._local = threading.local()
+
+    # Schema
+
+    def _table(self, name):
+        """Indexed fields of a collection, creating its table if needed."""
+        columns = self._tables.get(name)
+        if columns is not None:
+            return columns
+
+        fields = set(self._index_specs.get(name, {}))
+        reserved = fields & _RESERVED_COLUMNS
+        if reserved:
+            raise ValueError(f"Cannot index reserved fields: {reserved}")
+
+        table = _quote(name)
+        connection = self._connection()
+        with self._lock:
+            connection.execute(
+                f'CREATE TABLE IF NOT EXISTS {table} ('
+                'id TEXT PRIMARY KEY, data TEXT NOT NULL, '
+                'update_time TEXT NOT NULL)'
+            )
+            existing = {
+                row[1] for row in connection.execute(
+                    f'PRAGMA table_xinfo({table})'
+                )
+            }
+            for field in sorted(fields):
+                column = _quote(field)
+                if field not in existing:
+                    # Virtual columns can be added to existing tables
+                    connection.execute(
+                        f'ALTER TABLE {table} ADD COLUMN {column} '
+                        f"GENERATED ALWAYS AS (json_extract(data, "
+                        f"'{_json_path(field)}')) VIRTUAL"
+                    )
+                connection.execute(
+                    f'CREATE INDEX IF NOT EXISTS '
+                    f'{_quote(f"{name}_{field}")} ON {table} ({column}, id)'
+                )
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS _meta ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL)'
+            )
+            self._tables[name] = frozenset(fields)
+        return self._tables[name]
+
+    def _column(self, collection, field_path):
+        if field_path == DOCUMENT_ID:
+            return 'id'
+        if field_path in self._table(collection):
+            return _quote(field_path)
+        return f"json_extract(data, '{_json_path(field_path)}')"
+
+    def reset(self):
+        """Drop every document, keeping the tables and their indexes."""
+        connection = self._connection()
+        tables = [
+            row[0] for row in connection.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' "
+                "AND name NOT LIKE 'sqlite_%'"
+            )
+        ]
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            for table in tables:
+                connection.execute(f'DELETE FROM {_quote(table)}')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    # Reads
+
+    def _select(self, connection, collection, doc_ids):
+        """{ID: (JSON data, update time)} of the existing documents."""
+        self._table(collection)
+        table = _quote(collection)
+        rows = {}
+        doc_ids = list(doc_ids)
+        for start in range(0, len(doc_ids), MAX_PARAMETERS):
+            chunk = doc_ids[start:start + MAX_PARAMETERS]
+            placeholders = ', '.join('?' * len(chunk))
+            for doc_id, data, update_time in connection.execute(
+                f'SELECT id, data, update_time FROM {table} '
+                f'WHERE id IN ({placeholders})', chunk
+            ):
+                rows[doc_id] = (data, update_time)
+        return rows
+
+    def _snapshots(self, references, field_paths=None):
+        connection = self._connection()
+        keys = {}
+        for reference in references:
+            keys.setdefault(reference._collection, set()).add(reference.id)
+        stored = {
+            collection: self._select(connection, collection, doc_ids)
+            for collection, doc_ids in keys.items()
+        }
+
+        snapshots = []
+        for reference in references:
+            row = stored[reference._collection].get(reference.id)
+            if row is None:
+                snapshots.append(DocumentSnapshot(reference, None, None))
+                continue
+            data = json.loads(row[0])
+            if field_paths is not None:
+                data = _project(data, field_paths)
+            snapshots.append(DocumentSnapshot(
+                reference, data, datetime.fromisoformat(row[1])
+            ))
+        return snapshots
+
+    def _run_query(self, query):
+        """Matching (ID, data, update time) rows, in the query's order.
+
+        The statement runs right away, but rows are decoded as the cursor
+        is consumed, so streaming a large result holds one row at a time.
+        """
+        sql, parameters = self._compile(query, 'id, data, update_time')
+        cursor = self._connection().execute(sql, parameters)
+        return (
+            (doc_id, json.loads(data), datetime.fromisoformat(update_time))
+            for doc_id, data, update_time in cursor
+        )
+
+    def _count(self, query):
+        sql, parameters = self._compile(query, '1')
+        return self._connection().execute(
+            f'SELECT COUNT(*) FROM ({sql})', parameters
+        ).fetchone()[0]
+
+    def _compile(self, query, columns):
+        collection = query._collection
+        self._table(collection)
+        orders = list(query._orders)
+        if DOCUMENT_ID not in [field for field, _ in orders]:
+            # Firestore breaks ties on the document ID, in the direction
+            # of the last ordering
+            orders.append(
+                (DOCUMENT_ID, orders[-1][1] if orders else ASCENDING)
+            )
+
+        values = cursor_nulls = None
+        if query._cursor is not None:
+            values = [
+                _parameter(query._cursor.get(field)) for field, _ in orders
+            ]
+            # Null cursor values change the keyset condition
+            cursor_nulls = tuple(value is None for value in values)
+        shape = (
+            collection,
+            tuple(
+                (field, op, len(value) if op in ('in', 'not-in') else None)
+                for field, op, value in query._filters
+            ),
+            tuple(orders),
+            cursor_nulls,
+            query._limit is not None,
+            columns,
+        )
+        parameters = []
+        for field, op, value in query._filters:
+            if op in ('in', 'not-in'):
+                parameters.extend(_parameter(item) for item in value)
+            elif op in ('<', '<=', '>', '>='):
+                parameters.append(_parameter(value))
+                parameters.extend(_sql_types(value))
+            else:
+                parameters.append(_parameter(value))
+        if values is not None:
+            if _seeks(orders, cursor_nulls):
+                parameters.extend(values)
+            else:
+                for position, (_, direction) in enumerate(orders):
+                    bound = values[position]
+                    if bound is None and direction != ASCENDING:
+                        continue
+                    parameters.extend(values[:position])
+                    if bound is not None:
+                        parameters.append(bound)
+        if query._limit is not None:
+            parameters.append(query._limit)
+        return self._statement(shape), parameters
+
+    @lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+    def _statement(self, shape):
+        """SQL text of a query shape, so equal shapes share a statement."""
+        collection, filters, orders, cursor_nulls, has_limit, columns = shape
+        conditions = []
+        for field, op, size in filters:
+            column = self._column(collection, field)
+            if op == '==':
+                conditions.append(f'{column} = ?')
+            elif op == '!=':
+                conditions.append(f'{column} IS NOT NULL AND {column} != ?')
+            elif op == 'in':
+                conditions.append(f"{column} IN ({', '.join('?' * size)})")
+            elif op == 'not-in':
+                conditions.append(
+                    f"{column} IS NOT NULL AND "
+                    f"{column} NOT IN ({', '.join('?' * size)})"
+                )
+            elif op in ('array_contains', 'array-contains'):
+                conditions.append(
+                    f"EXISTS (SELECT 1 FROM json_each(data, "
+                    f"'{_json_path(field)}') WHERE value = ?)"
+                )
+            else:
+                # Range filters only match values of the same type
+                conditions.append(
+                    f'{column} {op} ? AND typeof({column}) IN (?, ?)'
+                )
+
+        # Ordering on a field skips documents that do not have it, but
+        # keeps those where it is null, which sort first
+        ordered = [
+            (self._column(collection, field), direction)
+            for field, direction in orders
+        ]
+        conditions.extend(
+            f"json_type(data, '{_json_path(field)}') IS NOT NULL"
+            for field, _ in orders if field != DOCUMENT_ID
+        )
+        if cursor_nulls is not None and _seeks(orders, cursor_nulls):
+            # Keyset condition: strictly after the cursor in the ordering.
+            # A row value comparison lets SQLite seek in the index instead
+            # of filtering every row; it never matches null values, which
+            # only come after the cursor in a descending order.
+            direction = ordered[0][1]
+            condition = (
+                f"({', '.join(column for column, _ in ordered)}) "
+                f"{'>' if direction == ASCENDING else '<'} "
+                f"({', '.join('?' * len(ordered))})"
+            )
+            if direction != ASCENDING and ordered[0][0] != 'id':
+                condition = f'({condition} OR {ordered[0][0]} IS NULL)'
+            conditions.append(condition)
+        elif cursor_nulls is not None:
+            alternatives = []
+            for position, (column, direction) in enumerate(ordered):
+                null = cursor_nulls[position]
+                if null and direction != ASCENDING:
+                    # Nothing sorts before null
+                    continue
+                terms = [f'{previous} IS ?' for previous, _ in
+                         ordered[:position]]
+                if null:
+                    terms.append(f'{column} IS NOT NULL')
+                elif direction == ASCENDING:
+                    terms.append(f'{column} > ?')
+                else:
+                    terms.append(f'({column} < ? OR {column} IS NULL)')
+                alternatives.append('(' + ' AND '.join(terms) + ')')
+            conditions.append('(' + ' OR '.join(alternatives) + ')')
+
+        sql = f'SELECT {columns} FROM {_quote(collection)}'
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY ' + ', '.join(
+            f"{column} {'ASC' if direction == ASCENDING else 'DESC'}"
+            for column, direction in ordered
+        )
+        if has_limit:
+            sql += ' LIMIT ?'
+        return sql
+
+    # Writes
+
+    def _next_update_time(self, connection):
+        # Strictly increasing across processes sharing the database
+        row = connection.execute(
+            "SELECT value FROM _meta WHERE key = 'last_update'"
+        ).fetchone()
+        last = datetime.fromisoformat(row[0]) if row else _EPOCH
+        now = datetime.now(timezone.utc)
+        if now <= last:
+            now = last + timedelta(microseconds=1)
+        connection.execute(
+            "INSERT OR REPLACE INTO _meta (key, value) "
+            "VALUES ('last_update', ?)", (now.isoformat(),)
+        )
+        return now
+
+    def _commit(self, writes, read_versions=None):
+        if len(writes) > MAX_BATCH_WRITES:
+            raise InvalidArgument(
+                f"maximum {MAX_BATCH_WRITES} writes allowed per request"
+            )
+        keys = {}
+        for _, reference, _, _ in writes:
+            keys.setdefault(reference._collection, set()).add(reference.id)
+        for collection, doc_id in read_versions or {}:
+            keys.setdefault(collection, set()).add(doc_id)
+
+        connection = self._connection()
+        try:
+            # Take the write lock up front, so the documents read below
+            # cannot change before the commit
+            connection.execute('BEGIN IMMEDIATE')
+        except sqlite3.OperationalError as error:
+            raise _write_error(error) from error
+        try:
+            stored = {
+                collection: {
+                    doc_id: (data, datetime.fromisoformat(update_time))
+                    for doc_id, (data, update_time) in self._select(
+                        connection, collection, doc_ids
+                    ).items()
+                }
+                for collection, doc_ids in keys.items()
+            }
+            for key, version in (read_versions or {}).items():
+                row = stored[key[0]].get(key[1])
+                if (row[1] if row else None) != version:
+                    raise Aborted(
+                        f"{key[0]}/{key[1]} was modified concurrently"
+                    )
+
+            staged = {}
+            for kind, reference, data, option in writes:
+                key = (reference._collection, reference.id)
+                if key in staged:
+                    current = staged[key]
+                else:
+                    row = stored[key[0]].get(key[1])
+                    current = json.loads(row[0]) if row else None
+                    if option is not None:
+                        option.check(reference, row)
+
+                if kind == 'update' and current is None:
+                    raise NotFound(f"No document to update: {key[0]}/{key[1]}")
+                if kind == 'delete':
+                    staged[key] = None
+                elif kind == 'update':
+                    staged[key] = _apply_update(current, data)
+                elif kind == 'merge':
+                    staged[key] = _merge(current or {}, data)
+                else:
+                    staged[key] = _apply_update({}, data)
+
+            update_time = self._next_update_time(connection)
+            encoded_time = update_time.isoformat()
+            upserts, deletes = {}, {}
+            for (collection, doc_id), data in staged.items():
+                if data is None:
+                    deletes.setdefault(collection, []).append((doc_id,))
+                else:
+                    upserts.setdefault(collection, []).append(
+                        (doc_id, _dumps(data), encoded_time)
+                    )
+            for collection, rows in upserts.items():
+                connection.executemany(
+                    f'INSERT OR REPLACE INTO {_quote(collection)} '
+                    '(id, data, update_time) VALUES (?, ?, ?)', rows
+                )
+            for collection, rows in deletes.items():
+                connection.executemany(
+                    f'DELETE FROM {_quote(collection)} WHERE id = ?', rows
+                )
+            connection.execute('COMMIT')
+        except BaseException as error:
+            connection.execute('ROLLBACK')
+            if isinstance(error, sqlite3.OperationalError):
+                raise _write_error(error) from error
+            raise
+        return [WriteResult(update_time) for _ in writes]
@@ -0,0 +1,22 @@
+COLLECTION_NAME = 'stats'
+
+# Single document holding the counters served by /api/stats
+COUNTERS_DOCUMENT = 'counters'
+
+COUNTER_FIELDS = [
+    'total_books',
+    'available_books',
+    'total_members',
+    'active_loans',
+    'overdue_loans',
+]
+
+# Watermark of the overdue sweep: loans due before it have been flagged
+SWEEP_DOCUMENT = 'overdue_sweep'
+
+# Bumped on every write to a collection, used to build list ETags
+VERSION_FIELDS = {
+    'books': 'books_version',
+    'members': 'members_version',
+    'loans': 'loans_version',
+}
@@ -0,0 +1,48 @@
+"""Codec of the model timestamps.
+
+Timestamps are stored as naive UTC ISO 8601 strings. Models keep the
+value they were given, string or datetime, and only convert it when the
+other form is needed: documents read from storage are re-encoded without
+being parsed, and parsing happens on first use as a datetime.
+"""
+from datetime import datetime
+from functools import lru_cache
+
+
+@lru_cache(maxsize=16384)
+def _fromisoformat(value):
+    # datetimes are immutable, so parsed values can be shared
+    return datetime.fromisoformat(value)
+
+
+def parse(value):
+    """Return a timestamp as a datetime (None stays None)."""
+    if isinstance(value, str):
+        return _fromisoformat(value)
+    return value
+
+
+def encode(value):
+    """Return a timestamp as an ISO 8601 string (None stays None)."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+class Timestamp:
+    """Model attribute read as a datetime, stored as given.
+
+    The raw value lives in the '_<name>' slot of the model, where
+    encode() finds it without a round trip through datetime.
+    """
+
+    def __set_name__(self, owner, name):
+        self.slot = getattr(owner, f'_{name}')
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        return parse(self.slot.__get__(instance, owner))
+
+    def __set__(self, instance, value):
+        self.slot.__set__(instance, value)
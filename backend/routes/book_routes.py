@@ -1,20 +1,99 @@
+import io
+
 from flask import Blueprint
+from flask import current_app
 from flask import request
 from flask import jsonify
 
 from services.book_service import create_new_book
 from services.book_service import delete_existing_book
-from services.book_service import get_all_books
 from services.book_service import get_book_by_id
+from services.book_service import get_books_page
+from services.book_service import iter_books
 from services.book_service import update_existing_book
+from services.import_service import CSV
+from services.import_service import FORMATS as IMPORT_FORMATS
+from services.import_service import NDJSON
+from services.import_service import import_books
+from services.pagination import PaginationError
+from services.pagination import parse_limit
+from services.search_service import search_books
+from services.stats_service import get_collection_versions
+
+from routes.etag import collection_etag
+from routes.etag import make_etag
+from routes.etag import not_modified
+from routes.etag import with_etag
+from routes.pagination import get_page_args
+from routes.pagination import get_stream_args
+from routes.pagination import page_response
+from routes.streaming import get_stream_format
+from routes.streaming import stream_response
 
 book_bp = Blueprint('books', __name__)
 
+IMPORT_CONTENT_TYPES = {
+    'text/csv': CSV,
+    'application/x-ndjson': NDJSON,
+}
+
 
 @book_bp.route('', methods=['GET'])
 def get_books():
-    books = get_all_books()
-    return jsonify([{**book.to_dict(), 'id': book.id} for book in books])
+    etag = collection_etag(['books'])
+    response = not_modified(etag)
+    if response:
+        return response
+
+    try:
+        fmt = get_stream_format()
+        if fmt:
+            books = iter_books(**get_stream_args())
+            response = stream_response(
+                (book.to_response() for book in books),
+                fmt
+            )
+            return with_etag(response, etag)
+
+        books, next_cursor = get_books_page(**get_page_args())
+    except PaginationError as e:
+        return jsonify({"error": str(e)}), 400
+
+    response = page_response(
+        [book.to_response() for book in books],
+        next_cursor
+    )
+    return with_etag(response, etag)
+
+
+@book_bp.route('/search', methods=['GET'])
+def search():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"error": "Le paramètre 'q' est requis"}), 400
+
+    try:
+        limit = parse_limit(
+            request.args.get('limit'),
+            default=current_app.config['SEARCH_RESULTS_LIMIT'],
+            maximum=current_app.config['MAX_PAGE_SIZE']
+        )
+    except PaginationError as e:
+        return jsonify({"error": str(e)}), 400
+
+    versions = get_collection_versions()
+    etag = collection_etag(['books'], versions=versions)
+    response = not_modified(etag)
+    if response:
+        return response
+
+    # Each worker's index lags behind other workers' writes: bring it up
+    # to the version of the ETag first
+    books = search_books(query, limit, versions['books'])
+    return with_etag(
+        jsonify([book.to_response() for book in books]),
+        etag
+    )
 
 
 @book_bp.route('/<book_id>', methods=['GET'])
@@ -23,10 +102,15 @@ def get_book(book_id):
     if not book:
         return jsonify({"error": "Livre non trouvé"}), 404
 
-    book_dict = book.to_dict()
-    book_dict['id'] = book.id  # Add the ID to the response
+    # Served from the lookup cache, a 304 needs no Firestore read at all
+    etag = make_etag(book.id, book.updated_at)
+    response = not_modified(etag)
+    if response:
+        return response
 
-    return jsonify(book_dict)
+    book_dict = book.to_response()
+
+    return with_etag(jsonify(book_dict), etag)
 
 
 @book_bp.route('', methods=['POST'])
@@ -47,16 +131,37 @@ def add_book():
         description=data.get('description')
     )
 
-    book_dict = book.to_dict()
-    book_dict['id'] = book.id  # Add the ID to the response
+    book_dict = book.to_response()
 
     return jsonify(book_dict), 201
 
 
+@book_bp.route('/bulk', methods=['POST'])
+def bulk_import_books():
+    fmt = (request.args.get('format')
+           or IMPORT_CONTENT_TYPES.get(request.mimetype))
+    if fmt not in IMPORT_FORMATS:
+        return jsonify({
+            "error": "Format d'import non supporté (csv ou ndjson)"
+        }), 400
+
+    # Rows are read from the request body as it arrives
+    lines = io.TextIOWrapper(request.stream, encoding='utf-8-sig',
+                             newline='')
+    try:
+        report = import_books(
+            lines, fmt, workers=current_app.config['IMPORT_WORKERS']
+        )
+    except UnicodeDecodeError:
+        return jsonify({"error": "Le fichier doit être encodé en UTF-8"}), 400
+
+    return jsonify(report)
+
+
 @book_bp.route('/<book_id>', methods=['PUT'])
 def update_book(book_id):
     data = request.get_json()
-    book = get_book_by_id(book_id)
+    book = get_book_by_id(book_id, cached=False)
 
     if not book:
         return jsonify({"error": "Livre non trouvé"}), 404
@@ -72,15 +177,14 @@ def update_book(book_id):
         is_available=data.get('is_available')
     )
 
-    book_dict = updated_book.to_dict()
-    book_dict['id'] = updated_book.id  # Add the ID to the response
+    book_dict = updated_book.to_response()
 
     return jsonify(book_dict)
 
 
 @book_bp.route('/<book_id>', methods=['DELETE'])
 def remove_book(book_id):
-    book = get_book_by_id(book_id)
+    book = get_book_by_id(book_id, cached=False)
 
     if not book:
         return jsonify({"error": "Livre non trouvé"}), 404
@@ -0,0 +1,38 @@
+import hashlib
+
+from flask import current_app
+from flask import request
+
+from services.stats_service import get_collection_versions
+
+
+def make_etag(*parts):
+    """Strong ETag from the values that fully determine a response body."""
+    payload = '\x1f'.join(str(part) for part in parts)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def collection_etag(collections, *parts, versions=None):
+    """ETag of a list response, from the versions of the collections it
+    reads and the request's query string."""
+    if versions is None:
+        versions = get_collection_versions()
+    return make_etag(
+        request.full_path,
+        *(versions[collection] for collection in collections),
+        *parts
+    )
+
+
+def not_modified(etag):
+    """Return a 304 response if the client already holds this version."""
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    return with_etag(current_app.response_class(status=304), etag)
+
+
+def with_etag(response, etag):
+    response.set_etag(etag)
+    # Let browsers keep the response but revalidate it on every use
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
@@ -0,0 +1,44 @@
+from flask import Blueprint
+from flask import Response
+from flask import jsonify
+from flask import request
+from flask import stream_with_context
+
+from services.export_service import EXPORTS
+from services.export_service import FORMATS
+from services.export_service import MIMETYPES
+from services.export_service import NDJSON
+from services.export_service import export_chunks
+from services.export_service import parse_since
+
+export_bp = Blueprint('export', __name__)
+
+
+@export_bp.route('/<collection>', methods=['GET'])
+def export_collection(collection):
+    if collection not in EXPORTS:
+        return jsonify({"error": "Collection inconnue"}), 404
+
+    fmt = request.args.get('format', NDJSON)
+    if fmt not in FORMATS:
+        return jsonify({
+            "error": "Format d'export non supporté (csv ou ndjson)"
+        }), 400
+
+    try:
+        since = parse_since(request.args.get('since'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Compressed on the fly for clients that accept it
+    compress = 'gzip' in request.accept_encodings
+    chunks = export_chunks(collection, fmt, since=since, compress=compress)
+
+    response = Response(stream_with_context(chunks), mimetype=MIMETYPES[fmt])
+    response.headers['Content-Disposition'] = (
+        f'attachment; filename="{collection}.{fmt}"'
+    )
+    response.vary.add('Accept-Encoding')
+    if compress:
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
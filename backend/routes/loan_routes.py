@@ -1,23 +1,112 @@
+import hmac
 from datetime import datetime
+from datetime import timezone
 
 from flask import Blueprint
+from flask import current_app
 from flask import jsonify
 from flask import request
 
-from services.book_service import get_book_by_id
 
+from services.loan_service import EXPANSIONS
+from services.loan_service import MAX_BATCH_LOANS
+from services.loan_service import LoanError
 from services.loan_service import create_new_loan
-from services.loan_service import get_all_loans
+from services.loan_service import create_new_loans
 from services.loan_service import get_loan_by_id
+from services.loan_service import get_loan_expansions
+from services.loan_service import get_loans_page
+from services.loan_service import iter_loans
 from services.loan_service import return_book_loan
+from services.loan_service import return_book_loans
+from services.loan_service import sweep_overdue_loans
+from services.pagination import PaginationError
+
+from routes.etag import collection_etag
+from routes.etag import make_etag
+from routes.etag import not_modified
+from routes.etag import with_etag
+from routes.pagination import get_page_args
+from routes.pagination import get_stream_args
+from routes.pagination import page_response
+from routes.streaming import chunked
+from routes.streaming import get_stream_format
+from routes.streaming import stream_response
 
 loan_bp = Blueprint('loans', __name__)
 
+# Loans whose books/members are fetched together when expanding a stream
+EXPAND_CHUNK_SIZE = 200
+
+# Header carrying Config.CRON_TOKEN on scheduled requests
+CRON_TOKEN_HEADER = 'X-Cron-Token'
+
+
+def _loan_dicts(loans, expand, now):
+    """Serialize loans, attaching their book/member projections."""
+    # Encoded once for the whole list
+    now_iso = now.isoformat()
+    expansions = get_loan_expansions(loans, expand) if expand else {}
+    for loan in loans:
+        loan_dict = loan.to_response(now=now_iso)
+        for name in expand:
+            loan_dict[name] = expansions.get(
+                (name, getattr(loan, f'{name}_id'))
+            )
+        yield loan_dict
+
+
+def _streamed_loan_dicts(loans, expand, now):
+    """Serialize a stream of loans, expanding them chunk by chunk."""
+    # A stream is never held whole: its books/members are fetched per chunk
+    for chunk in chunked(loans, EXPAND_CHUNK_SIZE):
+        yield from _loan_dicts(chunk, expand, now)
+
 
 @loan_bp.route('', methods=['GET'])
 def get_loans():
-    loans = get_all_loans()
-    return jsonify([{**loan.to_dict(), 'id': loan.id} for loan in loans])
+    # One reference time for the whole response, rounded to the minute so
+    # that is_overdue (and the ETag) only changes once a minute
+    now = datetime.utcnow().replace(second=0, microsecond=0)
+
+    expand = [name for name in request.args.get('expand', '').split(',')
+              if name]
+    for name in expand:
+        if name not in EXPANSIONS:
+            return jsonify({"error": f"Expansion inconnue : '{name}'"}), 400
+
+    etag = collection_etag(
+        ['loans'] + [f'{name}s' for name in expand], now.isoformat()
+    )
+    response = not_modified(etag)
+    if response:
+        return response
+
+    try:
+        fmt = get_stream_format()
+        if fmt:
+            loans = iter_loans(
+                status=request.args.get('status'),
+                now=now,
+                **get_stream_args()
+            )
+            response = stream_response(
+                _streamed_loan_dicts(loans, expand, now), fmt
+            )
+            return with_etag(response, etag)
+
+        loans, next_cursor = get_loans_page(
+            status=request.args.get('status'),
+            now=now,
+            **get_page_args()
+        )
+    except PaginationError as e:
+        return jsonify({"error": str(e)}), 400
+
+    response = page_response(
+        list(_loan_dicts(loans, expand, now)), next_cursor
+    )
+    return with_etag(response, etag)
 
 
 @loan_bp.route('/<loan_id>', methods=['GET'])
@@ -26,10 +115,28 @@ def get_loan(loan_id):
     if not loan:
         return jsonify({"error": "Emprunt non trouvé"}), 404
 
-    loan_dict = loan.to_dict()
-    loan_dict['id'] = loan.id  # Add the ID to the response
+    # Loans have no updated_at: their state is the return plus is_overdue
+    now = datetime.utcnow()
+    is_overdue = not loan.returned and now > loan.due_date
+    etag = make_etag(loan.id, loan.due_date, loan.return_date, is_overdue)
+    response = not_modified(etag)
+    if response:
+        return response
 
-    return jsonify(loan_dict)
+    loan_dict = loan.to_response(now=now)
+
+    return with_etag(jsonify(loan_dict), etag)
+
+
+def _parse_date(data, field):
+    """Optional ISO 8601 date of a request body, as naive UTC."""
+    if field not in data:
+        return None
+    value = datetime.fromisoformat(data[field])
+    if value.tzinfo is not None:
+        # Timestamps are stored as naive UTC
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
 
 
 @loan_bp.route('', methods=['POST'])
@@ -41,29 +148,23 @@ def add_loan():
         if field not in data:
             return jsonify({"error": f"Le champ '{field}' est requis"}), 400
 
-    # Vérifier si le livre est disponible
-    book = get_book_by_id(data['book_id'])
-    if not book:
-        return jsonify({"error": "Livre non trouvé"}), 404
-
-    if not book.is_available:
-        return jsonify({"error": "Ce livre n'est pas disponible"}), 400
-
-    loan = create_new_loan(
-        book_id=data['book_id'],
-        member_id=data['member_id'],
-        loan_date=(
-            datetime.fromisoformat(data['loan_date'])
-            if 'loan_date' in data else None
-        ),
-        due_date=(
-            datetime.fromisoformat(data['due_date'])
-            if 'due_date' in data else None
+    try:
+        loan_date = _parse_date(data, 'loan_date')
+        due_date = _parse_date(data, 'due_date')
+    except (TypeError, ValueError):
+        return jsonify({"error": "Date invalide"}), 400
+
+    try:
+        loan = create_new_loan(
+            book_id=data['book_id'],
+            member_id=data['member_id'],
+            loan_date=loan_date,
+            due_date=due_date
         )
-    )
+    except LoanError as e:
+        return jsonify({"error": str(e)}), e.status_code
 
-    loan_dict = loan.to_dict()
-    loan_dict['id'] = loan.id  # Add the ID to the response
+    loan_dict = loan.to_response()
 
     return jsonify(loan_dict), 201
 
@@ -78,9 +179,106 @@ def return_loan(loan_id):
     if loan.returned:
         return jsonify({"error": "Ce livre a déjà été retourné"}), 400
 
-    updated_loan = return_book_loan(loan)
+    try:
+        updated_loan = return_book_loan(loan)
+    except LoanError as e:
+        return jsonify({"error": str(e)}), e.status_code
 
-    loan_dict = updated_loan.to_dict()
-    loan_dict['id'] = updated_loan.id  # Add the ID to the response
+    loan_dict = updated_loan.to_response()
 
     return jsonify(loan_dict)
+
+
+def _batch_results(results, success_status):
+    """One entry per item of a batch: the loan, or why it was refused."""
+    items = []
+    for result in results:
+        if isinstance(result, LoanError):
+            items.append({
+                "status": result.status_code, "error": str(result)
+            })
+        else:
+            items.append({
+                "status": success_status,
+                "loan": result.to_response()
+            })
+    return jsonify(items)
+
+
+def _get_batch_items(data, field):
+    items = data.get(field) if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        return None, (jsonify({
+            "error": f"Le champ '{field}' doit être une liste non vide"
+        }), 400)
+    if len(items) > MAX_BATCH_LOANS:
+        return None, (jsonify({
+            "error": f"Au plus {MAX_BATCH_LOANS} éléments par lot"
+        }), 400)
+    return items, None
+
+
+@loan_bp.route('/batch', methods=['POST'])
+def add_loans():
+    items, error = _get_batch_items(request.get_json(), 'loans')
+    if error:
+        return error
+
+    checkouts = []
+    for index, item in enumerate(items):
+        for field in ['book_id', 'member_id']:
+            if not isinstance(item, dict) or field not in item:
+                return jsonify({
+                    "error": f"Le champ '{field}' est requis (élément {index})"
+                }), 400
+        try:
+            checkouts.append((
+                item['book_id'],
+                item['member_id'],
+                _parse_date(item, 'loan_date'),
+                _parse_date(item, 'due_date')
+            ))
+        except (TypeError, ValueError):
+            return jsonify({"error": f"Date invalide (élément {index})"}), 400
+
+    try:
+        results = create_new_loans(checkouts)
+    except LoanError as e:
+        return jsonify({"error": str(e)}), e.status_code
+
+    return _batch_results(results, 201)
+
+
+@loan_bp.route('/return/batch', methods=['PUT'])
+def return_loans():
+    loan_ids, error = _get_batch_items(request.get_json(), 'loan_ids')
+    if error:
+        return error
+    if not all(isinstance(loan_id, str) and loan_id for loan_id in loan_ids):
+        return jsonify({
+            "error": "Le champ 'loan_ids' doit contenir des identifiants"
+        }), 400
+
+    try:
+        results = return_book_loans(loan_ids)
+    except LoanError as e:
+        return jsonify({"error": str(e)}), e.status_code
+
+    return _batch_results(results, 200)
+
+
+@loan_bp.route('/overdue/sweep', methods=['POST'])
+def sweep_overdue():
+    # Triggered by a scheduler (e.g. Cloud Scheduler) sending the token
+    token = current_app.config['CRON_TOKEN']
+    if not token or not hmac.compare_digest(
+        request.headers.get(CRON_TOKEN_HEADER, '').encode(), token.encode()
+    ):
+        return jsonify({"error": "Jeton de planification invalide"}), 403
+
+    try:
+        report = sweep_overdue_loans()
+    except LoanError as e:
+        return jsonify({"error": str(e)}), e.status_code
+
+    return jsonify(report)
@@ -4,20 +4,51 @@ from flask import request
 
 from services.member_service import create_new_member
 from services.member_service import delete_existing_member
-from services.member_service import get_all_members
 from services.member_service import get_member_by_id
+from services.member_service import get_members_page
+from services.member_service import iter_members
 from services.member_service import update_existing_member
+from services.pagination import PaginationError
+
+from routes.etag import collection_etag
+from routes.etag import make_etag
+from routes.etag import not_modified
+from routes.etag import with_etag
+from routes.pagination import get_page_args
+from routes.pagination import get_stream_args
+from routes.pagination import page_response
+from routes.streaming import get_stream_format
+from routes.streaming import stream_response
 
 member_bp = Blueprint('members', __name__)
 
 
 @member_bp.route('', methods=['GET'])
 def get_members():
-    members = get_all_members()
-    return jsonify([
-        {**member.to_dict(), 'id': member.id}
-        for member in members
-    ])
+    etag = collection_etag(['members'])
+    response = not_modified(etag)
+    if response:
+        return response
+
+    try:
+        fmt = get_stream_format()
+        if fmt:
+            members = iter_members(**get_stream_args())
+            response = stream_response(
+                (member.to_response() for member in members),
+                fmt
+            )
+            return with_etag(response, etag)
+
+        members, next_cursor = get_members_page(**get_page_args())
+    except PaginationError as e:
+        return jsonify({"error": str(e)}), 400
+
+    response = page_response(
+        [member.to_response() for member in members],
+        next_cursor
+    )
+    return with_etag(response, etag)
 
 
 @member_bp.route('/<member_id>', methods=['GET'])
@@ -26,10 +57,15 @@ def get_member(member_id):
     if not member:
         return jsonify({"error": "Membre non trouvé"}), 404
 
-    member_dict = member.to_dict()
-    member_dict['id'] = member.id  # Add the ID to the response
+    # Served from the lookup cache, a 304 needs no Firestore read at all
+    etag = make_etag(member.id, member.updated_at)
+    response = not_modified(etag)
+    if response:
+        return response
 
-    return jsonify(member_dict)
+    member_dict = member.to_response()
+
+    return with_etag(jsonify(member_dict), etag)
 
 
 @member_bp.route('', methods=['POST'])
@@ -50,8 +86,7 @@ def add_member():
         id_card_number=data.get('id_card_number')
     )
 
-    member_dict = member.to_dict()
-    member_dict['id'] = member.id  # Add the ID to the response
+    member_dict = member.to_response()
 
     return jsonify(member_dict), 201
 
@@ -59,7 +94,7 @@ def add_member():
 @member_bp.route('/<member_id>', methods=['PUT'])
 def update_member(member_id):
     data = request.get_json()
-    member = get_member_by_id(member_id)
+    member = get_member_by_id(member_id, cached=False)
 
     if not member:
         return jsonify({"error": "Membre non trouvé"}), 404
@@ -74,15 +109,14 @@ def update_member(member_id):
         id_card_number=data.get('id_card_number')
     )
 
-    member_dict = updated_member.to_dict()
-    member_dict['id'] = updated_member.id  # Add the ID to the response
+    member_dict = updated_member.to_response()
 
     return jsonify(member_dict)
 
 
 @member_bp.route('/<member_id>', methods=['DELETE'])
 def remove_member(member_id):
-    member = get_member_by_id(member_id)
+    member = get_member_by_id(member_id, cached=False)
 
     if not member:
         return jsonify({"error": "Membre non trouvé"}), 404
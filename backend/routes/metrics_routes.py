@@ -0,0 +1,41 @@
+import time
+
+from flask import Blueprint
+from flask import Response
+from flask import current_app
+from flask import g
+from flask import request
+
+from services import metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+# Prometheus text exposition format
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+@metrics_bp.before_app_request
+def start_timer():
+    if current_app.config['METRICS_ENABLED']:
+        g.metrics_start = time.perf_counter()
+        metrics.start_request()
+
+
+@metrics_bp.after_app_request
+def record_request(response):
+    start = g.pop('metrics_start', None)
+    if start is None:
+        return response
+
+    # The route pattern, not the path, keeps the label values bounded.
+    # Streamed bodies (exports) are timed up to their first byte.
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.observe_request(route, request.method, response.status_code,
+                            time.perf_counter() - start)
+    return response
+
+
+@metrics_bp.route('', methods=['GET'])
+def get_metrics():
+    return Response(metrics.render(metrics.collect()),
+                    content_type=CONTENT_TYPE)
@@ -0,0 +1,39 @@
+from flask import current_app
+from flask import jsonify
+from flask import request
+
+from services.pagination import parse_limit
+
+# Response header carrying the opaque cursor of the next page
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+
+def get_page_args():
+    """Read the limit, cursor and sort query parameters of a list request."""
+    return {
+        'limit': parse_limit(
+            request.args.get('limit'),
+            default=current_app.config['DEFAULT_PAGE_SIZE'],
+            maximum=current_app.config['MAX_PAGE_SIZE']
+        ),
+        'cursor': request.args.get('cursor'),
+        'sort': request.args.get('sort'),
+    }
+
+
+def get_stream_args():
+    """Same as get_page_args, but a streamed list has no default limit."""
+    return {
+        'limit': parse_limit(
+            request.args.get('limit'), default=None, maximum=None
+        ),
+        'cursor': request.args.get('cursor'),
+        'sort': request.args.get('sort'),
+    }
+
+
+def page_response(items, next_cursor):
+    response = jsonify(items)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return response
@@ -0,0 +1,81 @@
+from flask import Blueprint
+from flask import g
+from flask import jsonify
+from flask import request
+from flask import send_file
+
+from services import profiling
+
+profiling_bp = Blueprint('profiling', __name__)
+
+# Request header carrying the profiling token, and response headers
+PROFILE_HEADER = 'X-Profile'
+PROFILE_TOP_HEADER = 'X-Profile-Top'
+PROFILE_DUMP_HEADER = 'X-Profile-Dump'
+
+
+@profiling_bp.before_app_request
+def start_profiler():
+    # Requests that are not profiled only pay for these two checks
+    requested = PROFILE_HEADER in request.headers
+    if requested and not profiling.authorized(request.headers[PROFILE_HEADER]):
+        return
+    if requested or profiling.sampled():
+        g.profiler = profiling.start()
+        g.profile_requested = requested
+
+
+@profiling_bp.after_app_request
+def stop_profiler(response):
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        if g.pop('profile_requested', False):
+            # Another request of this worker was being profiled
+            response.headers[PROFILE_TOP_HEADER] = 'busy'
+        return response
+
+    stats = profiling.stop(profiler)
+    route = request.url_rule.rule if request.url_rule else request.path
+    name = profiling.dump(stats, request.method, route)
+    if g.pop('profile_requested', False):
+        response.headers[PROFILE_TOP_HEADER] = profiling.format_top(
+            profiling.top_functions(stats)
+        )
+        if name:
+            response.headers[PROFILE_DUMP_HEADER] = name
+    return response
+
+
+@profiling_bp.teardown_app_request
+def release_profiler(error=None):
+    # A request that failed before its after_request hooks
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiling.stop(profiler)
+
+
+def _unauthorized():
+    if profiling.authorized(request.headers.get(PROFILE_HEADER)):
+        return None
+    return jsonify({"error": "Jeton de profilage invalide"}), 403
+
+
+@profiling_bp.route('', methods=['GET'])
+def get_profiles():
+    response = _unauthorized()
+    if response:
+        return response
+    return jsonify(profiling.list_dumps())
+
+
+@profiling_bp.route('/<name>', methods=['GET'])
+def get_profile(name):
+    response = _unauthorized()
+    if response:
+        return response
+
+    path = profiling.dump_path(name)
+    if path is None:
+        return jsonify({"error": "Profil non trouvé"}), 404
+    return send_file(path, mimetype='application/octet-stream',
+                     as_attachment=True, download_name=name)
@@ -0,0 +1,59 @@
+import itertools
+
+from flask import Response
+from flask import current_app
+from flask import request
+from flask import stream_with_context
+
+# Values of the 'format' query parameter that stream the response
+NDJSON = 'ndjson'
+JSON_STREAM = 'json-stream'
+STREAM_FORMATS = [NDJSON, JSON_STREAM]
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+
+def get_stream_format():
+    """Return the requested streaming format, or None for a JSON page."""
+    fmt = request.args.get('format')
+    if fmt in STREAM_FORMATS:
+        return fmt
+    if fmt is None and NDJSON_MIMETYPE in request.headers.get('Accept', ''):
+        return NDJSON
+    return None
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _ndjson(rows):
+    dumps = current_app.json.dumps
+    for row in rows:
+        yield dumps(row) + '\n'
+
+
+def _json_array(rows):
+    dumps = current_app.json.dumps
+    yield '['
+    for index, row in enumerate(rows):
+        yield dumps(row) if index == 0 else ',' + dumps(row)
+    yield ']'
+
+
+def stream_response(rows, fmt):
+    """Serialize rows one by one while the storage iterator produces them.
+
+    Only the current document is held in memory, whatever the size of
+    the collection.
+    """
+    if fmt == NDJSON:
+        body, mimetype = _ndjson(rows), NDJSON_MIMETYPE
+    else:
+        body, mimetype = _json_array(rows), 'application/json'
+    return Response(stream_with_context(body), mimetype=mimetype)
@@ -0,0 +1,92 @@
+import functools
+
+from flask import Blueprint
+from flask import current_app
+from flask import jsonify
+from flask import request
+
+from services import tracing
+from services.pagination import PaginationError
+from services.pagination import parse_limit
+
+tracing_bp = Blueprint('tracing', __name__)
+
+# Response header carrying the ID of the request's trace
+TRACE_ID_HEADER = 'X-Trace-Id'
+
+
+@tracing_bp.before_app_request
+def start_trace():
+    if current_app.config['TRACING_ENABLED']:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        tracing.start_trace(
+            f'{request.method} {route}',
+            trace_id=tracing.trace_id_from_headers(request.headers),
+            route=route, method=request.method, path=request.path,
+        )
+
+
+@tracing_bp.after_app_request
+def add_trace_id(response):
+    trace = tracing.current_trace()
+    if trace is not None:
+        trace.root.attributes['status'] = response.status_code
+        response.headers[TRACE_ID_HEADER] = trace.trace_id
+    return response
+
+
+@tracing_bp.teardown_app_request
+def finish_trace(error=None):
+    # After the response, streamed bodies included
+    if error is not None:
+        tracing.finish_trace(error=repr(error))
+    else:
+        tracing.finish_trace()
+
+
+def trace_views(app):
+    """Record each route handler of the app as a span."""
+    for endpoint, view in list(app.view_functions.items()):
+        app.view_functions[endpoint] = _traced_view(endpoint, view)
+
+
+def _traced_view(endpoint, view):
+    @functools.wraps(view)
+    def traced(*args, **kwargs):
+        with tracing.span(endpoint):
+            return view(*args, **kwargs)
+
+    return traced
+
+
+def _tracing_disabled():
+    return jsonify({"error": "Traçage désactivé (TRACING_ENABLED)"}), 404
+
+
+@tracing_bp.route('', methods=['GET'])
+def get_traces():
+    if not current_app.config['TRACING_ENABLED']:
+        return _tracing_disabled()
+
+    try:
+        limit = parse_limit(request.args.get('limit'), default=50,
+                            maximum=current_app.config['TRACING_BUFFER_SIZE'])
+    except PaginationError as e:
+        return jsonify({"error": str(e)}), 400
+    route = request.args.get('route')
+    traces = [
+        trace for trace in tracing.get_traces()
+        if route is None or trace['attributes'].get('route') == route
+    ]
+    return jsonify(traces[:limit])
+
+
+@tracing_bp.route('/<trace_id>', methods=['GET'])
+def get_trace(trace_id):
+    if not current_app.config['TRACING_ENABLED']:
+        return _tracing_disabled()
+
+    trace = tracing.get_trace(trace_id)
+    if trace is None:
+        return jsonify({"error": "Trace non trouvée"}), 404
+    return jsonify(trace)
@@ -3,27 +3,63 @@ from datetime import datetime
 from models import db
 
 from models.book import COLLECTION_NAME
+from models.book import SORTABLE_FIELDS
 from models.book import Book
 
-
-def get_all_books():
-    books = []
-    for doc in db.collection(COLLECTION_NAME).stream():
-        book = Book.from_dict(doc.to_dict(), doc.id)
-        books.append(book)
-    return books
+from services.cache import book_cache
+from services.cache import get_cached_document
+from services.pagination import paginate
+from services.pagination import stream_query
+from services.search_service import index_book
+from services.search_service import record_deletion
+from services.search_service import unindex_book
+from services.stats_service import increment_counters
+from services.tracing import traced
+
+
+@traced
+def get_books_page(limit, cursor=None, sort=None):
+    docs, next_cursor = paginate(
+        db.collection(COLLECTION_NAME),
+        limit=limit,
+        cursor=cursor,
+        sort=sort,
+        sortable_fields=SORTABLE_FIELDS
+    )
+    books = [Book.from_dict(doc.to_dict(), doc.id) for doc in docs]
+    return books, next_cursor
 
 
-def get_book_by_id(book_id):
-    doc = db.collection(COLLECTION_NAME).document(book_id).get()
-    if doc.exists:
-        return Book.from_dict(doc.to_dict(), doc.id)
+def iter_books(limit=None, cursor=None, sort=None):
+    docs = stream_query(
+        db.collection(COLLECTION_NAME),
+        limit=limit,
+        cursor=cursor,
+        sort=sort,
+        sortable_fields=SORTABLE_FIELDS
+    )
+    return (Book.from_dict(doc.to_dict(), doc.id) for doc in docs)
+
+
+@traced
+def get_book_by_id(book_id, cached=True):
+    """Look a book up by ID. Reads that feed a write pass cached=False:
+    another worker may have changed the book since it was cached."""
+    collection = db.collection(COLLECTION_NAME)
+    if cached:
+        data = get_cached_document(book_cache, collection, book_id)
+    else:
+        doc = collection.document(book_id).get()
+        data = doc.to_dict() if doc.exists else None
+    if data is not None:
+        return Book.from_dict(data, book_id)
     return None
 
 
-def create_new_book(title, author, isbn=None, publication_year=None,
-                    category=None, description=None):
-    book = Book(
+def new_book(title, author, isbn=None, publication_year=None,
+             category=None, description=None):
+    now = datetime.utcnow()
+    return Book(
         title=title,
         author=author,
         isbn=isbn,
@@ -31,42 +67,89 @@ def create_new_book(title, author, isbn=None, publication_year=None,
         category=category,
         description=description,
         is_available=True,
-        created_at=datetime.utcnow(),
-        updated_at=datetime.utcnow()
+        created_at=now,
+        updated_at=now
+    )
+
+
+@traced
+def create_new_book(title, author, isbn=None, publication_year=None,
+                    category=None, description=None):
+    book = new_book(
+        title=title,
+        author=author,
+        isbn=isbn,
+        publication_year=publication_year,
+        category=category,
+        description=description
     )
 
     doc_ref = db.collection(COLLECTION_NAME).document()
-    doc_ref.set(book.to_dict())
+    batch = db.batch()
+    batch.set(doc_ref, book.to_dict())
+    increment_counters(
+        batch, total_books=1, available_books=1, books_version=1
+    )
+    batch.commit()
     book.id = doc_ref.id
+    index_book(book)
 
     return book
 
 
+@traced
 def update_existing_book(book, title=None, author=None, isbn=None,
                          publication_year=None, category=None,
                          description=None, is_available=None):
-    if title:
-        book.title = title
-    if author:
-        book.author = author
-    if isbn:
-        book.isbn = isbn
-    if publication_year:
-        book.publication_year = publication_year
-    if category:
-        book.category = category
-    if description:
-        book.description = description
+    was_available = book.is_available
+
+    changes = {
+        'title': title,
+        'author': author,
+        'isbn': isbn,
+        'publication_year': publication_year,
+        'category': category,
+        'description': description,
+    }
+    changed = [field for field, value in changes.items() if value]
+    for field in changed:
+        setattr(book, field, changes[field])
     if is_available is not None:
         book.is_available = is_available
+        changed.append('is_available')
 
     book.updated_at = datetime.utcnow()
+    changed.append('updated_at')
 
+    # Only the changed fields are written: a concurrent checkout's
+    # is_available is not overwritten with the value read here
+    data = book.to_dict()
     doc_ref = db.collection(COLLECTION_NAME).document(book.id)
-    doc_ref.update(book.to_dict())
+    batch = db.batch()
+    batch.update(doc_ref, {field: data[field] for field in changed})
+    increment_counters(
+        batch,
+        available_books=int(book.is_available) - int(was_available),
+        books_version=1
+    )
+    batch.commit()
+    book_cache.invalidate(book.id)
+    index_book(book)
 
     return book
 
 
+@traced
 def delete_existing_book(book):
-    db.collection(COLLECTION_NAME).document(book.id).delete()
+    batch = db.batch()
+    batch.delete(db.collection(COLLECTION_NAME).document(book.id))
+    record_deletion(batch, book.id)
+    increment_counters(
+        batch,
+        total_books=-1,
+        available_books=-1 if book.is_available else 0,
+        books_version=1
+    )
+    batch.commit()
+    book_cache.invalidate(book.id)
+    unindex_book(book.id)
@@ -0,0 +1,110 @@
+import threading
+import time
+from collections import OrderedDict
+
+from config import Config
+
+# Returned by TTLCache.get when the key is absent or expired
+MISSING = object()
+
+
+class TTLCache:
+    """Bounded, thread-safe LRU cache whose entries expire after `ttl`.
+
+    A cache with a size or TTL of 0 is disabled: it stores nothing and
+    every lookup is a miss.
+    """
+
+    def __init__(self, maxsize, ttl, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.maxsize > 0 and self.ttl > 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= self._clock():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+        }
+
+
+def _new_cache():
+    return TTLCache(Config.CACHE_MAX_ENTRIES, Config.CACHE_TTL_SECONDS)
+
+
+# Raw document data by ID, in front of the single-document lookups
+book_cache = _new_cache()
+member_cache = _new_cache()
+loan_cache = _new_cache()
+
+CACHES = {
+    'books': book_cache,
+    'members': member_cache,
+    'loans': loan_cache,
+}
+
+
+def get_cached_document(cache, collection, doc_id):
+    """Read-through lookup: returns the document data, or None."""
+    data = cache.get(doc_id)
+    if data is not MISSING:
+        return data
+
+    doc = collection.document(doc_id).get()
+    if not doc.exists:
+        return None
+
+    data = doc.to_dict()
+    cache.set(doc_id, data)
+    return data
+
+
+def get_cache_stats():
+    return {name: cache.stats() for name, cache in CACHES.items()}
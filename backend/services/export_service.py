@@ -0,0 +1,107 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from datetime import timezone
+
+from models import db
+
+from models.book import COLLECTION_NAME as BOOK_COLLECTION
+from models.loan import COLLECTION_NAME as LOAN_COLLECTION
+from models.member import COLLECTION_NAME as MEMBER_COLLECTION
+
+CSV = 'csv'
+NDJSON = 'ndjson'
+FORMATS = [CSV, NDJSON]
+
+MIMETYPES = {
+    CSV: 'text/csv',
+    NDJSON: 'application/x-ndjson',
+}
+
+# Exported columns, and the timestamp the 'since' filter applies to
+EXPORTS = {
+    'books': (BOOK_COLLECTION, 'updated_at', [
+        'id', 'title', 'author', 'isbn', 'publication_year', 'category',
+        'description', 'is_available', 'created_at', 'updated_at'
+    ]),
+    'members': (MEMBER_COLLECTION, 'updated_at', [
+        'id', 'first_name', 'last_name', 'email', 'phone', 'address',
+        'id_card_number', 'created_at', 'updated_at'
+    ]),
+    'loans': (LOAN_COLLECTION, 'loan_date', [
+        'id', 'book_id', 'member_id', 'loan_date', 'due_date',
+        'return_date', 'returned'
+    ]),
+}
+
+
+def parse_since(since):
+    """Parse an ISO 8601 'since' value into a naive UTC datetime."""
+    if not since:
+        return None
+    try:
+        value = datetime.fromisoformat(since)
+    except ValueError:
+        raise ValueError("Le paramètre 'since' doit être une date ISO 8601")
+    if value.tzinfo is not None:
+        # Timestamps are stored as naive UTC
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def iter_export(name, since=None):
+    """Yield the documents of an exported collection as flat dicts.
+
+    With `since`, only documents whose timestamp is at or after it are
+    read, so an incremental export costs what it returns.
+    """
+    collection, since_field, fields = EXPORTS[name]
+    query = db.collection(collection)
+    if since is not None:
+        query = query.where(since_field, '>=', since.isoformat())
+
+    for doc in query.stream():
+        data = doc.to_dict()
+        data['id'] = doc.id
+        yield {field: data.get(field) for field in fields}
+
+
+def _csv_lines(rows, fields):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields)
+    writer.writeheader()
+    yield buffer.getvalue()
+    for row in rows:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(row)
+        yield buffer.getvalue()
+
+
+def _ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+def gzip_chunks(chunks):
+    """Compress byte chunks into a gzip stream as they are produced."""
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_chunks(name, fmt, since=None, compress=False):
+    """Encoded chunks of a collection export, one document at a time."""
+    rows = iter_export(name, since)
+    if fmt == CSV:
+        lines = _csv_lines(rows, EXPORTS[name][2])
+    else:
+        lines = _ndjson_lines(rows)
+
+    chunks = (line.encode('utf-8') for line in lines)
+    return gzip_chunks(chunks) if compress else chunks
@@ -0,0 +1,147 @@
+import csv
+import json
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+
+from google.api_core.exceptions import GoogleAPICallError
+
+from models import db
+
+from models.book import COLLECTION_NAME
+
+from services.book_service import new_book
+from services.search_service import index_book
+from services.stats_service import increment_counters
+
+CSV = 'csv'
+NDJSON = 'ndjson'
+FORMATS = [CSV, NDJSON]
+
+# Firestore caps a batch at 500 writes, one of which updates the counters
+BOOKS_PER_BATCH = 499
+
+REQUIRED_FIELDS = ['title', 'author']
+
+
+def read_rows(lines, fmt):
+    """Yield (row number, row, error) for each record of a text stream."""
+    if fmt == CSV:
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, row, None
+        return
+
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield number, None, "Ligne JSON invalide"
+            continue
+        if not isinstance(row, dict):
+            yield number, None, "Chaque ligne doit être un objet JSON"
+            continue
+        yield number, row, None
+
+
+def book_from_row(row):
+    for field in REQUIRED_FIELDS:
+        if not row.get(field):
+            raise ValueError(f"Le champ '{field}' est requis")
+
+    publication_year = row.get('publication_year')
+    if publication_year in ('', None):
+        publication_year = None
+    else:
+        try:
+            publication_year = int(publication_year)
+        except (TypeError, ValueError):
+            raise ValueError(
+                "Le champ 'publication_year' doit être un entier"
+            )
+
+    # CSV cells are empty strings rather than missing values
+    return new_book(
+        title=row['title'],
+        author=row['author'],
+        isbn=row.get('isbn') or None,
+        publication_year=publication_year,
+        category=row.get('category') or None,
+        description=row.get('description') or None
+    )
+
+
+def _commit_books(chunk):
+    batch = db.batch()
+    collection = db.collection(COLLECTION_NAME)
+    for _, book in chunk:
+        doc_ref = collection.document()
+        batch.set(doc_ref, book.to_dict())
+        book.id = doc_ref.id
+    increment_counters(
+        batch,
+        total_books=len(chunk),
+        available_books=len(chunk),
+        books_version=1
+    )
+    try:
+        batch.commit()
+    except GoogleAPICallError as e:
+        return chunk, str(e)
+    return chunk, None
+
+
+def _collect(futures, report):
+    for future in futures:
+        chunk, error = future.result()
+        if error:
+            report['errors'].extend(
+                {'row': number, 'error': f"Échec de l'écriture : {error}"}
+                for number, _ in chunk
+            )
+            continue
+        report['imported'] += len(chunk)
+        for _, book in chunk:
+            index_book(book)
+
+
+def import_books(lines, fmt, workers=4):
+    """Create books from CSV or NDJSON lines in concurrent write batches.
+
+    Rows are validated as they are read and invalid ones are reported
+    rather than aborting the import, so the report lists every rejected
+    row with its reason.
+    """
+    report = {'imported': 0, 'errors': []}
+    pending = set()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        chunk = []
+        for number, row, error in read_rows(lines, fmt):
+            if error is None:
+                try:
+                    book = book_from_row(row)
+                except ValueError as e:
+                    error = str(e)
+            if error:
+                report['errors'].append({'row': number, 'error': error})
+                continue
+
+            chunk.append((number, book))
+            if len(chunk) < BOOKS_PER_BATCH:
+                continue
+            pending.add(executor.submit(_commit_books, chunk))
+            chunk = []
+            # Keep a few batches per worker in flight, not the whole file
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                _collect(done, report)
+
+        if chunk:
+            pending.add(executor.submit(_commit_books, chunk))
+        _collect(wait(pending).done, report)
+
+    report['errors'].sort(key=lambda error: error['row'])
+    return report
@@ -1,67 +1,483 @@
+import asyncio
+import random
+import time
 from datetime import datetime
 from datetime import timedelta
 
+from google.api_core.exceptions import FailedPrecondition
+
+from models import async_storage
 from models import db
 
 from models.book import COLLECTION_NAME as BOOK_COLLECTION
+from models.member import COLLECTION_NAME as MEMBER_COLLECTION
 
 from models.loan import COLLECTION_NAME
+from models.loan import SORTABLE_FIELDS
+from models.loan import STATUSES
 from models.loan import Loan
 
+from models.stats import COLLECTION_NAME as STATS_COLLECTION
+from models.stats import SWEEP_DOCUMENT
+
+from services.cache import book_cache
+from services.cache import get_cached_document
+from services.cache import loan_cache
+from services.pagination import PaginationError
+from services.pagination import paginate
+from services.pagination import stream_query
+from services.stats_service import increment_counters
+from services.tracing import traced
+
+# Related documents that can be embedded in loan listings, with the
+# collection they live in and the fields of their compact projection
+EXPANSIONS = {
+    'book': (BOOK_COLLECTION, ['title', 'author']),
+    'member': (MEMBER_COLLECTION, ['first_name', 'last_name']),
+}
+
+# Attempts and backoff of a write racing other writes to the same documents
+CONFLICT_MAX_ATTEMPTS = 5
+CONFLICT_BACKOFF_SECONDS = 0.02
+CONFLICT_MAX_BACKOFF_SECONDS = 0.5
+
+# Each loan of a batch costs two of the 500 writes a Firestore batch allows
+MAX_BATCH_LOANS = 200
+
+# Loans flagged per batch by the overdue sweep, with the counters
+SWEEP_BATCH_LOANS = 400
+
+
+class LoanError(Exception):
+    """A refused checkout or return, with the message and status for the
+    client."""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
 
-def get_all_loans():
-    loans = []
-    for doc in db.collection(COLLECTION_NAME).stream():
-        loan = Loan.from_dict(doc.to_dict(), doc.id)
-        loans.append(loan)
-    return loans
 
+def _loans_query(status=None, sort=None, now=None):
+    query = db.collection(COLLECTION_NAME)
 
+    if status is not None and status not in STATUSES:
+        raise PaginationError(f"Statut d'emprunt invalide : '{status}'")
+
+    if status == 'active':
+        query = query.where('returned', '==', False)
+    elif status == 'returned':
+        query = query.where('returned', '==', True)
+    elif status == 'overdue':
+        # Range query served by the (returned, due_date) composite index
+        now = now or datetime.utcnow()
+        query = (
+            query.where('returned', '==', False)
+            .where('due_date', '<', now.isoformat())
+        )
+        # Firestore orders range queries on the filtered field first
+        sort = sort or 'due_date'
+        if sort.lstrip('-') != 'due_date':
+            raise PaginationError(
+                "Les emprunts en retard ne peuvent être triés que par "
+                "'due_date'"
+            )
+
+    return query, sort
+
+
+@traced
+def get_loans_page(limit, cursor=None, sort=None, status=None, now=None):
+    query, sort = _loans_query(status, sort, now)
+    docs, next_cursor = paginate(
+        query,
+        limit=limit,
+        cursor=cursor,
+        sort=sort,
+        sortable_fields=SORTABLE_FIELDS
+    )
+    loans = [Loan.from_dict(doc.to_dict(), doc.id) for doc in docs]
+    return loans, next_cursor
+
+
+def iter_loans(limit=None, cursor=None, sort=None, status=None, now=None):
+    query, sort = _loans_query(status, sort, now)
+    docs = stream_query(
+        query,
+        limit=limit,
+        cursor=cursor,
+        sort=sort,
+        sortable_fields=SORTABLE_FIELDS
+    )
+    return (Loan.from_dict(doc.to_dict(), doc.id) for doc in docs)
+
+
+@traced
+def get_loan_expansions(loans, expand):
+    """Fetch the projections of the books/members referenced by loans.
+
+    Every referenced document is read once, whatever the number of loans
+    pointing to it, with a single batched get_all call. Returns a dict
+    keyed by (expansion, document ID); missing documents map to None.
+    """
+    refs = {}
+    field_paths = []
+    for name in expand:
+        collection, fields = EXPANSIONS[name]
+        field_paths.extend(fields)
+        for loan in loans:
+            doc_id = getattr(loan, f'{name}_id')
+            if doc_id and (name, doc_id) not in refs:
+                refs[(name, doc_id)] = (
+                    db.collection(collection).document(doc_id)
+                )
+
+    expansions = dict.fromkeys(refs)
+    if not refs:
+        return expansions
+
+    names = {collection: name for name, (collection, _) in EXPANSIONS.items()}
+    for doc in db.get_all(list(refs.values()), field_paths=field_paths):
+        if not doc.exists:
+            continue
+        name = names[doc.reference.parent.id]
+        data = doc.to_dict()
+        expansions[(name, doc.id)] = {
+            'id': doc.id,
+            **{field: data.get(field) for field in EXPANSIONS[name][1]}
+        }
+    return expansions
+
+
+@traced
 def get_loan_by_id(loan_id):
-    doc = db.collection(COLLECTION_NAME).document(loan_id).get()
-    if doc.exists:
-        return Loan.from_dict(doc.to_dict(), doc.id)
+    data = get_cached_document(
+        loan_cache, db.collection(COLLECTION_NAME), loan_id
+    )
+    if data is not None:
+        return Loan.from_dict(data, loan_id)
     return None
 
 
-def create_new_loan(book_id, member_id, loan_date=None, due_date=None):
-    if not loan_date:
-        loan_date = datetime.utcnow()
-
-    if not due_date:
-        due_date = loan_date + timedelta(days=14)
-
-    loan = Loan(
-        book_id=book_id,
-        member_id=member_id,
-        loan_date=loan_date,
-        due_date=due_date,
-        returned=False
+def _retry_on_conflict(write, *args):
+    """Run a read-validate-write step until its preconditions hold.
+
+    The step conditions its writes on the update time of what it read; a
+    concurrent write makes the commit fail, and the step is run again from
+    the read after a randomized exponential backoff.
+    """
+    for attempt in range(CONFLICT_MAX_ATTEMPTS):
+        if attempt:
+            backoff = min(CONFLICT_MAX_BACKOFF_SECONDS,
+                          CONFLICT_BACKOFF_SECONDS * 2 ** attempt)
+            time.sleep(random.uniform(0, backoff))
+        try:
+            return write(*args)
+        except FailedPrecondition:
+            continue
+
+    raise LoanError(
+        "Ces documents font l'objet de modifications simultanées, "
+        "veuillez réessayer",
+        status_code=409
     )
 
-    doc_ref = db.collection(COLLECTION_NAME).document()
-    doc_ref.set(loan.to_dict())
-    loan.id = doc_ref.id
 
-    # Update book availability
-    book_ref = db.collection(BOOK_COLLECTION).document(book_id)
-    book_ref.update({'is_available': False})
+@traced
+def create_new_loan(book_id, member_id, loan_date=None, due_date=None):
+    result, = create_new_loans([(book_id, member_id, loan_date, due_date)])
+    if isinstance(result, LoanError):
+        raise result
+    return result
+
+
+@traced
+def create_new_loans(checkouts):
+    """Lend books with one batched read and one atomic write.
+
+    `checkouts` are (book_id, member_id, loan_date, due_date) tuples. The
+    books and members are read together, then the loans, the books'
+    availability and the counters are committed in one batch whose book
+    updates are conditioned on the books' update times, so a copy is never
+    lent twice. Returns, in order, the Loan or the LoanError of each
+    checkout; a refused checkout does not prevent the others.
+    """
+    return _retry_on_conflict(_checkout, checkouts)
+
 
-    return loan
+def _checkout(checkouts):
+    refs = {}
+    for book_id, member_id, _, _ in checkouts:
+        refs[(BOOK_COLLECTION, book_id)] = (
+            db.collection(BOOK_COLLECTION).document(book_id)
+        )
+        refs[(MEMBER_COLLECTION, member_id)] = (
+            db.collection(MEMBER_COLLECTION).document(member_id)
+        )
+    docs = _read_checkout_documents(refs)
 
+    results = []
+    lent = set()
+    overdue = 0
+    now = datetime.utcnow()
+    batch = db.batch()
+    for book_id, member_id, loan_date, due_date in checkouts:
+        book_doc = docs[(BOOK_COLLECTION, book_id)]
+        if not book_doc.exists:
+            results.append(LoanError("Livre non trouvé", status_code=404))
+            continue
+        if not docs[(MEMBER_COLLECTION, member_id)].exists:
+            results.append(LoanError("Membre non trouvé", status_code=404))
+            continue
+        if (book_id in lent
+                or not book_doc.to_dict().get('is_available', True)):
+            results.append(LoanError("Ce livre n'est pas disponible"))
+            continue
 
+        loan_date = loan_date or now
+        loan = Loan(
+            book_id=book_id,
+            member_id=member_id,
+            loan_date=loan_date,
+            due_date=due_date or loan_date + timedelta(days=14),
+            returned=False
+        )
+        # A loan recorded after its due date is flagged right away: the
+        # overdue sweep only looks at due dates after its last run
+        if loan.due_date < now:
+            loan.overdue = True
+            overdue += 1
+        doc_ref = db.collection(COLLECTION_NAME).document()
+        batch.set(doc_ref, loan.to_dict())
+        loan.id = doc_ref.id
+
+        # Update book availability, unless it changed since it was read
+        batch.update(refs[(BOOK_COLLECTION, book_id)], {
+            'is_available': False,
+            'updated_at': datetime.utcnow().isoformat()
+        }, option=db.write_option(last_update_time=book_doc.update_time))
+
+        lent.add(book_id)
+        results.append(loan)
+
+    if lent:
+        increment_counters(
+            batch,
+            active_loans=len(lent),
+            available_books=-len(lent),
+            overdue_loans=overdue,
+            loans_version=1,
+            books_version=1
+        )
+        batch.commit()
+        for book_id in lent:
+            book_cache.invalidate(book_id)
+
+    return results
+
+
+def _read_checkout_documents(refs):
+    """Snapshots of the books and members of a checkout, by (collection,
+    ID)."""
+    if len(refs) > 2:
+        # A batch: one multi-get round trip for all of them
+        # (get_all does not preserve the order of the references)
+        return {
+            (doc.reference.parent.id, doc.id): doc
+            for doc in db.get_all(list(refs.values()))
+        }
+    # One book and one member: read both at once
+    return async_storage.run(_get_documents_async(list(refs)))
+
+
+async def _get_documents_async(keys):
+    client = async_storage.client
+    snapshots = await asyncio.gather(*(
+        client.collection(collection).document(doc_id).get()
+        for collection, doc_id in keys
+    ))
+    return dict(zip(keys, snapshots))
+
+
+@traced
 def return_book_loan(loan):
-    loan.returned = True
-    loan.return_date = datetime.utcnow()
+    result, = return_book_loans([loan.id])
+    if isinstance(result, LoanError):
+        raise result
+    return result
+
+
+@traced
+def return_book_loans(loan_ids):
+    """Return loans with two batched reads and one atomic write.
+
+    The loans are read first, then their books. Loan and book updates are
+    conditioned on their update times, so a loan returned concurrently is
+    not returned twice. A loan whose book was deleted is still returned,
+    without an availability update. Returns, in order, the Loan or the
+    LoanError of each loan ID.
+    """
+    return _retry_on_conflict(_return, loan_ids)
+
+
+def _return(loan_ids):
+    refs = {
+        loan_id: db.collection(COLLECTION_NAME).document(loan_id)
+        for loan_id in loan_ids
+    }
+    docs = {doc.id: doc for doc in db.get_all(list(refs.values()))}
+
+    results = []
+    returned = set()
+    overdue = 0
+    return_date = datetime.utcnow()
+    batch = db.batch()
+    for loan_id in loan_ids:
+        doc = docs[loan_id]
+        if not doc.exists:
+            results.append(LoanError("Emprunt non trouvé", status_code=404))
+            continue
+        loan = Loan.from_dict(doc.to_dict(), loan_id)
+        if loan.returned or loan_id in returned:
+            results.append(LoanError("Ce livre a déjà été retourné"))
+            continue
+
+        loan.returned = True
+        loan.return_date = return_date
+        changes = {
+            'returned': True,
+            'return_date': return_date.isoformat()
+        }
+        if loan.overdue:
+            # Only loans still out are counted as overdue
+            loan.overdue = False
+            changes['overdue'] = False
+            overdue += 1
+        batch.update(refs[loan_id], changes,
+                     option=db.write_option(last_update_time=doc.update_time))
 
-    doc_ref = db.collection(COLLECTION_NAME).document(loan.id)
-    doc_ref.update({
-        'returned': True,
-        'return_date': loan.return_date.isoformat()
+        returned.add(loan_id)
+        results.append(loan)
+
+    if returned:
+        # The books are read once the loans tell which ones they are, so
+        # that a deleted book does not make the whole batch fail
+        book_refs = {
+            loan.book_id: db.collection(BOOK_COLLECTION).document(loan.book_id)
+            for loan in results if isinstance(loan, Loan)
+        }
+        available = 0
+        for book in db.get_all(list(book_refs.values())):
+            # Nothing to do for a deleted book, or one already marked
+            # available (e.g. by an edit): it must not be counted twice
+            if not book.exists or book.to_dict().get('is_available', True):
+                continue
+            batch.update(book_refs[book.id], {
+                'is_available': True,
+                'updated_at': return_date.isoformat()
+            }, option=db.write_option(last_update_time=book.update_time))
+            available += 1
+
+        increment_counters(
+            batch,
+            active_loans=-len(returned),
+            available_books=available,
+            overdue_loans=-overdue,
+            loans_version=1,
+            books_version=1
+        )
+        batch.commit()
+        for loan in results:
+            if isinstance(loan, Loan):
+                loan_cache.invalidate(loan.id)
+                book_cache.invalidate(loan.book_id)
+
+    return results
+
+
+def get_sweep_ref():
+    return db.collection(STATS_COLLECTION).document(SWEEP_DOCUMENT)
+
+
+@traced
+def sweep_overdue_loans(now=None):
+    """Flag the loans that became overdue since the previous sweep.
+
+    The active loans due between the persisted watermark and `now` are
+    read by pages of a range query, served by the (returned, due_date)
+    index, and flagged `overdue` in batches that also increment the
+    overdue_loans counter. The watermark then moves to `now`, so each
+    sweep only reads the loans that fell due since the previous one (the
+    first reads every past due date). Loans recorded already overdue are
+    flagged at checkout, and returns clear the flag.
+
+    A failed sweep leaves the watermark where it was; the loans it did
+    flag are skipped by the next one, so they are only counted once.
+    """
+    now = (now or datetime.utcnow()).isoformat()
+    state = get_sweep_ref().get()
+    watermark = state.to_dict().get('watermark') if state.exists else None
+
+    query = (
+        db.collection(COLLECTION_NAME)
+        .where('returned', '==', False)
+        .where('due_date', '<', now)
+    )
+    if watermark:
+        query = query.where('due_date', '>=', watermark)
+
+    # Read page by page: a stream left open across the commits would pin
+    # the SQLite engine's read snapshot, and with it the write lock
+    scanned = flagged = 0
+    page = query.order_by('due_date').limit(SWEEP_BATCH_LOANS)
+    chunk = page.get()
+    while chunk:
+        scanned += len(chunk)
+        flagged += _flag_overdue_chunk(chunk)
+        if len(chunk) < SWEEP_BATCH_LOANS:
+            break
+        chunk = page.start_after(chunk[-1]).get()
+
+    get_sweep_ref().set({
+        'watermark': now,
+        'last_run': datetime.utcnow().isoformat(),
+        'last_scanned': scanned,
+        'last_flagged': flagged,
     })
+    return {
+        'scanned': scanned,
+        'flagged': flagged,
+        'previous_watermark': watermark,
+        'watermark': now,
+    }
+
+
+def _flag_overdue_chunk(docs):
+    try:
+        return _flag_overdue(docs)
+    except FailedPrecondition:
+        # Loans written since the query (e.g. returned): read them again
+        refs = [doc.reference for doc in docs]
+        return _retry_on_conflict(
+            lambda: _flag_overdue(list(db.get_all(refs)))
+        )
+
 
-    # Update book availability
-    book_ref = db.collection(BOOK_COLLECTION).document(loan.book_id)
-    book_ref.update({'is_available': True})
+def _flag_overdue(docs):
+    flagged = []
+    batch = db.batch()
+    for doc in docs:
+        data = doc.to_dict() if doc.exists else None
+        if not data or data.get('returned') or data.get('overdue'):
+            continue
+        # Conditioned on the read, so that a loan returned meanwhile is
+        # not flagged
+        batch.update(doc.reference, {'overdue': True},
+                     option=db.write_option(last_update_time=doc.update_time))
+        flagged.append(doc.id)
 
-    return loan
+    if flagged:
+        increment_counters(batch, overdue_loans=len(flagged), loans_version=1)
+        batch.commit()
+        for loan_id in flagged:
+            loan_cache.invalidate(loan_id)
+    return len(flagged)
@@ -3,24 +3,56 @@ from datetime import datetime
 from models import db
 
 from models.member import COLLECTION_NAME
+from models.member import SORTABLE_FIELDS
 from models.member import Member
 
-
-def get_all_members():
-    members = []
-    for doc in db.collection(COLLECTION_NAME).stream():
-        member = Member.from_dict(doc.to_dict(), doc.id)
-        members.append(member)
-    return members
+from services.cache import get_cached_document
+from services.cache import member_cache
+from services.pagination import paginate
+from services.pagination import stream_query
+from services.stats_service import increment_counters
+from services.tracing import traced
+
+
+@traced
+def get_members_page(limit, cursor=None, sort=None):
+    docs, next_cursor = paginate(
+        db.collection(COLLECTION_NAME),
+        limit=limit,
+        cursor=cursor,
+        sort=sort,
+        sortable_fields=SORTABLE_FIELDS
+    )
+    members = [Member.from_dict(doc.to_dict(), doc.id) for doc in docs]
+    return members, next_cursor
 
 
-def get_member_by_id(member_id):
-    doc = db.collection(COLLECTION_NAME).document(member_id).get()
-    if doc.exists:
-        return Member.from_dict(doc.to_dict(), doc.id)
+def iter_members(limit=None, cursor=None, sort=None):
+    docs = stream_query(
+        db.collection(COLLECTION_NAME),
+        limit=limit,
+        cursor=cursor,
+        sort=sort,
+        sortable_fields=SORTABLE_FIELDS
+    )
+    return (Member.from_dict(doc.to_dict(), doc.id) for doc in docs)
+
+
+@traced
+def get_member_by_id(member_id, cached=True):
+    """Look a member up by ID; reads that feed a write pass cached=False."""
+    collection = db.collection(COLLECTION_NAME)
+    if cached:
+        data = get_cached_document(member_cache, collection, member_id)
+    else:
+        doc = collection.document(member_id).get()
+        data = doc.to_dict() if doc.exists else None
+    if data is not None:
+        return Member.from_dict(data, member_id)
     return None
 
 
+@traced
 def create_new_member(first_name, last_name, email, phone=None, address=None,
                       id_card_number=None):
     member = Member(
@@ -35,34 +67,49 @@ def create_new_member(first_name, last_name, email, phone=None, address=None,
     )
 
     doc_ref = db.collection(COLLECTION_NAME).document()
-    doc_ref.set(member.to_dict())
+    batch = db.batch()
+    batch.set(doc_ref, member.to_dict())
+    increment_counters(batch, total_members=1, members_version=1)
+    batch.commit()
     member.id = doc_ref.id
 
     return member
 
 
+@traced
 def update_existing_member(member, first_name=None, last_name=None, email=None,
                            phone=None, address=None, id_card_number=None):
-    if first_name:
-        member.first_name = first_name
-    if last_name:
-        member.last_name = last_name
-    if email:
-        member.email = email
-    if phone:
-        member.phone = phone
-    if address:
-        member.address = address
-    if id_card_number:
-        member.id_card_number = id_card_number
+    changes = {
+        'first_name': first_name,
+        'last_name': last_name,
+        'email': email,
+        'phone': phone,
+        'address': address,
+        'id_card_number': id_card_number,
+    }
+    changed = [field for field, value in changes.items() if value]
+    for field in changed:
+        setattr(member, field, changes[field])
 
     member.updated_at = datetime.utcnow()
+    changed.append('updated_at')
 
+    # Only the changed fields are written, over the current document
+    data = member.to_dict()
     doc_ref = db.collection(COLLECTION_NAME).document(member.id)
-    doc_ref.update(member.to_dict())
+    batch = db.batch()
+    batch.update(doc_ref, {field: data[field] for field in changed})
+    increment_counters(batch, members_version=1)
+    batch.commit()
+    member_cache.invalidate(member.id)
 
     return member
 
 
+@traced
 def delete_existing_member(member):
-    db.collection(COLLECTION_NAME).document(member.id).delete()
+    batch = db.batch()
+    batch.delete(db.collection(COLLECTION_NAME).document(member.id))
+    increment_counters(batch, total_members=-1, members_version=1)
+    batch.commit()
+    member_cache.invalidate(member.id)
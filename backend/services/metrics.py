@@ -0,0 +1,262 @@
+import glob
+import json
+import os
+import threading
+import time
+import weakref
+
+from config import Config
+
+# Upper bounds of the request latency histogram, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Metric name: (type, help text) of the exposition
+METRICS = {
+    'library_http_requests_total': (
+        'counter', "HTTP requests served, by route, method and status."
+    ),
+    'library_http_request_duration_seconds': (
+        'histogram', "Time to produce the response of an HTTP request."
+    ),
+    'library_http_request_storage_calls_total': (
+        'counter', "Storage round trips made while serving HTTP requests."
+    ),
+    'library_storage_calls_total': (
+        'counter', "Storage round trips, by operation."
+    ),
+    'library_storage_documents_read_total': (
+        'counter', "Documents returned by storage reads."
+    ),
+    'library_storage_writes_total': (
+        'counter', "Document writes, direct or batched, by operation."
+    ),
+}
+
+# Counters are kept per thread, so that the hot path never takes a lock:
+# each thread only writes its own dict, and a scrape sums them all. A key
+# is (metric name, labels as a tuple of (name, value) pairs). When a thread
+# ends, its counters are folded into the process-wide _retired totals.
+_registry = {}
+_retired = {}
+_registry_lock = threading.Lock()
+_local = threading.local()
+_flusher = None
+
+
+def _after_fork():
+    # A forked worker starts from zero; the parent's counters are its own
+    global _registry, _retired, _registry_lock, _local, _flusher
+    _registry = {}
+    _retired = {}
+    _registry_lock = threading.Lock()
+    _local = threading.local()
+    _flusher = None
+
+
+os.register_at_fork(after_in_child=_after_fork)
+
+
+class _Owner:
+    """Held by a thread's local storage, so that it is released when the
+    thread ends."""
+
+
+def _retire(counters):
+    with _registry_lock:
+        _registry.pop(id(counters), None)
+        for key, value in counters.items():
+            _retired[key] = _retired.get(key, 0) + value
+
+
+def _counters():
+    try:
+        return _local.counters
+    except AttributeError:
+        counters = _local.counters = {}
+        _local.owner = _Owner()
+        weakref.finalize(_local.owner, _retire, counters)
+        with _registry_lock:
+            _registry[id(counters)] = counters
+        return counters
+
+
+def inc(name, labels=(), amount=1):
+    counters = _counters()
+    key = (name, labels)
+    counters[key] = counters.get(key, 0) + amount
+
+
+def observe_request(route, method, status, seconds):
+    """Record a served request and its storage round trips."""
+    labels = (('route', route), ('method', method), ('status', str(status)))
+    counters = _counters()
+    for key, amount in (
+        (('library_http_requests_total', labels), 1),
+        (('library_http_request_duration_seconds_sum', labels), seconds),
+        (('library_http_request_duration_seconds_count', labels), 1),
+        (('library_http_request_duration_seconds_bucket',
+          labels + (('le', _bucket(seconds)),)), 1),
+        (('library_http_request_storage_calls_total', labels),
+         getattr(_local, 'request_calls', 0)),
+    ):
+        counters[key] = counters.get(key, 0) + amount
+
+
+def _bucket(seconds):
+    # Buckets are stored non-cumulative, and summed up at export
+    for bound in LATENCY_BUCKETS:
+        if seconds <= bound:
+            return str(bound)
+    return '+Inf'
+
+
+def start_request():
+    _local.request_calls = 0
+
+
+def storage_call(operation, target, seconds, documents=0, writes=()):
+    """Storage recorder hook (see models.instrumentation)."""
+    counters = _counters()
+    keys = [('library_storage_calls_total', (('operation', operation),))]
+    keys.extend(
+        ('library_storage_writes_total', (('operation', write),))
+        for write in writes
+    )
+    for key in keys:
+        counters[key] = counters.get(key, 0) + 1
+    if documents:
+        key = ('library_storage_documents_read_total', ())
+        counters[key] = counters.get(key, 0) + documents
+    _local.request_calls = getattr(_local, 'request_calls', 0) + 1
+
+
+def snapshot():
+    """Counters of this process, summed over its threads."""
+    with _registry_lock:
+        registry = list(_registry.values())
+        totals = dict(_retired)
+    for counters in registry:
+        for key, value in counters.copy().items():
+            totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+# Multi-process aggregation: under gunicorn, each worker writes its
+# counters to METRICS_DIR, and a scrape of any worker sums the files.
+
+def _process_file(directory):
+    return os.path.join(directory, f'metrics-{os.getpid()}.json')
+
+
+def flush():
+    """Write this process' counters to METRICS_DIR, if set."""
+    directory = Config.METRICS_DIR
+    if not directory:
+        return
+    path = _process_file(directory)
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w') as output:
+        json.dump([
+            [name, [list(label) for label in labels], value]
+            for (name, labels), value in snapshot().items()
+        ], output)
+    # Readers never see a partially written file
+    os.replace(temporary, path)
+
+
+def start_flusher(interval=None):
+    """Flush this process' counters every `interval` seconds."""
+    global _flusher
+    interval = interval or Config.METRICS_FLUSH_SECONDS
+    if not Config.METRICS_DIR or _flusher is not None:
+        return
+
+    def run():
+        while True:
+            time.sleep(interval)
+            flush()
+
+    _flusher = threading.Thread(target=run, name='metrics-flusher',
+                                daemon=True)
+    _flusher.start()
+
+
+def clear_process_files():
+    """Remove the files of a previous server run."""
+    if Config.METRICS_DIR:
+        for path in glob.glob(os.path.join(Config.METRICS_DIR,
+                                           'metrics-*.json')):
+            os.remove(path)
+
+
+def collect():
+    """Counters of all the server's processes."""
+    directory = Config.METRICS_DIR
+    if not directory:
+        return snapshot()
+
+    flush()
+    totals = {}
+    for path in glob.glob(os.path.join(directory, 'metrics-*.json')):
+        try:
+            with open(path) as lines:
+                entries = json.load(lines)
+        except (OSError, ValueError):
+            # Removed or replaced while listing: skip this process
+            continue
+        for name, labels, value in entries:
+            key = (name, tuple(tuple(label) for label in labels))
+            totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+def _escape(value):
+    return (value.replace('\\', r'\\').replace('"', r'\"')
+            .replace('\n', r'\n'))
+
+
+def _sample(name, labels, value):
+    if labels:
+        rendered = ','.join(
+            f'{label}="{_escape(text)}"' for label, text in labels
+        )
+        name = f'{name}{{{rendered}}}'
+    return f'{name} {value}'
+
+
+def _histogram_samples(name, totals):
+    buckets = {}
+    for (sample, labels), value in totals.items():
+        if sample == f'{name}_bucket':
+            series = tuple(label for label in labels if label[0] != 'le')
+            bound = dict(labels)['le']
+            buckets.setdefault(series, {})[bound] = value
+
+    lines = []
+    for series in sorted(buckets):
+        cumulative = 0
+        for bound in [str(bound) for bound in LATENCY_BUCKETS] + ['+Inf']:
+            cumulative += buckets[series].get(bound, 0)
+            lines.append(_sample(f'{name}_bucket',
+                                 series + (('le', bound),), cumulative))
+        for suffix in ('_sum', '_count'):
+            lines.append(_sample(f'{name}{suffix}', series,
+                                 totals.get((f'{name}{suffix}', series), 0)))
+    return lines
+
+
+def render(totals):
+    """Prometheus text exposition of the counters."""
+    lines = []
+    for name, (kind, description) in METRICS.items():
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'histogram':
+            lines.extend(_histogram_samples(name, totals))
+            continue
+        lines.extend(
+            _sample(name, labels, totals[(sample, labels)])
+            for sample, labels in sorted(totals)
+            if sample == name
+        )
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,113 @@
+import base64
+import binascii
+import json
+
+# Firestore's reserved field path for the document ID
+DOCUMENT_ID = '__name__'
+
+ASCENDING = 'ASCENDING'
+DESCENDING = 'DESCENDING'
+
+
+class PaginationError(ValueError):
+    pass
+
+
+def parse_sort(sort, sortable_fields):
+    """Turn 'field' / '-field' into an (order_by field, direction) pair."""
+    if not sort:
+        return DOCUMENT_ID, ASCENDING
+
+    direction = DESCENDING if sort.startswith('-') else ASCENDING
+    field = sort.lstrip('-')
+    if field not in sortable_fields:
+        raise PaginationError(f"Tri impossible sur le champ '{field}'")
+    return field, direction
+
+
+def parse_limit(limit, default, maximum):
+    if limit is None or limit == '':
+        return default
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise PaginationError("Le paramètre 'limit' doit être un entier")
+    if limit < 1:
+        raise PaginationError("Le paramètre 'limit' doit être positif")
+    return min(limit, maximum) if maximum else limit
+
+
+def encode_cursor(sort, values):
+    payload = json.dumps({'s': sort or '', 'v': values}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, sort):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values = payload['v']
+        cursor_sort = payload['s']
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise PaginationError("Curseur de pagination invalide")
+
+    # A cursor is only meaningful for the ordering it was produced with
+    if cursor_sort != (sort or ''):
+        raise PaginationError("Le curseur ne correspond pas au tri demandé")
+    return values
+
+
+def order_query(query, cursor=None, sort=None, sortable_fields=()):
+    """Apply the keyset ordering and start cursor of a list query.
+
+    Returns the ordered query and the fields a cursor is made of.
+    """
+    field, direction = parse_sort(sort, sortable_fields)
+
+    fields = [DOCUMENT_ID] if field == DOCUMENT_ID else [field, DOCUMENT_ID]
+    for order_field in fields:
+        query = query.order_by(order_field, direction=direction)
+
+    if cursor:
+        values = decode_cursor(cursor, sort)
+        if len(values) != len(fields):
+            raise PaginationError("Curseur de pagination invalide")
+        query = query.start_after(dict(zip(fields, values)))
+
+    return query, fields
+
+
+def paginate(query, limit, cursor=None, sort=None, sortable_fields=()):
+    """Fetch one page of a query using keyset pagination.
+
+    Returns the page's document snapshots and the opaque cursor of the
+    next page, or None when this is the last one.
+    """
+    query, fields = order_query(query, cursor, sort, sortable_fields)
+
+    # Fetch one extra document to know whether another page exists
+    docs = list(query.limit(limit + 1).stream())
+    if len(docs) <= limit:
+        return docs, None
+
+    docs = docs[:limit]
+    last = docs[-1]
+    last_data = last.to_dict()
+    values = [
+        last.id if order_field == DOCUMENT_ID else last_data.get(order_field)
+        for order_field in fields
+    ]
+    return docs, encode_cursor(sort, values)
+
+
+def stream_query(query, limit=None, cursor=None, sort=None,
+                 sortable_fields=()):
+    """Iterate over a query's documents as the storage layer yields them.
+
+    The query is validated and built eagerly, so invalid parameters are
+    reported before a streamed response starts.
+    """
+    query, _ = order_query(query, cursor, sort, sortable_fields)
+    if limit is not None:
+        query = query.limit(limit)
+    return query.stream()
@@ -0,0 +1,100 @@
+import cProfile
+import hmac
+import os
+import pstats
+import random
+import re
+import threading
+import time
+
+from config import Config
+
+# Functions listed in the X-Profile-Top response header
+TOP_FUNCTIONS = 10
+
+# One profiled request at a time per process: it bounds the overhead, and
+# recent Pythons only allow one active profiler
+_lock = threading.Lock()
+
+
+def authorized(token):
+    """Whether a request's X-Profile header carries the profiling token."""
+    return bool(Config.PROFILING_TOKEN) and bool(token) and \
+        hmac.compare_digest(token.encode(), Config.PROFILING_TOKEN.encode())
+
+
+def sampled():
+    """Whether to profile a request picked at random; sampled profiles are
+    only kept as dumps in PROFILING_DIR."""
+    return bool(Config.PROFILING_DIR) and Config.PROFILING_SAMPLE_RATE > 0 \
+        and random.random() < Config.PROFILING_SAMPLE_RATE
+
+
+def start():
+    """Profile the current thread, or return None if another request is
+    being profiled."""
+    if not _lock.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except BaseException:
+        _lock.release()
+        raise
+    return profiler
+
+
+def stop(profiler):
+    profiler.disable()
+    _lock.release()
+    return pstats.Stats(profiler)
+
+
+def top_functions(stats, count=TOP_FUNCTIONS):
+    """(function, calls, cumulative seconds) of the functions with the
+    most cumulative time."""
+    entries = sorted(
+        stats.stats.items(), key=lambda entry: entry[1][3], reverse=True
+    )
+    return [
+        (pstats.func_std_string(function), calls, cumulative)
+        for function, (_, calls, _, cumulative, _) in entries[:count]
+    ]
+
+
+def format_top(functions):
+    # Header values cannot hold newlines; paths are shortened to the file
+    return '; '.join(
+        f"{os.path.basename(name)} {calls} {cumulative * 1000:.2f}ms"
+        for name, calls, cumulative in functions
+    )
+
+
+def dump(stats, method, route):
+    """Save the stats as a pstats file in PROFILING_DIR; returns its
+    name, or None without a directory."""
+    if not Config.PROFILING_DIR:
+        return None
+    os.makedirs(Config.PROFILING_DIR, exist_ok=True)
+    slug = re.sub(r'[^A-Za-z0-9]+', '-', route).strip('-') or 'root'
+    name = (f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-"
+            f"{method.lower()}-{slug}-{random.getrandbits(32):08x}.prof")
+    stats.dump_stats(os.path.join(Config.PROFILING_DIR, name))
+    return name
+
+
+def list_dumps():
+    if not Config.PROFILING_DIR or not os.path.isdir(Config.PROFILING_DIR):
+        return []
+    return sorted(
+        (name for name in os.listdir(Config.PROFILING_DIR)
+         if name.endswith('.prof')),
+        reverse=True
+    )
+
+
+def dump_path(name):
+    """Path of a dump, or None if `name` is not one of them."""
+    if name not in list_dumps():
+        return None
+    return os.path.join(Config.PROFILING_DIR, name)
@@ -0,0 +1,396 @@
+import heapq
+import itertools
+import re
+import threading
+import unicodedata
+from datetime import datetime
+from datetime import timedelta
+
+from config import Config
+
+from models import db
+
+from models.book import COLLECTION_NAME
+from models.book import DELETIONS_COLLECTION
+from models.book import Book
+
+from services.stats_service import get_collection_versions
+from services.tracing import traced
+
+# Relative weight of a match in each indexed field
+FIELD_WEIGHTS = {
+    'title': 3.0,
+    'isbn': 3.0,
+    'author': 2.0,
+    'category': 1.0,
+}
+
+# Whole-word matches rank above prefix matches, which rank above substrings
+EXACT_MATCH = 1.0
+PREFIX_MATCH = 0.75
+SUBSTRING_MATCH = 0.5
+
+# Deletions are kept this long for the other workers' refreshes; an index
+# that has not synced for longer is rebuilt instead
+DELETIONS_RETENTION = timedelta(days=7)
+
+# Past this many score tier combinations, matches are scored one by one
+MAX_LEVEL_COMBINATIONS = 64
+
+# Books of the smallest set checked one by one before intersecting in bulk
+INTERSECTION_PROBE_LIMIT = 2000
+
+_WORD_RE = re.compile(r'[a-z0-9]+')
+_ISBN_RE = re.compile(r'^[0-9xX\- ]+$')
+
+
+def normalize(text):
+    """Lowercase and strip accents so 'Éric' matches 'eric'."""
+    decomposed = unicodedata.normalize('NFKD', str(text))
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return stripped.lower()
+
+
+def tokenize(text):
+    if not text:
+        return []
+    return _WORD_RE.findall(normalize(text))
+
+
+def _isbn_token(value):
+    # ISBNs are indexed as one token without separators
+    return re.sub(r'[^0-9x]', '', normalize(value))
+
+
+def _grams(token):
+    """Short prefixes and trigrams used to find tokens by substring."""
+    grams = {token[:1], token[:2]}
+    grams.update(token[i:i + 3] for i in range(len(token) - 2))
+    return grams
+
+
+def _book_fields(book):
+    return {
+        'title': book.title,
+        'author': book.author,
+        'category': book.category,
+        'isbn': book.isbn,
+    }
+
+
+class BookSearchIndex:
+    """Inverted index of book tokens with a trigram index over the tokens.
+
+    Postings map each token to the books containing it, grouped by their
+    field-based weight, so the best matches of a term can be read tier by
+    tier without scoring every book. The gram index maps trigrams (and 1-2
+    character prefixes) to vocabulary tokens, so partial words are
+    resolved against the vocabulary rather than against every book.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = {}
+        self._grams = {}
+        self._book_tokens = {}
+        self.ready = False
+        self.synced_until = None
+        # Books version (stats/counters) the index reflects
+        self.synced_version = None
+
+    def __len__(self):
+        return len(self._book_tokens)
+
+    def add(self, book_id, fields):
+        tokens = {}
+        for field, value in fields.items():
+            if not value:
+                continue
+            weight = FIELD_WEIGHTS[field]
+            if field == 'isbn':
+                words = [_isbn_token(value)]
+            else:
+                words = tokenize(value)
+            for token in words:
+                if token:
+                    tokens[token] = tokens.get(token, 0) + weight
+
+        with self._lock:
+            self._remove(book_id)
+            self._book_tokens[book_id] = tokens
+            for token, weight in tokens.items():
+                tiers = self._postings.get(token)
+                if tiers is None:
+                    tiers = self._postings[token] = {}
+                    for gram in _grams(token):
+                        self._grams.setdefault(gram, set()).add(token)
+                tiers.setdefault(weight, set()).add(book_id)
+
+    def remove(self, book_id):
+        with self._lock:
+            self._remove(book_id)
+
+    def _remove(self, book_id):
+        for token, weight in self._book_tokens.pop(book_id, {}).items():
+            tiers = self._postings[token]
+            tiers[weight].discard(book_id)
+            if not tiers[weight]:
+                del tiers[weight]
+            if tiers:
+                continue
+            # Last book using this token: drop it from the vocabulary
+            del self._postings[token]
+            for gram in _grams(token):
+                tokens = self._grams[gram]
+                tokens.discard(token)
+                if not tokens:
+                    del self._grams[gram]
+
+    def clear(self):
+        with self._lock:
+            self._postings = {}
+            self._grams = {}
+            self._book_tokens = {}
+            self.ready = False
+            self.synced_until = None
+            self.synced_version = None
+
+    def _matching_tokens(self, term):
+        """Vocabulary tokens matching a query term, with their match factor."""
+        if len(term) < 3:
+            candidates = self._grams.get(term, ())
+        else:
+            gram_sets = []
+            for i in range(len(term) - 2):
+                tokens = self._grams.get(term[i:i + 3])
+                if not tokens:
+                    return []
+                gram_sets.append(tokens)
+            # The two rarest grams narrow the candidates enough: every
+            # candidate is checked against the whole term below
+            gram_sets.sort(key=len)
+            candidates = gram_sets[0].intersection(*gram_sets[1:2])
+
+        matches = []
+        for token in candidates:
+            if token == term:
+                matches.append((token, EXACT_MATCH))
+            elif token.startswith(term):
+                matches.append((token, PREFIX_MATCH))
+            elif term in token:
+                matches.append((token, SUBSTRING_MATCH))
+        return matches
+
+    def _score_levels(self, term):
+        """Group the books matching a term by score, best score first."""
+        levels = {}
+        for token, factor in self._matching_tokens(term):
+            for weight, book_ids in self._postings[token].items():
+                levels.setdefault(weight * factor, []).append(book_ids)
+        return [
+            (score, sets[0] if len(sets) == 1 else set().union(*sets))
+            for score, sets in sorted(levels.items(), reverse=True)
+        ]
+
+    def _parse_query(self, query):
+        if _ISBN_RE.match(query) and sum(c.isdigit() for c in query) >= 3:
+            return [_isbn_token(query)]
+        return list(dict.fromkeys(tokenize(query)))
+
+    def search(self, query, limit):
+        """Return up to `limit` (book_id, score) pairs, best first.
+
+        Every query term has to match (AND semantics); a book's score is
+        the sum over terms of its best weighted match.
+        """
+        terms = self._parse_query(query)
+        if not terms:
+            return []
+
+        with self._lock:
+            per_term = [self._score_levels(term) for term in terms]
+            if not all(per_term):
+                return []
+
+            combinations = [()]
+            for levels in per_term:
+                combinations = [
+                    combination + (level,)
+                    for combination in combinations
+                    for level in levels
+                ]
+                if len(combinations) > MAX_LEVEL_COMBINATIONS:
+                    return self._search_by_scoring(per_term, limit)
+
+            # Walk score combinations from the best total down: the first
+            # combination containing a book is its best one
+            combinations.sort(
+                key=lambda combination: sum(s for s, _ in combination),
+                reverse=True
+            )
+            results = []
+            seen = set()
+            for combination in combinations:
+                score = sum(s for s, _ in combination)
+                book_ids = _take_intersection(
+                    [ids for _, ids in combination], seen,
+                    limit - len(results)
+                )
+                results.extend((book_id, score) for book_id in book_ids)
+                if len(results) >= limit:
+                    break
+                # Not enough books to fill the page: these were all of them
+                seen.update(book_ids)
+            return results
+
+    def _search_by_scoring(self, per_term, limit):
+        # Many terms or score tiers: score the intersection one by one
+        best = []
+        for levels in per_term:
+            scores = {}
+            for score, book_ids in reversed(levels):
+                scores.update(dict.fromkeys(book_ids, score))
+            best.append(scores)
+        best.sort(key=len)
+        ranked = {
+            book_id: sum(scores[book_id] for scores in best)
+            for book_id in best[0]
+            if all(book_id in scores for scores in best[1:])
+        }
+        return heapq.nlargest(limit, ranked.items(), key=lambda i: i[1])
+
+
+def _take_intersection(sets, seen, count):
+    """Up to `count` books found in every set and not in `seen`."""
+    sets = sorted(sets, key=len)
+    smallest, others = sets[0], sets[1:]
+
+    # Dense intersections fill the page after probing a few books
+    found = []
+    for book_id in itertools.islice(smallest, INTERSECTION_PROBE_LIMIT):
+        if book_id not in seen and all(book_id in ids for ids in others):
+            found.append(book_id)
+            if len(found) == count:
+                return found
+    if len(smallest) <= INTERSECTION_PROBE_LIMIT:
+        return found
+
+    # Sparse ones are left to the C set operations
+    matches = smallest.intersection(*others) if others else smallest
+    unseen = (book_id for book_id in matches if book_id not in seen)
+    return list(itertools.islice(unseen, count))
+
+
+book_index = BookSearchIndex()
+
+# Held while the index is rebuilt or refreshed, so that concurrent
+# searches do not repeat the same scan
+_sync_lock = threading.Lock()
+
+
+def index_book(book):
+    # Until the index is built there is nothing to maintain
+    if book_index.ready:
+        book_index.add(book.id, _book_fields(book))
+
+
+def unindex_book(book_id):
+    if book_index.ready:
+        book_index.remove(book_id)
+
+
+def record_deletion(batch, book_id):
+    """Stage the tombstone through which the other workers' indexes learn
+    about a deleted book."""
+    now = datetime.utcnow()
+    batch.set(db.collection(DELETIONS_COLLECTION).document(book_id), {
+        'deleted_at': now.isoformat(),
+        'expire_at': now + DELETIONS_RETENTION,
+    })
+
+
+def warmup_search_index():
+    """Build the index when a worker starts, instead of in its first
+    search; searches arriving meanwhile wait for it."""
+    with _sync_lock:
+        if not book_index.ready:
+            rebuild_search_index(get_collection_versions()['books'])
+
+
+def rebuild_search_index(version=None):
+    """Rebuild the book index from a full scan of the collection."""
+    started_at = datetime.utcnow()
+    with book_index._lock:
+        book_index.clear()
+        for doc in db.collection(COLLECTION_NAME).stream():
+            book = Book.from_dict(doc.to_dict(), doc.id)
+            book_index.add(book.id, _book_fields(book))
+        book_index.synced_until = started_at
+        book_index.synced_version = version
+        book_index.ready = True
+    return len(book_index)
+
+
+def refresh_search_index(version=None):
+    """Pick up books written or deleted by other workers since the last
+    sync."""
+    now = datetime.utcnow()
+    if now - book_index.synced_until > DELETIONS_RETENTION:
+        # Some tombstones may have expired since
+        rebuild_search_index(version)
+        return
+
+    # Overlap the previous window to tolerate clock skew between writers
+    since = (book_index.synced_until - timedelta(
+        seconds=Config.SEARCH_INDEX_REFRESH_SECONDS
+    )).isoformat()
+    updated = db.collection(COLLECTION_NAME).where('updated_at', '>=', since)
+    for doc in updated.stream():
+        book = Book.from_dict(doc.to_dict(), doc.id)
+        book_index.add(book.id, _book_fields(book))
+    deleted = db.collection(DELETIONS_COLLECTION).where(
+        'deleted_at', '>=', since
+    )
+    for doc in deleted.stream():
+        book_index.remove(doc.id)
+    book_index.synced_until = now
+    book_index.synced_version = version
+
+
+def _behind(version):
+    return not book_index.ready or book_index.synced_version is None or (
+        version > book_index.synced_version
+    )
+
+
+@traced
+def search_books(query, limit, version):
+    """Books matching `query`, best first, from an index that reflects at
+    least `version` of the books collection, so that the results match
+    the ETag derived from it."""
+    if _behind(version):
+        # Concurrent searches wait for one rebuild or refresh
+        with _sync_lock:
+            if not book_index.ready:
+                rebuild_search_index(version)
+            elif _behind(version):
+                refresh_search_index(version)
+
+    ranked = book_index.search(query, limit)
+    if not ranked:
+        return []
+
+    # One batched read for the whole result page
+    refs = [
+        db.collection(COLLECTION_NAME).document(book_id)
+        for book_id, _ in ranked
+    ]
+    books = {}
+    for doc in db.get_all(refs):
+        if doc.exists:
+            books[doc.id] = Book.from_dict(doc.to_dict(), doc.id)
+        else:
+            # Deleted through another worker since it was indexed
+            book_index.remove(doc.id)
+
+    return [books[book_id] for book_id, _ in ranked if book_id in books]
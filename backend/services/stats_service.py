@@ -0,0 +1,119 @@
+import asyncio
+import threading
+
+from models import async_storage
+from models import count_documents_async
+from models import db
+from models import increment
+
+from models.book import COLLECTION_NAME as BOOK_COLLECTION
+from models.loan import COLLECTION_NAME as LOAN_COLLECTION
+from models.member import COLLECTION_NAME as MEMBER_COLLECTION
+
+from models.stats import COLLECTION_NAME
+from models.stats import COUNTER_FIELDS
+from models.stats import COUNTERS_DOCUMENT
+from models.stats import VERSION_FIELDS
+
+from services.tracing import traced
+
+# Set once this process has seen the counters document, so that only the
+# first write pays for the existence check
+_seeded = False
+_seed_lock = threading.Lock()
+
+
+def get_counters_ref():
+    return db.collection(COLLECTION_NAME).document(COUNTERS_DOCUMENT)
+
+
+def increment_counters(batch, **deltas):
+    """Stage counter increments in the caller's batch or transaction."""
+    changes = {
+        field: increment(delta)
+        for field, delta in deltas.items()
+        if delta
+    }
+    if changes:
+        seed_counters()
+        batch.set(get_counters_ref(), changes, merge=True)
+
+
+def seed_counters():
+    """Create the counters document from the collections if it is missing.
+
+    An increment merged into a missing document would create it with the
+    incremented fields only, and the reads would then never reconcile.
+    """
+    global _seeded
+    if _seeded:
+        return
+    with _seed_lock:
+        # Concurrent writes of this process wait for the seed instead of
+        # recounting, which would drop the increments committed meanwhile
+        if not _seeded and not get_counters_ref().get().exists:
+            reconcile_stats()
+        _seeded = True
+
+
+@traced
+def get_library_stats():
+    stats = async_storage.run(get_library_stats_async())
+    if stats is None:
+        # First read after a fresh deployment: seed the counters
+        return reconcile_stats()
+    return stats
+
+
+async def get_library_stats_async():
+    """The counters, or None if the document was not seeded yet."""
+    doc = await async_storage.client.collection(COLLECTION_NAME).document(
+        COUNTERS_DOCUMENT
+    ).get()
+    if not doc.exists:
+        return None
+
+    counters = doc.to_dict()
+    return {field: counters.get(field, 0) for field in COUNTER_FIELDS}
+
+
+@traced
+def get_collection_versions():
+    doc = get_counters_ref().get()
+    counters = doc.to_dict() if doc.exists else {}
+    return {
+        collection: counters.get(field, 0)
+        for collection, field in VERSION_FIELDS.items()
+    }
+
+
+def count_library_stats():
+    return async_storage.run(count_library_stats_async())
+
+
+async def count_library_stats_async():
+    client = async_storage.client
+    books = client.collection(BOOK_COLLECTION)
+    members = client.collection(MEMBER_COLLECTION)
+    loans = client.collection(LOAN_COLLECTION)
+
+    queries = {
+        'total_books': books,
+        'available_books': books.where('is_available', '==', True),
+        'total_members': members,
+        'active_loans': loans.where('returned', '==', False),
+        # Loans flagged by the overdue sweep, which clears returned ones
+        'overdue_loans': loans.where('overdue', '==', True),
+    }
+    # The aggregations are independent: one round trip for all of them
+    counts = await asyncio.gather(
+        *(count_documents_async(query) for query in queries.values())
+    )
+    return dict(zip(queries, counts))
+
+
+def reconcile_stats():
+    """Recompute the counters from the collections to repair any drift."""
+    stats = count_library_stats()
+    get_counters_ref().set(stats, merge=True)
+    return stats
@@ -0,0 +1,180 @@
+import functools
+import json
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from datetime import timezone
+
+from config import Config
+
+# Spans kept per trace; a request looping over storage calls (e.g. an
+# import) records how many it dropped instead
+MAX_SPANS = 1000
+
+# W3C trace context, and Google Cloud's header when behind its load balancer
+TRACEPARENT = re.compile(
+    r'^[0-9a-f]{2}-([0-9a-f]{32})-[0-9a-f]{16}-[0-9a-f]{2}$'
+)
+CLOUD_TRACE_CONTEXT = re.compile(r'^([0-9a-f]{32})(/|$)')
+
+# Most recent traces of this process, newest last
+_traces = deque(maxlen=Config.TRACING_BUFFER_SIZE)
+_file_lock = threading.Lock()
+# Trace of the request served by the current thread
+_local = threading.local()
+
+
+class Span:
+    def __init__(self, name, attributes, start=None):
+        self.name = name
+        self.attributes = attributes
+        self.start = time.perf_counter() if start is None else start
+        self.end = None
+        self.children = []
+
+    def to_dict(self, origin):
+        return {
+            'name': self.name,
+            'start_ms': round((self.start - origin) * 1000, 3),
+            'duration_ms': round((self.end - self.start) * 1000, 3),
+            'attributes': self.attributes,
+            'children': [child.to_dict(origin) for child in self.children],
+        }
+
+
+class Trace:
+    def __init__(self, trace_id, name, attributes):
+        self.trace_id = trace_id
+        self.started_at = datetime.now(timezone.utc)
+        self.root = Span(name, attributes)
+        self.stack = [self.root]
+        self.spans = 1
+        self.dropped = 0
+
+    def add(self, span):
+        if self.spans >= MAX_SPANS:
+            self.dropped += 1
+            return False
+        self.spans += 1
+        self.stack[-1].children.append(span)
+        return True
+
+    def to_dict(self):
+        data = self.root.to_dict(self.root.start)
+        del data['start_ms']
+        return {
+            'trace_id': self.trace_id,
+            'started_at': self.started_at.isoformat(),
+            **data,
+            'dropped_spans': self.dropped,
+        }
+
+
+def trace_id_from_headers(headers):
+    """Trace ID of the caller, from a `traceparent` or Google Cloud
+    `X-Cloud-Trace-Context` header, or None."""
+    match = TRACEPARENT.match(headers.get('traceparent', '').lower())
+    if match is None:
+        match = CLOUD_TRACE_CONTEXT.match(
+            headers.get('X-Cloud-Trace-Context', '').lower()
+        )
+    return match.group(1) if match else None
+
+
+def start_trace(name, trace_id=None, **attributes):
+    trace = Trace(trace_id or uuid.uuid4().hex, name, attributes)
+    _local.trace = trace
+    return trace
+
+
+def current_trace():
+    return getattr(_local, 'trace', None)
+
+
+def finish_trace(**attributes):
+    """Close the current trace and export it."""
+    trace = current_trace()
+    if trace is None:
+        return None
+    _local.trace = None
+    trace.root.attributes.update(attributes)
+    trace.root.end = time.perf_counter()
+    _export(trace.to_dict())
+    return trace
+
+
+def _export(data):
+    _traces.append(data)
+    if Config.TRACING_FILE:
+        line = json.dumps(data, default=str) + '\n'
+        with _file_lock, open(Config.TRACING_FILE, 'a') as output:
+            output.write(line)
+
+
+@contextmanager
+def span(name, **attributes):
+    """Time the enclosed block as a child of the current span, if the
+    current thread is tracing a request."""
+    trace = current_trace()
+    if trace is None:
+        yield None
+        return
+
+    current = Span(name, attributes)
+    if not trace.add(current):
+        yield None
+        return
+    trace.stack.append(current)
+    try:
+        yield current
+    finally:
+        current.end = time.perf_counter()
+        trace.stack.pop()
+
+
+def traced(function):
+    """Record each call of a function as a span."""
+    module = function.__module__.rsplit('.', 1)[-1]
+    name = f'{module}.{function.__qualname__}'
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if getattr(_local, 'trace', None) is None:
+            return function(*args, **kwargs)
+        with span(name):
+            return function(*args, **kwargs)
+
+    return wrapper
+
+
+def storage_call(operation, target, seconds, documents=0, writes=()):
+    """Storage recorder hook (see models.instrumentation): a leaf span of
+    the current span."""
+    trace = current_trace()
+    if trace is None:
+        return
+    end = time.perf_counter()
+    attributes = {'target': target, 'documents': documents}
+    if writes:
+        attributes['writes'] = dict(Counter(writes))
+    call = Span(f'storage.{operation}', attributes, start=end - seconds)
+    call.end = end
+    trace.add(call)
+
+
+def get_traces(limit=None):
+    """Recent traces of this process, newest first."""
+    traces = list(reversed(_traces))
+    return traces[:limit] if limit else traces
+
+
+def get_trace(trace_id):
+    for trace in reversed(_traces):
+        if trace['trace_id'] == trace_id:
+            return trace
+    return None
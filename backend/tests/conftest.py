@@ -7,7 +7,7 @@ from unittest.mock import patch
 # Patch firestore client
 @pytest.fixture(autouse=True)
 def mock_firestore_client():
-    with patch('models.__init__.firestore.Client') as mock_client:
+    with patch('google.cloud.firestore.Client') as mock_client:
         mock_db = MagicMock()
         mock_client.return_value = mock_db
         yield mock_db
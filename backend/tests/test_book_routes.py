@@ -128,3 +128,79 @@ def test_delete_book(client):
     # Verify the book was deleted
     response = client.get(f'/api/books/{book_id}')
     assert response.status_code == 404
+
+
+def test_get_books_paginated(client):
+    # Create a few books with known titles
+    prefix = f"Paginated {uuid.uuid4()}"
+    book_ids = []
+    for index in range(5):
+        response = client.post(
+            '/api/books',
+            data=json.dumps({'title': f"{prefix} {index}",
+                             'author': 'Page Author'}),
+            content_type='application/json'
+        )
+        book_ids.append(json.loads(response.data).get('id'))
+
+    # Walk every page sorted by descending title
+    seen = []
+    cursor = None
+    while True:
+        url = '/api/books?limit=2&sort=-title'
+        if cursor:
+            url += f'&cursor={cursor}'
+        response = client.get(url)
+        assert response.status_code == 200
+        page = json.loads(response.data)
+        assert len(page) <= 2
+        seen.extend(page)
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            break
+
+    titles = [book['title'] for book in seen]
+    assert titles == sorted(titles, reverse=True)
+    assert len({book['id'] for book in seen}) == len(seen)
+    assert set(book_ids) <= {book['id'] for book in seen}
+
+    # Cleanup
+    for book_id in book_ids:
+        client.delete(f'/api/books/{book_id}')
+
+
+def test_get_books_invalid_page_args(client):
+    assert client.get('/api/books?sort=description').status_code == 400
+    assert client.get('/api/books?limit=abc').status_code == 400
+    assert client.get('/api/books?cursor=not-a-cursor').status_code == 400
+
+
+def test_get_books_streamed(client):
+    title = f"Streamed Book {uuid.uuid4()}"
+    response = client.post(
+        '/api/books',
+        data=json.dumps({'title': title, 'author': 'Stream Author'}),
+        content_type='application/json'
+    )
+    book_id = json.loads(response.data).get('id')
+
+    response = client.get('/api/books?format=ndjson')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    lines = response.data.decode().splitlines()
+    books = [json.loads(line) for line in lines]
+    assert title in [book['title'] for book in books]
+
+    response = client.get('/api/books?format=json-stream&sort=title')
+    assert response.status_code == 200
+    books = json.loads(response.data)
+    titles = [book['title'] for book in books]
+    assert title in titles
+    assert titles == sorted(titles)
+
+    # Invalid parameters are rejected before streaming starts
+    response = client.get('/api/books?format=ndjson&sort=description')
+    assert response.status_code == 400
+
+    # Cleanup
+    client.delete(f'/api/books/{book_id}')
@@ -0,0 +1,109 @@
+import json
+import uuid
+
+from services.cache import MISSING
+from services.cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_cache_expires_entries():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=5, clock=clock)
+    cache.set('a', 1)
+    assert cache.get('a') == 1
+
+    clock.now = 5
+    assert cache.get('a') is MISSING
+    assert len(cache) == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+
+    assert cache.get('b') is MISSING
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert cache.evictions == 1
+
+
+def test_cache_invalidate_and_disable():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set('a', 1)
+    cache.invalidate('a')
+    assert cache.get('a') is MISSING
+
+    disabled = TTLCache(maxsize=2, ttl=0)
+    disabled.set('a', 1)
+    assert disabled.get('a') is MISSING
+
+
+def test_book_lookups_are_cached_and_invalidated(client):
+    from services.cache import book_cache
+
+    response = client.post(
+        '/api/books',
+        data=json.dumps({'title': f"Cached Book {uuid.uuid4()}",
+                         'author': 'Cache Author'}),
+        content_type='application/json'
+    )
+    book_id = json.loads(response.data).get('id')
+
+    client.get(f'/api/books/{book_id}')
+    hits = book_cache.hits
+    client.get(f'/api/books/{book_id}')
+    assert book_cache.hits == hits + 1
+
+    # Writes go through the service functions, which invalidate the entry
+    client.put(
+        f'/api/books/{book_id}',
+        data=json.dumps({'title': 'Renamed'}),
+        content_type='application/json'
+    )
+    response = client.get(f'/api/books/{book_id}')
+    assert json.loads(response.data)['title'] == 'Renamed'
+
+    client.delete(f'/api/books/{book_id}')
+    assert client.get(f'/api/books/{book_id}').status_code == 404
+
+    stats = json.loads(client.get('/api/cache').data)
+    assert stats['books']['hits'] >= 1
+
+
+def test_update_does_not_write_back_a_stale_cached_copy(client):
+    from models import db
+
+    response = client.post(
+        '/api/books',
+        data=json.dumps({'title': f"Stale {uuid.uuid4()}", 'author': 'A'}),
+        content_type='application/json'
+    )
+    book_id = json.loads(response.data)['id']
+    available = json.loads(client.get('/api/stats').data)['availableBooks']
+
+    # Cached here, then lent by another worker
+    client.get(f'/api/books/{book_id}')
+    db.collection('books').document(book_id).update({'is_available': False})
+
+    response = client.put(f'/api/books/{book_id}',
+                          data=json.dumps({'title': 'Nouveau titre'}),
+                          content_type='application/json')
+    assert response.status_code == 200
+    stored = db.collection('books').document(book_id).get().to_dict()
+    assert stored['is_available'] == False
+    assert stored['title'] == 'Nouveau titre'
+    assert json.loads(client.get('/api/stats').data)['availableBooks'] == \
+        available
+
+    client.delete(f'/api/books/{book_id}')
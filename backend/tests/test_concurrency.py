@@ -0,0 +1,73 @@
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+# Requests served at once, as by a gthread worker
+THREADS = 16
+
+
+def _run_concurrently(task, count=THREADS):
+    barrier = threading.Barrier(count, timeout=5)
+
+    def run(index):
+        barrier.wait()
+        return task(index)
+
+    with ThreadPoolExecutor(max_workers=count) as executor:
+        return list(executor.map(run, range(count)))
+
+
+def test_concurrent_reads_share_the_client_and_cache(app):
+    from services.cache import book_cache
+
+    client = app.test_client()
+    response = client.post(
+        '/api/books',
+        data=json.dumps({'title': f"Concurrent {uuid.uuid4()}",
+                         'author': 'Author'}),
+        content_type='application/json'
+    )
+    book_id = json.loads(response.data)['id']
+    lookups = book_cache.hits + book_cache.misses
+
+    def read(_):
+        # One test client per thread, like one connection per request
+        thread_client = app.test_client()
+        return [
+            thread_client.get(f'/api/books/{book_id}').status_code
+            for _ in range(10)
+        ]
+
+    statuses = _run_concurrently(read)
+    assert statuses == [[200] * 10] * THREADS
+    # Every lookup was counted once, none lost to a race
+    assert book_cache.hits + book_cache.misses - lookups == THREADS * 10
+
+    # Cleanup
+    client.delete(f'/api/books/{book_id}')
+
+
+def test_concurrent_searches_build_the_index_once(app):
+    from services import search_service
+
+    search_service.book_index.ready = False
+    rebuild = search_service.rebuild_search_index
+
+    def slow_rebuild(version):
+        # Long enough for every search to arrive during the rebuild
+        time.sleep(0.1)
+        return rebuild(version)
+
+    with patch('services.search_service.rebuild_search_index',
+               side_effect=slow_rebuild) as rebuild_mock:
+        statuses = _run_concurrently(
+            lambda _: app.test_client().get(
+                '/api/books/search?q=concurrent'
+            ).status_code
+        )
+
+    assert statuses == [200] * THREADS
+    assert rebuild_mock.call_count == 1
@@ -0,0 +1,89 @@
+import json
+import uuid
+
+
+def _create_book(client, **fields):
+    data = {'title': f"ETag Book {uuid.uuid4()}", 'author': 'ETag Author'}
+    data.update(fields)
+    response = client.post(
+        '/api/books',
+        data=json.dumps(data),
+        content_type='application/json'
+    )
+    assert response.status_code == 201
+    return json.loads(response.data)['id']
+
+
+def test_book_list_not_modified_until_write(client):
+    book_id = _create_book(client)
+
+    response = client.get('/api/books')
+    etag = response.headers['ETag']
+    assert response.headers['Cache-Control'] == 'no-cache'
+
+    response = client.get('/api/books', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+
+    # Different query strings are different representations
+    response = client.get('/api/books?limit=1',
+                          headers={'If-None-Match': etag})
+    assert response.status_code == 200
+
+    client.delete(f'/api/books/{book_id}')
+    response = client.get('/api/books', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_single_book_not_modified_until_update(client):
+    book_id = _create_book(client)
+    try:
+        response = client.get(f'/api/books/{book_id}')
+        etag = response.headers['ETag']
+
+        response = client.get(f'/api/books/{book_id}',
+                              headers={'If-None-Match': etag})
+        assert response.status_code == 304
+
+        client.put(
+            f'/api/books/{book_id}',
+            data=json.dumps({'title': 'ETag Book updated'}),
+            content_type='application/json'
+        )
+        response = client.get(f'/api/books/{book_id}',
+                              headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert json.loads(response.data)['title'] == 'ETag Book updated'
+    finally:
+        client.delete(f'/api/books/{book_id}')
+
+
+def test_loan_list_etag_changes_with_checkout(client):
+    book_id = _create_book(client)
+    response = client.post(
+        '/api/members',
+        data=json.dumps({'first_name': 'ETag', 'last_name': 'Member',
+                         'email': f"etag-{uuid.uuid4()}@example.com"}),
+        content_type='application/json'
+    )
+    member_id = json.loads(response.data)['id']
+    try:
+        etag = client.get('/api/loans').headers['ETag']
+        stats_etag = client.get('/api/stats').headers['ETag']
+
+        response = client.post(
+            '/api/loans',
+            data=json.dumps({'book_id': book_id, 'member_id': member_id}),
+            content_type='application/json'
+        )
+        assert response.status_code == 201
+
+        response = client.get('/api/loans', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        response = client.get('/api/stats',
+                              headers={'If-None-Match': stats_etag})
+        assert response.status_code == 200
+    finally:
+        client.delete(f'/api/members/{member_id}')
+        client.delete(f'/api/books/{book_id}')
@@ -0,0 +1,77 @@
+import csv
+import gzip
+import io
+import json
+import uuid
+from datetime import datetime
+from datetime import timedelta
+
+
+def _create_book(client, author):
+    response = client.post(
+        '/api/books',
+        data=json.dumps({'title': f"Export Book {uuid.uuid4()}",
+                         'author': author}),
+        content_type='application/json'
+    )
+    return json.loads(response.data)['id']
+
+
+def test_export_books_ndjson(client):
+    author = f"Export Author {uuid.uuid4()}"
+    book_id = _create_book(client, author)
+
+    response = client.get('/api/export/books')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    rows = [json.loads(line) for line in response.data.splitlines()]
+    assert any(row['id'] == book_id and row['author'] == author
+               for row in rows)
+
+    client.delete(f'/api/books/{book_id}')
+
+
+def test_export_csv_gzip_since(client):
+    author = f"Export Author {uuid.uuid4()}"
+    since = datetime.utcnow() - timedelta(seconds=1)
+    book_id = _create_book(client, author)
+
+    response = client.get(
+        f'/api/export/books?format=csv&since={since.isoformat()}',
+        headers={'Accept-Encoding': 'gzip'}
+    )
+    assert response.headers['Content-Encoding'] == 'gzip'
+    text = gzip.decompress(response.data).decode('utf-8')
+    rows = list(csv.DictReader(io.StringIO(text)))
+    assert book_id in [row['id'] for row in rows]
+    assert all(row['updated_at'] >= since.isoformat() for row in rows)
+
+    later = (datetime.utcnow() + timedelta(days=1)).isoformat()
+    response = client.get(f'/api/export/books?format=csv&since={later}')
+    assert response.data.decode('utf-8').splitlines() == [
+        'id,title,author,isbn,publication_year,category,description,'
+        'is_available,created_at,updated_at'
+    ]
+
+    client.delete(f'/api/books/{book_id}')
+
+
+def test_export_rejects_invalid_parameters(client):
+    assert client.get('/api/export/stats').status_code == 404
+    assert client.get('/api/export/books?format=xml').status_code == 400
+    assert client.get('/api/export/loans?since=hier').status_code == 400
+
+
+def test_export_command(app, client, tmp_path):
+    author = f"Export Author {uuid.uuid4()}"
+    book_id = _create_book(client, author)
+    path = tmp_path / 'books.ndjson.gz'
+
+    result = app.test_cli_runner().invoke(
+        args=['export', 'books', '--gzip', '--output', str(path)]
+    )
+    assert result.exit_code == 0
+    lines = gzip.decompress(path.read_bytes()).splitlines()
+    assert book_id in [json.loads(line)['id'] for line in lines]
+
+    client.delete(f'/api/books/{book_id}')
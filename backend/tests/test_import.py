@@ -0,0 +1,123 @@
+import json
+import sqlite3
+import uuid
+
+from models import db
+
+
+def _delete_books_by(client, author):
+    books = json.loads(client.get('/api/books').data)
+    ids = [book['id'] for book in books if book['author'] == author]
+    for book_id in ids:
+        client.delete(f'/api/books/{book_id}')
+    return len(ids)
+
+
+def test_bulk_import_csv_reports_invalid_rows(client):
+    author = f"Import Author {uuid.uuid4()}"
+    before = json.loads(client.get('/api/stats').data)
+    body = (
+        "title,author,publication_year\n"
+        f"Premier,{author},1999\n"
+        f",{author},2000\n"
+        f"Troisième,{author},année\n"
+        f"Quatrième,{author},\n"
+    )
+
+    response = client.post('/api/books/bulk', data=body.encode(),
+                           content_type='text/csv')
+    assert response.status_code == 200
+    report = json.loads(response.data)
+    assert report['imported'] == 2
+    assert [error['row'] for error in report['errors']] == [3, 4]
+
+    after = json.loads(client.get('/api/stats').data)
+    assert after['totalBooks'] == before['totalBooks'] + 2
+    assert after['availableBooks'] == before['availableBooks'] + 2
+
+    assert _delete_books_by(client, author) == 2
+
+
+def test_bulk_import_ndjson_commits_in_batches(client, monkeypatch):
+    from services import import_service
+
+    monkeypatch.setattr(import_service, 'BOOKS_PER_BATCH', 2)
+    batches = []
+    real_batch = db.batch
+
+    def counting_batch():
+        batches.append(1)
+        return real_batch()
+
+    monkeypatch.setattr(db, 'batch', counting_batch)
+
+    author = f"Import Author {uuid.uuid4()}"
+    lines = [json.dumps({'title': f"Livre {i}", 'author': author})
+             for i in range(5)]
+    lines.insert(2, '{not json')
+    response = client.post('/api/books/bulk?format=ndjson',
+                           data='\n'.join(lines))
+    report = json.loads(response.data)
+
+    assert report['imported'] == 5
+    assert report['errors'] == [{'row': 3, 'error': 'Ligne JSON invalide'}]
+    assert len(batches) == 3
+
+    monkeypatch.undo()
+    assert _delete_books_by(client, author) == 5
+
+
+def test_bulk_import_reports_batches_failed_on_sqlite(client, monkeypatch,
+                                                     tmp_path):
+    from models.sqlite import SqliteClient
+    from services import import_service
+
+    class ImpatientClient(SqliteClient):
+        # Fail at once on a locked database rather than after the timeout
+        def _connection(self):
+            connection = super()._connection()
+            connection.execute('PRAGMA busy_timeout=0')
+            return connection
+
+    path = str(tmp_path / 'library.db')
+    storage = ImpatientClient(path)
+    assert storage.collection('books').count().get()[0][0].value == 0
+    monkeypatch.setattr(import_service, 'db', storage)
+
+    # Another process holds the write lock
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute('BEGIN IMMEDIATE')
+    try:
+        response = client.post(
+            '/api/books/bulk', data=b"title,author\nPremier,A\nSecond,A\n",
+            content_type='text/csv'
+        )
+    finally:
+        other.execute('ROLLBACK')
+        other.close()
+
+    assert response.status_code == 200
+    report = json.loads(response.data)
+    assert report['imported'] == 0
+    assert [error['row'] for error in report['errors']] == [2, 3]
+    assert storage.collection('books').count().get()[0][0].value == 0
+    storage.close()
+
+
+def test_bulk_import_rejects_unknown_format(client):
+    response = client.post('/api/books/bulk', data='x',
+                           content_type='text/plain')
+    assert response.status_code == 400
+
+
+def test_import_books_command(app, client, tmp_path):
+    author = f"Import Author {uuid.uuid4()}"
+    path = tmp_path / 'books.csv'
+    path.write_text(f"title,author\nDepuis la CLI,{author}\n",
+                    encoding='utf-8')
+
+    result = app.test_cli_runner().invoke(args=['import-books', str(path)])
+    assert result.exit_code == 0
+    assert 'imported: 1' in result.output
+
+    assert _delete_books_by(client, author) == 1
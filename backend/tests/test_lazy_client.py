@@ -0,0 +1,56 @@
+import os
+import threading
+
+import pytest
+
+from models import LazyClient
+
+
+class Client:
+    def collection(self, name):
+        return name
+
+
+def test_client_is_created_once_on_first_use():
+    created = []
+
+    def factory():
+        created.append(Client())
+        return created[-1]
+
+    db = LazyClient(factory, reset_on_fork=False)
+    assert db.initialized == False
+    assert created == []
+
+    threads = [threading.Thread(target=db.collection, args=('books',))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(created) == 1
+    assert db.collection('books') == 'books'
+    assert db.get() is created[0]
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="fork() is POSIX only")
+def test_forked_child_creates_its_own_client():
+    db = LazyClient(Client)
+    parent_client = db.get()
+
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        # Child: the inherited client is dropped and created again
+        inherited = db.initialized
+        reused = db.get() is parent_client
+        os.write(write, bytes([inherited, reused]))
+        os._exit(0)
+
+    os.close(write)
+    result = os.read(read, 2)
+    os.close(read)
+    os.waitpid(pid, 0)
+    assert result == bytes([False, False])
+    assert db.get() is parent_client
@@ -115,3 +115,429 @@ def test_return_loan(client):
     # Cleanup
     client.delete(f'/api/books/{book_id}')
     client.delete(f'/api/members/{member_id}')
+
+
+def test_get_loans_by_status(client):
+    book_response = client.post(
+        '/api/books',
+        data=json.dumps({'title': f"Test Book {uuid.uuid4()}",
+                         'author': 'Test Author'}),
+        content_type='application/json'
+    )
+    book_id = json.loads(book_response.data).get('id')
+    member_response = client.post(
+        '/api/members',
+        data=json.dumps({'first_name': 'Test', 'last_name': 'User',
+                         'email': f'test{uuid.uuid4()}@example.com'}),
+        content_type='application/json'
+    )
+    member_id = json.loads(member_response.data).get('id')
+
+    # A loan whose due date is already past
+    loan_data = {
+        'book_id': book_id,
+        'member_id': member_id,
+        'loan_date': (datetime.utcnow() - timedelta(days=30)).isoformat(),
+        'due_date': (datetime.utcnow() - timedelta(days=16)).isoformat()
+    }
+    loan_response = client.post(
+        '/api/loans',
+        data=json.dumps(loan_data),
+        content_type='application/json'
+    )
+    loan_id = json.loads(loan_response.data).get('id')
+
+    def loan_ids(status):
+        response = client.get(f'/api/loans?status={status}&limit=1000')
+        assert response.status_code == 200
+        return {loan['id']: loan for loan in json.loads(response.data)}
+
+    overdue = loan_ids('overdue')
+    assert loan_id in overdue
+    assert overdue[loan_id]['is_overdue'] == True
+    assert loan_id in loan_ids('active')
+    assert loan_id not in loan_ids('returned')
+
+    client.put(f'/api/loans/{loan_id}/return')
+    assert loan_id not in loan_ids('overdue')
+    assert loan_id not in loan_ids('active')
+    assert loan_id in loan_ids('returned')
+
+    # Cleanup
+    client.delete(f'/api/books/{book_id}')
+    client.delete(f'/api/members/{member_id}')
+
+
+def test_get_loans_invalid_status(client):
+    assert client.get('/api/loans?status=lost').status_code == 400
+    response = client.get('/api/loans?status=overdue&sort=loan_date')
+    assert response.status_code == 400
+
+
+def test_get_loans_expanded(client, monkeypatch):
+    from models import db
+    from routes import loan_routes
+
+    # A page is expanded whole, whatever the chunk size of streams
+    monkeypatch.setattr(loan_routes, 'EXPAND_CHUNK_SIZE', 1)
+
+    member_response = client.post(
+        '/api/members',
+        data=json.dumps({'first_name': 'Expand', 'last_name': 'User',
+                         'email': f'test{uuid.uuid4()}@example.com'}),
+        content_type='application/json'
+    )
+    member_id = json.loads(member_response.data).get('id')
+
+    book_ids = []
+    loan_ids = []
+    for index in range(2):
+        book_response = client.post(
+            '/api/books',
+            data=json.dumps({'title': f"Expand Book {index}",
+                             'author': 'Expand Author'}),
+            content_type='application/json'
+        )
+        book_ids.append(json.loads(book_response.data).get('id'))
+        loan_response = client.post(
+            '/api/loans',
+            data=json.dumps({'book_id': book_ids[-1],
+                             'member_id': member_id}),
+            content_type='application/json'
+        )
+        loan_ids.append(json.loads(loan_response.data).get('id'))
+
+    # Count the batched reads made by the endpoint
+    calls = []
+    get_all = db.get_all
+
+    def counting_get_all(references, **kwargs):
+        references = list(references)
+        calls.append(references)
+        return get_all(references, **kwargs)
+
+    monkeypatch.setattr(db, 'get_all', counting_get_all, raising=False)
+
+    response = client.get('/api/loans?expand=book,member&limit=1000')
+    assert response.status_code == 200
+    loans = {loan['id']: loan for loan in json.loads(response.data)}
+
+    for index, loan_id in enumerate(loan_ids):
+        assert loans[loan_id]['book'] == {
+            'id': book_ids[index],
+            'title': f"Expand Book {index}",
+            'author': 'Expand Author'
+        }
+        assert loans[loan_id]['member'] == {
+            'id': member_id, 'first_name': 'Expand', 'last_name': 'User'
+        }
+
+    # One multi-get, with the shared member fetched only once
+    assert len(calls) == 1
+    member_refs = [ref for ref in calls[0] if ref.id == member_id]
+    assert len(member_refs) == 1
+
+    # A stream is expanded chunk by chunk instead
+    calls.clear()
+    response = client.get('/api/loans?expand=book,member&format=ndjson')
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.data.splitlines()]
+    assert len(calls) == len(rows)
+
+    # Cleanup
+    for loan_id in loan_ids:
+        client.put(f'/api/loans/{loan_id}/return')
+    for book_id in book_ids:
+        client.delete(f'/api/books/{book_id}')
+    client.delete(f'/api/members/{member_id}')
+
+
+def test_get_loans_invalid_expand(client):
+    assert client.get('/api/loans?expand=library').status_code == 400
+
+
+def _create_book_and_member(client):
+    book_response = client.post(
+        '/api/books',
+        data=json.dumps({'title': f"Checkout Book {uuid.uuid4()}",
+                         'author': 'Checkout Author'}),
+        content_type='application/json'
+    )
+    member_response = client.post(
+        '/api/members',
+        data=json.dumps({'first_name': 'Checkout', 'last_name': 'User',
+                         'email': f'checkout{uuid.uuid4()}@example.com'}),
+        content_type='application/json'
+    )
+    return (json.loads(book_response.data)['id'],
+            json.loads(member_response.data)['id'])
+
+
+def test_add_loan_with_timezone_aware_dates(client):
+    book_id, member_id = _create_book_and_member(client)
+
+    response = client.post(
+        '/api/loans',
+        data=json.dumps({'book_id': book_id, 'member_id': member_id,
+                         'loan_date': '2030-01-01T10:00:00+02:00',
+                         'due_date': '2030-01-15T10:00:00+02:00'}),
+        content_type='application/json'
+    )
+    assert response.status_code == 201
+    loan = json.loads(response.data)
+    # Stored as naive UTC, like every other timestamp
+    assert loan['loan_date'] == '2030-01-01T08:00:00'
+    assert loan['due_date'] == '2030-01-15T08:00:00'
+
+    response = client.post(
+        '/api/loans',
+        data=json.dumps({'book_id': book_id, 'member_id': member_id,
+                         'due_date': 'demain'}),
+        content_type='application/json'
+    )
+    assert response.status_code == 400
+
+    # Cleanup
+    client.put(f"/api/loans/{loan['id']}/return")
+    client.delete(f'/api/books/{book_id}')
+    client.delete(f'/api/members/{member_id}')
+
+
+def test_add_loan_unknown_member(client):
+    book_id, member_id = _create_book_and_member(client)
+
+    response = client.post(
+        '/api/loans',
+        data=json.dumps({'book_id': book_id, 'member_id': 'inconnu'}),
+        content_type='application/json'
+    )
+    assert response.status_code == 404
+    assert json.loads(client.get(f'/api/books/{book_id}').data)[
+        'is_available'] == True
+
+    # Cleanup
+    client.delete(f'/api/books/{book_id}')
+    client.delete(f'/api/members/{member_id}')
+
+
+def test_add_loan_retries_after_concurrent_write(client, monkeypatch):
+    from models import db
+    from services import loan_service
+
+    book_id, member_id = _create_book_and_member(client)
+    monkeypatch.setattr(loan_service, 'CONFLICT_BACKOFF_SECONDS', 0)
+
+    # Another worker writes the book between our read and our commit
+    reads = []
+    read = loan_service._read_checkout_documents
+
+    def racing_read(refs):
+        docs = read(refs)
+        if not reads:
+            db.collection('books').document(book_id).update(
+                {'description': 'Modifié entre-temps'}
+            )
+        reads.append(refs)
+        return docs
+
+    monkeypatch.setattr(loan_service, '_read_checkout_documents',
+                        racing_read)
+
+    response = client.post(
+        '/api/loans',
+        data=json.dumps({'book_id': book_id, 'member_id': member_id}),
+        content_type='application/json'
+    )
+    assert response.status_code == 201
+    loan_id = json.loads(response.data)['id']
+    # The first commit was rejected, the checkout was read again
+    assert len(reads) == 2
+
+    monkeypatch.undo()
+    book = json.loads(client.get(f'/api/books/{book_id}').data)
+    assert book['is_available'] == False
+    assert book['description'] == 'Modifié entre-temps'
+
+    # Cleanup
+    client.put(f'/api/loans/{loan_id}/return')
+    client.delete(f'/api/books/{book_id}')
+    client.delete(f'/api/members/{member_id}')
+
+
+def test_concurrent_checkouts_lend_one_copy(client, monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from services import loan_service
+
+    book_id, member_id = _create_book_and_member(client)
+    monkeypatch.setattr(loan_service, 'CONFLICT_BACKOFF_SECONDS', 0.001)
+
+    def checkout(_):
+        try:
+            return loan_service.create_new_loan(book_id, member_id)
+        except loan_service.LoanError:
+            return None
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        loans = [loan for loan in executor.map(checkout, range(8)) if loan]
+    assert len(loans) == 1
+
+    # Cleanup
+    client.put(f'/api/loans/{loans[0].id}/return')
+    client.delete(f'/api/books/{book_id}')
+    client.delete(f'/api/members/{member_id}')
+
+
+def test_batch_checkout_and_return(client, monkeypatch):
+    from models import db
+
+    pairs = [_create_book_and_member(client) for _ in range(2)]
+    book_ids = [book_id for book_id, _ in pairs]
+    taken_id, member_id = _create_book_and_member(client)
+    response = client.post(
+        '/api/loans',
+        data=json.dumps({'book_id': taken_id, 'member_id': member_id}),
+        content_type='application/json'
+    )
+    taken_loan_id = json.loads(response.data)['id']
+
+    # One multi-get and one commit for the whole desk transaction
+    calls = {'get_all': 0, 'commit': 0}
+    get_all = db.get_all
+    batch = db.batch
+
+    def counting_get_all(references, **kwargs):
+        calls['get_all'] += 1
+        return get_all(references, **kwargs)
+
+    def counting_batch():
+        real = batch()
+        commit = real.commit
+
+        def counting_commit():
+            calls['commit'] += 1
+            return commit()
+
+        real.commit = counting_commit
+        return real
+
+    monkeypatch.setattr(db, 'get_all', counting_get_all, raising=False)
+    monkeypatch.setattr(db, 'batch', counting_batch)
+
+    items = [
+        {'book_id': book_ids[0], 'member_id': member_id},
+        {'book_id': taken_id, 'member_id': member_id},
+        {'book_id': book_ids[1], 'member_id': 'inconnu'},
+        {'book_id': book_ids[1], 'member_id': member_id},
+        {'book_id': book_ids[1], 'member_id': member_id},
+    ]
+    response = client.post('/api/loans/batch',
+                           data=json.dumps({'loans': items}),
+                           content_type='application/json')
+    assert response.status_code == 200
+    results = json.loads(response.data)
+    assert [result['status'] for result in results] == [
+        201, 400, 404, 201, 400
+    ]
+    assert calls == {'get_all': 1, 'commit': 1}
+    loan_ids = [results[0]['loan']['id'], results[3]['loan']['id']]
+
+    response = client.put(
+        '/api/loans/return/batch',
+        data=json.dumps({'loan_ids': loan_ids + [loan_ids[0], 'inconnu']}),
+        content_type='application/json'
+    )
+    results = json.loads(response.data)
+    assert [result['status'] for result in results] == [200, 200, 400, 404]
+    assert all(results[i]['loan']['returned'] == True for i in range(2))
+    # The loans, then their books
+    assert calls == {'get_all': 3, 'commit': 2}
+
+    monkeypatch.undo()
+    for book_id in book_ids:
+        book = json.loads(client.get(f'/api/books/{book_id}').data)
+        assert book['is_available'] == True
+
+    # Cleanup
+    client.put(f'/api/loans/{taken_loan_id}/return')
+    for book_id in book_ids + [taken_id]:
+        client.delete(f'/api/books/{book_id}')
+    for other_member_id in [member_id] + [m for _, m in pairs]:
+        client.delete(f'/api/members/{other_member_id}')
+
+
+def test_batch_return_with_a_deleted_book(client):
+    pairs = [_create_book_and_member(client) for _ in range(2)]
+    loan_ids = []
+    for book_id, member_id in pairs:
+        response = client.post(
+            '/api/loans',
+            data=json.dumps({'book_id': book_id, 'member_id': member_id}),
+            content_type='application/json'
+        )
+        loan_ids.append(json.loads(response.data)['id'])
+    client.delete(f'/api/books/{pairs[0][0]}')
+    before = json.loads(client.get('/api/stats').data)
+
+    response = client.put('/api/loans/return/batch',
+                          data=json.dumps({'loan_ids': loan_ids}),
+                          content_type='application/json')
+    assert response.status_code == 200
+    results = json.loads(response.data)
+    assert [result['status'] for result in results] == [200, 200]
+
+    assert client.get(f'/api/books/{pairs[0][0]}').status_code == 404
+    book = json.loads(client.get(f'/api/books/{pairs[1][0]}').data)
+    assert book['is_available'] == True
+    after = json.loads(client.get('/api/stats').data)
+    assert after['activeLoans'] == before['activeLoans'] - 2
+    assert after['availableBooks'] == before['availableBooks'] + 1
+
+    # Cleanup
+    client.delete(f'/api/books/{pairs[1][0]}')
+    for _, member_id in pairs:
+        client.delete(f'/api/members/{member_id}')
+
+
+def test_return_of_a_book_already_marked_available(client):
+    from services.stats_service import count_library_stats
+
+    book_id, member_id = _create_book_and_member(client)
+    response = client.post(
+        '/api/loans',
+        data=json.dumps({'book_id': book_id, 'member_id': member_id}),
+        content_type='application/json'
+    )
+    loan_id = json.loads(response.data)['id']
+    client.put(f'/api/books/{book_id}',
+               data=json.dumps({'is_available': True}),
+               content_type='application/json')
+
+    before = json.loads(client.get('/api/stats').data)['availableBooks']
+    counted = count_library_stats()['available_books']
+
+    assert client.put(f'/api/loans/{loan_id}/return').status_code == 200
+    after = json.loads(client.get('/api/stats').data)['availableBooks']
+    # The book was already counted as available
+    assert after == before
+    assert count_library_stats()['available_books'] == counted
+
+    # Cleanup
+    client.delete(f'/api/books/{book_id}')
+    client.delete(f'/api/members/{member_id}')
+
+
+def test_batch_endpoints_validate_body(client):
+    response = client.post('/api/loans/batch', data=json.dumps({'loans': []}),
+                           content_type='application/json')
+    assert response.status_code == 400
+    response = client.post(
+        '/api/loans/batch',
+        data=json.dumps({'loans': [{'book_id': 'x'}]}),
+        content_type='application/json'
+    )
+    assert response.status_code == 400
+    response = client.put('/api/loans/return/batch',
+                          data=json.dumps({'loan_ids': [1]}),
+                          content_type='application/json')
+    assert response.status_code == 400
@@ -0,0 +1,113 @@
+import pytest
+from google.api_core.exceptions import FailedPrecondition
+from google.api_core.exceptions import NotFound
+
+from models import increment
+from models.memory import MemoryClient
+from models.memory import transactional
+from models.sqlite import SqliteClient
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def client(request, tmp_path):
+    # Both local engines must behave the same
+    indexes = {'books': {'genre': 'hash', 'year': 'sorted'}}
+    if request.param == 'memory':
+        client = MemoryClient(indexes=indexes)
+    else:
+        client = SqliteClient(str(tmp_path / 'library.db'), indexes=indexes)
+        request.addfinalizer(client.close)
+    books = client.collection('books')
+    for doc_id, genre, year in [
+        ('a', 'roman', 1990), ('b', 'poesie', 2001), ('c', 'roman', 2001),
+        ('d', 'essai', 1985), ('e', 'roman', 2010),
+    ]:
+        books.document(doc_id).set({'genre': genre, 'year': year})
+    books.document('f').set({'genre': 'roman'})
+    return client
+
+
+def _ids(query):
+    return [doc.id for doc in query.stream()]
+
+
+def test_filters(client):
+    books = client.collection('books')
+    assert _ids(books.where('genre', '==', 'roman')) == ['a', 'c', 'e', 'f']
+    assert _ids(books.where('year', '<', 2001)) == ['a', 'd']
+    assert _ids(books.where('year', '>=', 2001)) == ['b', 'c', 'e']
+    assert _ids(books.where('genre', 'in', ['essai', 'poesie'])) == ['b', 'd']
+    assert _ids(
+        books.where('genre', '==', 'roman').where('year', '>', 1995)
+    ) == ['c', 'e']
+    # Range filters only match values of the same type
+    assert _ids(books.where('year', '<', '2000')) == []
+
+
+def test_order_limit_and_cursor(client):
+    books = client.collection('books')
+    query = books.order_by('year', direction='DESCENDING')
+    # Documents without the ordered field are skipped
+    assert _ids(query) == ['e', 'c', 'b', 'a', 'd']
+
+    page = query.limit(2)
+    assert _ids(page) == ['e', 'c']
+    after = page.start_after({'year': 2001, '__name__': 'c'})
+    assert _ids(after) == ['b', 'a']
+
+    unindexed = books.order_by('genre').order_by('__name__')
+    assert _ids(unindexed.start_after({'genre': 'poesie', '__name__': 'b'})) \
+        == ['a', 'c', 'e', 'f']
+    assert books.where('genre', '==', 'roman').count().get()[0][0].value == 4
+
+
+def test_indexes_follow_writes(client):
+    books = client.collection('books')
+    books.document('a').update({'genre': 'essai', 'year': 2020})
+    books.document('c').delete()
+    books.document('g').set({'genre': 'roman', 'year': 1950})
+
+    assert _ids(books.where('genre', '==', 'roman')) == ['e', 'f', 'g']
+    assert _ids(books.order_by('year').limit(2)) == ['g', 'd']
+    assert _ids(books.where('year', '>', 2005)) == ['a', 'e']
+
+
+def test_batch_is_atomic(client):
+    books = client.collection('books')
+    snapshot = books.document('a').get()
+    books.document('a').update({'year': 1991})
+
+    batch = client.batch()
+    batch.set(books.document('h'), {'genre': 'roman'})
+    batch.update(books.document('a'), {'year': 1992},
+                 option=client.write_option(
+                     last_update_time=snapshot.update_time))
+    with pytest.raises(FailedPrecondition):
+        batch.commit()
+    assert not books.document('h').get().exists
+
+    batch = client.batch()
+    batch.set(books.document('h'), {'genre': 'roman'})
+    batch.update(books.document('missing'), {'year': 1})
+    with pytest.raises(NotFound):
+        batch.commit()
+    assert not books.document('h').get().exists
+
+
+def test_transaction_retries_on_conflict(client):
+    stats = client.collection('stats').document('counters')
+    stats.set({'count': 0})
+    attempts = []
+
+    @transactional
+    def add_one(transaction):
+        snapshot, = transaction.get_all([stats])
+        if not attempts:
+            # Concurrent write between the read and the commit
+            stats.set({'count': increment(10)}, merge=True)
+        attempts.append(snapshot.to_dict()['count'])
+        transaction.update(stats, {'count': snapshot.to_dict()['count'] + 1})
+
+    add_one(client.transaction())
+    assert attempts == [0, 10]
+    assert stats.get().to_dict() == {'count': 11}
@@ -0,0 +1,129 @@
+import json
+import threading
+import uuid
+
+from services import metrics
+
+REQUESTS_KEY = 'library_http_requests_total'
+
+
+def _get_calls():
+    return metrics.snapshot().get(
+        ('library_storage_calls_total', (('operation', 'get'),)), 0
+    )
+
+
+def test_metrics_exposition(client):
+    client.get(f'/api/books/{uuid.uuid4()}')
+    response = client.get('/api/metrics')
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+
+    body = response.get_data(as_text=True)
+    assert '# TYPE library_http_request_duration_seconds histogram' in body
+    assert ('library_http_requests_total{route="/api/books/<book_id>",'
+            'method="GET",status="404"}') in body
+    assert ('library_http_request_duration_seconds_bucket{'
+            'route="/api/books/<book_id>",method="GET",status="404",'
+            'le="+Inf"}') in body
+    assert ('library_http_request_duration_seconds_count{'
+            'route="/api/books/<book_id>",method="GET",status="404"}') in body
+    assert 'library_storage_calls_total{operation="get"}' in body
+
+
+def test_unknown_paths_share_one_route_label(client):
+    client.get(f'/api/{uuid.uuid4()}')
+    totals = metrics.snapshot()
+    assert totals[(REQUESTS_KEY, (('route', 'unmatched'), ('method', 'GET'),
+                                  ('status', '404')))] >= 1
+
+
+def test_storage_calls_are_counted_per_request(client):
+    labels = (('route', '/api/books/<book_id>'), ('method', 'GET'),
+              ('status', '404'))
+    request_calls = metrics.snapshot().get(
+        ('library_http_request_storage_calls_total', labels), 0
+    )
+    get_calls = _get_calls()
+
+    # An unknown book is not cached: each lookup reads the storage
+    client.get(f'/api/books/{uuid.uuid4()}')
+
+    assert _get_calls() == get_calls + 1
+    assert metrics.snapshot()[
+        ('library_http_request_storage_calls_total', labels)
+    ] == request_calls + 1
+
+
+def test_batched_writes_and_reads(client):
+    from models import db
+
+    writes_key = ('library_storage_writes_total', (('operation', 'set'),))
+    reads_key = ('library_storage_documents_read_total', ())
+    before = metrics.snapshot()
+
+    collection = db.collection(f'metrics-{uuid.uuid4()}')
+    batch = db.batch()
+    for index in range(3):
+        batch.set(collection.document(str(index)), {'index': index})
+    batch.commit()
+    assert len(list(collection.where('index', '>=', 1).stream())) == 2
+
+    after = metrics.snapshot()
+    assert after[writes_key] == before.get(writes_key, 0) + 3
+    assert after[reads_key] == before.get(reads_key, 0) + 2
+
+    for index in range(3):
+        collection.document(str(index)).delete()
+
+
+def test_counters_of_all_threads_are_summed():
+    name = f'test_counter_{uuid.uuid4().hex}'
+
+    def count():
+        for _ in range(1000):
+            metrics.inc(name)
+
+    threads = [threading.Thread(target=count) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert metrics.snapshot()[(name, ())] == 8000
+
+
+def test_counters_of_finished_threads_are_folded():
+    name = f'test_counter_{uuid.uuid4().hex}'
+
+    def count():
+        metrics.inc(name)
+
+    for _ in range(3):
+        threads = [threading.Thread(target=count) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    # Only the threads still running keep a dict of their own
+    assert len(metrics._registry) <= threading.active_count()
+    assert metrics.snapshot()[(name, ())] == 24
+
+
+def test_collect_sums_the_workers_files(client, tmp_path, monkeypatch):
+    from config import Config
+
+    monkeypatch.setattr(Config, 'METRICS_DIR', str(tmp_path))
+    labels = [['route', '/api/stats'], ['method', 'GET'], ['status', '200']]
+    # Counters published by another worker
+    (tmp_path / 'metrics-1.json').write_text(json.dumps([
+        [REQUESTS_KEY, labels, 5],
+    ]))
+    client.get('/api/stats')
+    own = metrics.snapshot()[(REQUESTS_KEY, tuple(map(tuple, labels)))]
+
+    totals = metrics.collect()
+    assert totals[(REQUESTS_KEY, tuple(map(tuple, labels)))] == own + 5
+    assert (tmp_path / 'metrics-1.json').exists() == True
+
+    metrics.clear_process_files()
+    assert list(tmp_path.iterdir()) == []
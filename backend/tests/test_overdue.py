@@ -0,0 +1,177 @@
+import json
+import uuid
+from datetime import datetime
+from datetime import timedelta
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def fresh_sweep():
+    from services.loan_service import get_sweep_ref
+
+    get_sweep_ref().delete()
+    yield
+    get_sweep_ref().delete()
+
+
+def _create_loan(client, due_date):
+    book_id = json.loads(client.post(
+        '/api/books',
+        data=json.dumps({'title': f"Overdue {uuid.uuid4()}",
+                         'author': 'Author'}),
+        content_type='application/json'
+    ).data)['id']
+    member_id = json.loads(client.post(
+        '/api/members',
+        data=json.dumps({'first_name': 'Overdue', 'last_name': 'User',
+                         'email': f'overdue{uuid.uuid4()}@example.com'}),
+        content_type='application/json'
+    ).data)['id']
+    response = client.post(
+        '/api/loans',
+        data=json.dumps({
+            'book_id': book_id, 'member_id': member_id,
+            'loan_date': (due_date - timedelta(days=14)).isoformat(),
+            'due_date': due_date.isoformat(),
+        }),
+        content_type='application/json'
+    )
+    assert response.status_code == 201
+    return json.loads(response.data)['id'], book_id, member_id
+
+
+def _stored(loan_id):
+    from models import db
+    from models.loan import COLLECTION_NAME
+
+    return db.collection(COLLECTION_NAME).document(loan_id).get().to_dict()
+
+
+def _overdue_count(client):
+    return json.loads(client.get('/api/stats').data)['overdueLoans']
+
+
+def _cleanup(client, *loans):
+    for loan_id, book_id, member_id in loans:
+        client.put(f'/api/loans/{loan_id}/return')
+        client.delete(f'/api/books/{book_id}')
+        client.delete(f'/api/members/{member_id}')
+
+
+def test_sweep_only_reads_loans_due_since_the_last_run(client):
+    from services.loan_service import sweep_overdue_loans
+    from services.stats_service import count_library_stats
+
+    start = datetime.utcnow()
+    count = _overdue_count(client)
+    late = _create_loan(client, start - timedelta(days=3))
+    due = _create_loan(client, start + timedelta(days=1))
+
+    # Recorded after its due date: flagged at checkout
+    assert _stored(late[0])['overdue'] == True
+    assert _overdue_count(client) == count + 1
+
+    first = sweep_overdue_loans(now=start)
+    assert first['previous_watermark'] is None
+    assert _stored(due[0])['overdue'] == False
+
+    later = start + timedelta(days=2)
+    second = sweep_overdue_loans(now=later)
+    assert second['previous_watermark'] == start.isoformat()
+    assert _stored(due[0])['overdue'] == True
+    assert _overdue_count(client) == count + 1 + first['flagged'] + \
+        second['flagged']
+
+    # Nothing fell due since: the sweep reads no loan
+    third = sweep_overdue_loans(now=later)
+    assert third['scanned'] == 0 and third['flagged'] == 0
+
+    # Returns clear the flag and the counter
+    before_return = _overdue_count(client)
+    client.put(f'/api/loans/{due[0]}/return')
+    assert _stored(due[0])['overdue'] == False
+    assert _overdue_count(client) == before_return - 1
+    assert count_library_stats()['overdue_loans'] == _overdue_count(client)
+
+    _cleanup(client, late, due)
+
+
+def test_loan_returned_during_the_sweep_is_not_flagged(client):
+    from models import db
+    from models.loan import COLLECTION_NAME
+    from services.loan_service import _flag_overdue_chunk
+
+    loan = _create_loan(client, datetime.utcnow() + timedelta(days=1))
+    stale = db.collection(COLLECTION_NAME).document(loan[0]).get()
+    client.put(f'/api/loans/{loan[0]}/return')
+
+    assert _flag_overdue_chunk([stale]) == 0
+    assert _stored(loan[0])['overdue'] == False
+
+    _cleanup(client, loan)
+
+
+def test_sweep_endpoint_requires_the_cron_token(app, client):
+    url = '/api/loans/overdue/sweep'
+    assert client.post(url).status_code == 403
+
+    app.config['CRON_TOKEN'] = 'cron-secret'
+    assert client.post(url, headers={'X-Cron-Token': 'wrong'}) \
+        .status_code == 403
+    response = client.post(url, headers={'X-Cron-Token': 'cron-secret'})
+    assert response.status_code == 200
+    assert set(json.loads(response.data)) == {
+        'scanned', 'flagged', 'previous_watermark', 'watermark'
+    }
+
+
+def test_sweep_command(app):
+    result = app.test_cli_runner().invoke(args=['sweep-overdue'])
+    assert result.exit_code == 0
+    assert 'flagged: ' in result.output
+
+
+def test_sqlite_sweep_commits_while_other_threads_write(tmp_path,
+                                                        monkeypatch):
+    import threading
+
+    from models import indexes
+    from models.loan import COLLECTION_NAME
+    from models.loan import Loan
+    from models.sqlite import SqliteClient
+    from services import loan_service
+    from services import stats_service
+
+    sqlite = SqliteClient(str(tmp_path / 'library.db'), indexes=indexes)
+    monkeypatch.setattr(loan_service, 'db', sqlite)
+    monkeypatch.setattr(stats_service, 'db', sqlite)
+    monkeypatch.setattr(stats_service, '_seeded', True)
+    monkeypatch.setattr(loan_service, 'SWEEP_BATCH_LOANS', 5)
+
+    due = datetime.utcnow() - timedelta(days=1)
+    batch = sqlite.batch()
+    for index in range(12):
+        loan = Loan(book_id=f'b{index}', member_id='m', returned=False,
+                    loan_date=due - timedelta(days=14), due_date=due)
+        batch.set(sqlite.collection(COLLECTION_NAME).document(f'l{index}'),
+                  loan.to_dict())
+    batch.commit()
+
+    # Another request writes between the sweep's batches
+    flag_chunk = loan_service._flag_overdue_chunk
+
+    def flag_with_concurrent_write(docs):
+        writer = threading.Thread(
+            target=sqlite.collection('books').document().set,
+            args=({'title': 'Concurrent'},)
+        )
+        writer.start()
+        writer.join()
+        return flag_chunk(docs)
+
+    monkeypatch.setattr(loan_service, '_flag_overdue_chunk',
+                        flag_with_concurrent_write)
+    report = loan_service.sweep_overdue_loans()
+    assert report['scanned'] == 12 and report['flagged'] == 12
+    sqlite.close()
@@ -0,0 +1,74 @@
+import pstats
+
+import pytest
+
+TOKEN = 'secret-profiling-token'
+
+
+@pytest.fixture
+def profiling_config(monkeypatch, tmp_path):
+    from config import Config
+
+    monkeypatch.setattr(Config, 'PROFILING_TOKEN', TOKEN)
+    monkeypatch.setattr(Config, 'PROFILING_DIR', str(tmp_path))
+    return tmp_path
+
+
+def test_profile_requested_with_the_token(client, profiling_config):
+    response = client.get('/api/books?limit=5',
+                          headers={'X-Profile': TOKEN})
+    assert response.status_code == 200
+    assert 'ms' in response.headers['X-Profile-Top']
+
+    name = response.headers['X-Profile-Dump']
+    assert client.get('/api/debug/profiles',
+                      headers={'X-Profile': TOKEN}).get_json()[0] == name
+    download = client.get(f'/api/debug/profiles/{name}',
+                          headers={'X-Profile': TOKEN})
+    assert download.status_code == 200
+
+    path = profiling_config / 'download.prof'
+    path.write_bytes(download.data)
+    stats = pstats.Stats(str(path))
+    assert any(function[2] == 'get_books_page' for function in stats.stats)
+
+
+def test_invalid_token_is_ignored(client, profiling_config):
+    response = client.get('/api/health', headers={'X-Profile': 'wrong'})
+    assert 'X-Profile-Top' not in response.headers
+    assert list(profiling_config.iterdir()) == []
+    assert client.get('/api/debug/profiles',
+                      headers={'X-Profile': 'wrong'}).status_code == 403
+
+
+def test_header_is_ignored_without_a_configured_token(client, monkeypatch):
+    from config import Config
+
+    monkeypatch.setattr(Config, 'PROFILING_TOKEN', '')
+    response = client.get('/api/health', headers={'X-Profile': ''})
+    assert 'X-Profile-Top' not in response.headers
+    assert client.get('/api/debug/profiles',
+                      headers={'X-Profile': ''}).status_code == 403
+
+
+def test_sampled_requests_are_only_dumped(client, profiling_config,
+                                          monkeypatch):
+    from config import Config
+
+    monkeypatch.setattr(Config, 'PROFILING_SAMPLE_RATE', 1.0)
+    response = client.get('/api/stats')
+    assert 'X-Profile-Top' not in response.headers
+    dump, = profiling_config.iterdir()
+    assert '-get-api-stats-' in dump.name
+    assert dump.name.endswith('.prof') == True
+
+
+def test_one_profile_at_a_time(client, profiling_config):
+    from services import profiling
+
+    profiler = profiling.start()
+    try:
+        response = client.get('/api/health', headers={'X-Profile': TOKEN})
+    finally:
+        profiling.stop(profiler)
+    assert response.headers['X-Profile-Top'] == 'busy'
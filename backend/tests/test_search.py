@@ -0,0 +1,161 @@
+import json
+import uuid
+from datetime import datetime
+
+import pytest
+
+from services.search_service import BookSearchIndex
+
+
+@pytest.fixture
+def index():
+    index = BookSearchIndex()
+    index.add('b1', {'title': 'Le Petit Prince', 'author': 'Antoine de '
+                     'Saint-Exupéry', 'category': 'Conte',
+                     'isbn': '978-2-07-061275-8'})
+    index.add('b2', {'title': 'Les Misérables', 'author': 'Victor Hugo',
+                     'category': 'Roman', 'isbn': None})
+    index.add('b3', {'title': 'Prince of Persia', 'author': 'Jordan '
+                     'Mechner', 'category': 'Roman', 'isbn': None})
+    return index
+
+
+def test_index_ranks_title_above_author(index):
+    index.add('b4', {'title': 'Machiavel', 'author': 'Prince Consort',
+                     'category': None, 'isbn': None})
+    results = index.search('prince', 10)
+    assert len(results) == 3
+    assert results[-1][0] == 'b4'
+
+
+def test_index_matches_accents_prefixes_and_substrings(index):
+    assert [r[0] for r in index.search('exupery', 10)] == ['b1']
+    assert [r[0] for r in index.search('mis', 10)] == ['b2']
+    assert [r[0] for r in index.search('ugo', 10)] == ['b2']
+    assert [r[0] for r in index.search('978-2-07', 10)] == ['b1']
+
+
+def test_index_requires_every_term(index):
+    assert [r[0] for r in index.search('prince persia', 10)] == ['b3']
+    assert index.search('prince hugo', 10) == []
+
+
+def test_index_remove_and_update(index):
+    index.remove('b3')
+    assert [r[0] for r in index.search('prince', 10)] == ['b1']
+    index.add('b1', {'title': 'Vol de nuit', 'author': 'Saint-Exupéry',
+                     'category': None, 'isbn': None})
+    assert index.search('prince', 10) == []
+    assert [r[0] for r in index.search('nuit', 10)] == ['b1']
+
+
+def test_search_books_route(client):
+    marker = uuid.uuid4().hex[:12]
+    response = client.post(
+        '/api/books',
+        data=json.dumps({'title': f"Zephyr {marker}",
+                         'author': 'Search Author'}),
+        content_type='application/json'
+    )
+    book_id = json.loads(response.data).get('id')
+
+    response = client.get(f'/api/books/search?q={marker}')
+    assert response.status_code == 200
+    assert [book['id'] for book in json.loads(response.data)] == [book_id]
+
+    # The index follows updates and deletions
+    client.put(
+        f'/api/books/{book_id}',
+        data=json.dumps({'title': f"Aquilon {marker}"}),
+        content_type='application/json'
+    )
+    response = client.get('/api/books/search?q=aquilon')
+    assert book_id in [book['id'] for book in json.loads(response.data)]
+
+    client.delete(f'/api/books/{book_id}')
+    response = client.get(f'/api/books/search?q={marker}')
+    assert json.loads(response.data) == []
+
+
+def test_search_follows_writes_of_other_workers(client):
+    from models import db
+    from services.stats_service import increment_counters
+
+    marker = uuid.uuid4().hex[:12]
+    response = client.post(
+        '/api/books',
+        data=json.dumps({'title': f"Boreas {marker}",
+                         'author': 'Search Author'}),
+        content_type='application/json'
+    )
+    book_id = json.loads(response.data).get('id')
+    before = client.get(f'/api/books/search?q=notos+{marker}')
+    assert json.loads(before.data) == []
+
+    # Another worker renames the book: this worker's index is not told
+    batch = db.batch()
+    batch.update(db.collection('books').document(book_id), {
+        'title': f"Notos {marker}",
+        'updated_at': datetime.utcnow().isoformat()
+    })
+    increment_counters(batch, books_version=1)
+    batch.commit()
+
+    # The new ETag comes with results that already reflect the rename
+    response = client.get(f'/api/books/search?q=notos+{marker}', headers={
+        'If-None-Match': before.headers['ETag']
+    })
+    assert response.status_code == 200
+    assert [book['id'] for book in json.loads(response.data)] == [book_id]
+
+    # Cleanup
+    client.delete(f'/api/books/{book_id}')
+
+
+def test_search_drops_books_deleted_by_other_workers(client):
+    from models import db
+    from services import search_service
+    from services.stats_service import increment_counters
+
+    marker = uuid.uuid4().hex[:12]
+    book_ids = []
+    for title, author in [(f"Zephyr {marker}", marker),
+                          (f"Aquilon {marker}", 'Search Author')]:
+        response = client.post(
+            '/api/books',
+            data=json.dumps({'title': title, 'author': author}),
+            content_type='application/json'
+        )
+        book_ids.append(json.loads(response.data).get('id'))
+    response = client.get(f'/api/books/search?q={marker}&limit=1')
+    assert [book['id'] for book in json.loads(response.data)] == book_ids[:1]
+
+    # Another worker deletes the best match: this worker's index is not
+    # told, but must not fill the page with it
+    batch = db.batch()
+    batch.delete(db.collection('books').document(book_ids[0]))
+    search_service.record_deletion(batch, book_ids[0])
+    increment_counters(batch, total_books=-1, available_books=-1,
+                       books_version=1)
+    batch.commit()
+
+    response = client.get(f'/api/books/search?q={marker}&limit=1')
+    assert [book['id'] for book in json.loads(response.data)] == book_ids[1:]
+
+    # Cleanup
+    client.delete(f'/api/books/{book_ids[1]}')
+
+
+def test_index_is_built_at_warmup(app):
+    from services import search_service
+    from services.stats_service import get_collection_versions
+
+    search_service.book_index.clear()
+    search_service.warmup_search_index()
+    assert search_service.book_index.ready == True
+    assert search_service.book_index.synced_version == \
+        get_collection_versions()['books']
+
+
+def test_search_books_requires_query(client):
+    assert client.get('/api/books/search').status_code == 400
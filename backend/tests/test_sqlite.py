@@ -0,0 +1,158 @@
+import sqlite3
+import threading
+
+import pytest
+from google.api_core.exceptions import Aborted
+
+from models.sqlite import SqliteClient
+
+
+def _client(tmp_path):
+    return SqliteClient(str(tmp_path / 'library.db'), indexes={
+        'loans': {'returned': 'hash', 'due_date': 'sorted'},
+    })
+
+
+def test_documents_persist_across_clients(tmp_path):
+    client = _client(tmp_path)
+    batch = client.batch()
+    for index in range(3):
+        batch.set(client.collection('loans').document(f'l{index}'), {
+            'returned': index == 0,
+            'due_date': f'2025-01-0{index + 1}T00:00:00',
+        })
+    batch.commit()
+    client.close()
+
+    reopened = _client(tmp_path)
+    loans = reopened.collection('loans')
+    active = loans.where('returned', '==', False).order_by('due_date')
+    assert [doc.id for doc in active.stream()] == ['l1', 'l2']
+    assert loans.document('l0').get().to_dict()['returned'] == True
+    reopened.close()
+
+
+def test_indexed_fields_use_their_index(tmp_path):
+    client = _client(tmp_path)
+    query = client.collection('loans').where('returned', '==', False) \
+        .order_by('due_date').limit(10)
+    sql, parameters = client._compile(query, 'id')
+    plan = ' '.join(
+        row[-1] for row in client._connection().execute(
+            f'EXPLAIN QUERY PLAN {sql}', parameters
+        )
+    )
+    assert 'USING INDEX' in plan
+    client.close()
+
+
+def test_each_thread_has_its_own_connection(tmp_path):
+    client = _client(tmp_path)
+    loans = client.collection('loans')
+    connections = []
+
+    def write(index):
+        connections.append(client._connection())
+        loans.document(f'l{index}').set({'returned': False})
+
+    threads = [threading.Thread(target=write, args=(index,))
+               for index in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(map(id, connections))) == 4
+    assert loans.count().get()[0][0].value == 4
+    client.close()
+
+
+def test_stream_decodes_rows_as_they_are_consumed(tmp_path, monkeypatch):
+    import models.sqlite
+
+    client = _client(tmp_path)
+    loans = client.collection('loans')
+    batch = client.batch()
+    for index in range(5):
+        batch.set(loans.document(f'l{index}'), {'returned': False})
+    batch.commit()
+
+    decoded = []
+    loads = models.sqlite.json.loads
+
+    def counting_loads(text):
+        decoded.append(text)
+        return loads(text)
+
+    monkeypatch.setattr(models.sqlite.json, 'loads', counting_loads)
+    docs = loans.order_by(models.sqlite.DOCUMENT_ID).stream()
+    assert next(docs).id == 'l0'
+    assert len(decoded) == 1
+
+    # Writes of the same thread do not interrupt the stream
+    loans.document('l0').update({'returned': True})
+    assert [doc.id for doc in docs] == ['l1', 'l2', 'l3', 'l4']
+    client.close()
+
+
+def test_ordering_keeps_null_values_like_the_memory_engine(tmp_path):
+    from models.memory import ASCENDING
+    from models.memory import DESCENDING
+    from models.memory import MemoryClient
+
+    books = {
+        'b0': {'category': 'Roman', 'year': 2001},
+        'b1': {'category': None, 'year': 1999},
+        'b2': {'year': 2005},
+        'b3': {'category': 'Essai', 'year': None},
+        'b4': {'category': None, 'year': 2001},
+        'b5': {'category': 'Roman', 'year': 1999},
+    }
+    sqlite = SqliteClient(str(tmp_path / 'library.db'),
+                          indexes={'books': {'category': 'sorted'}})
+    memory = MemoryClient()
+    for client in (sqlite, memory):
+        batch = client.batch()
+        for book_id, data in books.items():
+            batch.set(client.collection('books').document(book_id), data)
+        batch.commit()
+
+    def pages(client, orders):
+        query = client.collection('books')
+        for field, direction in orders:
+            query = query.order_by(field, direction=direction)
+        ids, page = [], query.limit(1).get()
+        while page:
+            ids.append(page[0].id)
+            page = query.start_after(page[0]).limit(1).get()
+        return ids
+
+    for orders in (
+        [('category', ASCENDING)],
+        [('category', DESCENDING)],
+        [('category', ASCENDING), ('year', DESCENDING)],
+        [('category', DESCENDING), ('year', DESCENDING)],
+    ):
+        expected = pages(memory, orders)
+        assert 'b1' in expected and 'b2' not in expected
+        assert pages(sqlite, orders) == expected
+    sqlite.close()
+
+
+def test_locked_database_fails_the_commit_like_firestore(tmp_path):
+    client = _client(tmp_path)
+    client.collection('loans').document('l0').set({'returned': False})
+    client._connection().execute('PRAGMA busy_timeout=0')
+
+    # Another process holds the write lock
+    other = sqlite3.connect(str(tmp_path / 'library.db'),
+                            isolation_level=None)
+    other.execute('BEGIN IMMEDIATE')
+    with pytest.raises(Aborted):
+        client.collection('loans').document('l1').set({'returned': False})
+    other.execute('ROLLBACK')
+    other.close()
+
+    client.collection('loans').document('l1').set({'returned': True})
+    assert client.collection('loans').count().get()[0][0].value == 2
+    client.close()
@@ -0,0 +1,139 @@
+import asyncio
+import json
+import uuid
+
+
+def test_get_stats(client):
+    response = client.get('/api/stats')
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    for key in ['totalBooks', 'availableBooks', 'totalMembers', 'activeLoans']:
+        assert isinstance(data[key], int)
+
+
+def test_stats_count_new_book(client):
+    before = json.loads(client.get('/api/stats').data)
+
+    book_data = {'title': f"Stats Book {uuid.uuid4()}", 'author': 'Author'}
+    response = client.post(
+        '/api/books',
+        data=json.dumps(book_data),
+        content_type='application/json'
+    )
+    book_id = json.loads(response.data).get('id')
+
+    after = json.loads(client.get('/api/stats').data)
+    assert after['totalBooks'] == before['totalBooks'] + 1
+    assert after['availableBooks'] == before['availableBooks'] + 1
+
+    # Cleanup
+    client.delete(f'/api/books/{book_id}')
+
+
+def test_stats_follow_loan_lifecycle(client):
+    book_response = client.post(
+        '/api/books',
+        data=json.dumps({'title': f"Stats Loan {uuid.uuid4()}",
+                         'author': 'Author'}),
+        content_type='application/json'
+    )
+    book_id = json.loads(book_response.data).get('id')
+    member_response = client.post(
+        '/api/members',
+        data=json.dumps({'first_name': 'Stats', 'last_name': 'User',
+                         'email': f'stats{uuid.uuid4()}@example.com'}),
+        content_type='application/json'
+    )
+    member_id = json.loads(member_response.data).get('id')
+    before = json.loads(client.get('/api/stats').data)
+
+    loan_response = client.post(
+        '/api/loans',
+        data=json.dumps({'book_id': book_id, 'member_id': member_id}),
+        content_type='application/json'
+    )
+    loan_id = json.loads(loan_response.data).get('id')
+
+    during = json.loads(client.get('/api/stats').data)
+    assert during['activeLoans'] == before['activeLoans'] + 1
+    assert during['availableBooks'] == before['availableBooks'] - 1
+
+    client.put(f'/api/loans/{loan_id}/return')
+    after = json.loads(client.get('/api/stats').data)
+    assert after['activeLoans'] == before['activeLoans']
+    assert after['availableBooks'] == before['availableBooks']
+
+    # Cleanup
+    client.delete(f'/api/books/{book_id}')
+    client.delete(f'/api/members/{member_id}')
+
+
+def test_reconcile_stats_repairs_drift(app):
+    from services.stats_service import get_counters_ref
+    from services.stats_service import get_library_stats
+    from services.stats_service import reconcile_stats
+
+    expected = reconcile_stats()
+    get_counters_ref().set({'total_books': expected['total_books'] + 42},
+                           merge=True)
+    assert get_library_stats()['total_books'] == expected['total_books'] + 42
+
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['reconcile-stats'])
+    assert result.exit_code == 0
+    assert get_library_stats() == expected
+
+
+def test_first_write_seeds_missing_counters(client, monkeypatch):
+    from services import stats_service
+
+    member_response = client.post(
+        '/api/members',
+        data=json.dumps({'first_name': 'Seed', 'last_name': 'User',
+                         'email': f'seed{uuid.uuid4()}@example.com'}),
+        content_type='application/json'
+    )
+    member_id = json.loads(member_response.data).get('id')
+    expected = stats_service.reconcile_stats()
+    stats_service.get_counters_ref().delete()
+    monkeypatch.setattr(stats_service, '_seeded', False)
+
+    response = client.post(
+        '/api/books',
+        data=json.dumps({'title': f"Seed {uuid.uuid4()}", 'author': 'Author'}),
+        content_type='application/json'
+    )
+    book_id = json.loads(response.data).get('id')
+
+    stats = json.loads(client.get('/api/stats').data)
+    assert stats['totalBooks'] == expected['total_books'] + 1
+    assert stats['totalMembers'] == expected['total_members']
+
+    # Cleanup
+    client.delete(f'/api/books/{book_id}')
+    client.delete(f'/api/members/{member_id}')
+
+
+def test_recount_awaits_the_aggregations_together(app, monkeypatch):
+    from services import stats_service
+
+    # Each count waits for the others: they only all return if they are
+    # awaited at the same time
+    started = []
+    count_documents_async = stats_service.count_documents_async
+
+    async def concurrent_count(query):
+        started.append(query)
+        await asyncio.wait_for(_all_started(started), timeout=5)
+        return await count_documents_async(query)
+
+    monkeypatch.setattr(stats_service, 'count_documents_async',
+                        concurrent_count)
+    stats = stats_service.count_library_stats()
+    monkeypatch.undo()
+    assert stats == stats_service.count_library_stats()
+
+
+async def _all_started(started):
+    while len(started) < 5:
+        await asyncio.sleep(0.001)
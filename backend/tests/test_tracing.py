@@ -0,0 +1,111 @@
+import json
+import uuid
+
+import pytest
+
+
+@pytest.fixture
+def traced_client():
+    from app import create_app
+    from config import Config
+
+    class TracingConfig(Config):
+        TESTING = True
+        TRACING_ENABLED = True
+
+    return create_app(TracingConfig).test_client()
+
+
+def _spans(span):
+    yield span
+    for child in span['children']:
+        yield from _spans(child)
+
+
+def _find(trace, name):
+    return [span for span in _spans(trace) if span['name'] == name]
+
+
+def test_loan_trace_has_handler_service_and_storage_spans(traced_client):
+    book_id = traced_client.post('/api/books', data=json.dumps({
+        'title': f"Traced {uuid.uuid4()}", 'author': 'Author'
+    }), content_type='application/json').get_json()['id']
+    member_id = traced_client.post('/api/members', data=json.dumps({
+        'first_name': 'Trace', 'last_name': 'User',
+        'email': f'trace{uuid.uuid4()}@example.com'
+    }), content_type='application/json').get_json()['id']
+
+    trace_id = uuid.uuid4().hex
+    response = traced_client.post(
+        '/api/loans',
+        data=json.dumps({'book_id': book_id, 'member_id': member_id}),
+        content_type='application/json',
+        headers={'traceparent': f'00-{trace_id}-{"1" * 16}-01'}
+    )
+    assert response.status_code == 201
+    assert response.headers['X-Trace-Id'] == trace_id
+
+    trace = traced_client.get(f'/api/debug/traces/{trace_id}').get_json()
+    assert trace['name'] == 'POST /api/loans'
+    assert trace['attributes']['status'] == 201
+
+    handler, = trace['children']
+    assert handler['name'] == 'loans.add_loan'
+    service, = _find(handler, 'loan_service.create_new_loan')
+    # The book and the member are read concurrently
+    reads = _find(service, 'storage.get')
+    assert sorted(read['attributes']['target'] for read in reads) == [
+        f'books/{book_id}', f'members/{member_id}'
+    ]
+    assert all(read['attributes']['documents'] == 1 for read in reads)
+    commit, = _find(service, 'storage.commit')
+    assert commit['attributes']['writes']['set'] >= 1
+    assert commit['attributes']['writes']['update'] >= 1
+    assert commit['duration_ms'] >= 0
+
+    # Cleanup
+    loan_id = response.get_json()['id']
+    traced_client.put(f'/api/loans/{loan_id}/return')
+    traced_client.delete(f'/api/books/{book_id}')
+    traced_client.delete(f'/api/members/{member_id}')
+
+
+def test_traces_are_listed_newest_first(traced_client):
+    traced_client.get('/api/health')
+    response = traced_client.get(f'/api/books/{uuid.uuid4()}')
+    trace_id = response.headers['X-Trace-Id']
+    assert len(trace_id) == 32
+
+    traces = traced_client.get(
+        '/api/debug/traces?route=/api/books/<book_id>&limit=1'
+    ).get_json()
+    assert [trace['trace_id'] for trace in traces] == [trace_id]
+    get, = _find(traces[0], 'storage.get')
+    assert get['attributes']['documents'] == 0
+
+
+def test_cloud_trace_header_is_propagated(traced_client):
+    trace_id = uuid.uuid4().hex
+    response = traced_client.get('/api/health', headers={
+        'X-Cloud-Trace-Context': f'{trace_id}/1;o=1'
+    })
+    assert response.headers['X-Trace-Id'] == trace_id
+
+
+def test_traces_are_appended_to_the_file(traced_client, tmp_path,
+                                         monkeypatch):
+    from config import Config
+
+    path = tmp_path / 'traces.ndjson'
+    monkeypatch.setattr(Config, 'TRACING_FILE', str(path))
+    response = traced_client.get('/api/stats')
+
+    trace = json.loads(path.read_text().splitlines()[-1])
+    assert trace['trace_id'] == response.headers['X-Trace-Id']
+    assert _find(trace, 'stats_service.get_library_stats')
+
+
+def test_tracing_is_off_by_default(client):
+    response = client.get('/api/health')
+    assert 'X-Trace-Id' not in response.headers
+    assert client.get('/api/debug/traces').status_code == 404
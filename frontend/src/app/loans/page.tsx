@@ -3,34 +3,25 @@
 
 import { useState, useEffect } from "react";
 import { toast } from "react-toastify";
-import { Loan, Book, Member } from "@/types";
+import { Loan, LoanStatus } from "@/types";
 import { getLoans, returnLoan } from "@/lib/api/loanService";
-import { getBooks } from "@/lib/api/bookService";
-import { getMembers } from "@/lib/api/memberService";
 import LoanList from "@/components/loans/LoanList";
 import Card from "@/components/ui/Card";
 
 export default function LoansPage() {
   const [loans, setLoans] = useState<Loan[]>([]);
-  const [books, setBooks] = useState<Book[]>([]);
-  const [members, setMembers] = useState<Member[]>([]);
+  const [status, setStatus] = useState<LoanStatus | "all">("all");
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
     fetchData();
-  }, []);
+  }, [status]);
 
   const fetchData = async () => {
     try {
       setLoading(true);
-      const [loansData, booksData, membersData] = await Promise.all([
-        getLoans(),
-        getBooks(),
-        getMembers(),
-      ]);
+      const loansData = await getLoans(status === "all" ? undefined : status);
       setLoans(loansData);
-      setBooks(booksData);
-      setMembers(membersData);
     } catch (error) {
       console.error("Erreur lors de la récupération des données:", error);
       toast.error("Erreur lors du chargement des données");
@@ -44,17 +35,12 @@ export default function LoansPage() {
       try {
         const updatedLoan = await returnLoan(loanId);
 
-        // Mettre à jour la liste des emprunts
+        // Mettre à jour la liste des emprunts (en gardant livre et membre)
         setLoans(
-          loans.map((loan) => (loan.id === loanId ? updatedLoan : loan))
-        );
-
-        // Mettre à jour le statut du livre
-        setBooks(
-          books.map((book) =>
-            book.id === updatedLoan.book_id
-              ? { ...book, is_available: true }
-              : book
+          loans.map((loan) =>
+            loan.id === loanId
+              ? { ...updatedLoan, book: loan.book, member: loan.member }
+              : loan
           )
         );
 
@@ -79,8 +65,8 @@ export default function LoansPage() {
       <Card>
         <LoanList
           loans={loans}
-          books={books}
-          members={members}
+          status={status}
+          onStatusChange={setStatus}
           onReturn={handleReturn}
         />
       </Card>
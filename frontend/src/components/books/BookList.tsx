@@ -1,9 +1,10 @@
 // src/components/books/BookList.tsx
 "use client";
 
-import { useState } from "react";
+import { useEffect, useMemo, useState } from "react";
 import Link from "next/link";
 import { Book } from "@/types";
+import { searchBooks } from "@/lib/api/bookService";
 import Button from "@/components/ui/Button";
 import { TrashIcon, PencilIcon } from "@heroicons/react/24/outline";
 
@@ -14,13 +15,39 @@ interface BookListProps {
 
 export default function BookList({ books, onDelete }: BookListProps) {
   const [filterTerm, setFilterTerm] = useState("");
+  const [searchResults, setSearchResults] = useState<Book[] | null>(null);
 
-  const filteredBooks = books.filter(
-    (book) =>
-      book.title.toLowerCase().includes(filterTerm.toLowerCase()) ||
-      book.author.toLowerCase().includes(filterTerm.toLowerCase()) ||
-      (book.isbn && book.isbn.toLowerCase().includes(filterTerm.toLowerCase()))
-  );
+  // La recherche est faite par le serveur, après une courte pause de saisie
+  useEffect(() => {
+    const term = filterTerm.trim();
+    if (!term) {
+      setSearchResults(null);
+      return;
+    }
+
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      try {
+        const results = await searchBooks(term);
+        if (!cancelled) {
+          setSearchResults(results);
+        }
+      } catch (error) {
+        console.error("Erreur lors de la recherche de livres:", error);
+      }
+    }, 250);
+
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [filterTerm]);
+
+  // Masquer les résultats supprimés depuis la dernière recherche
+  const bookIds = useMemo(() => new Set(books.map((book) => book.id)), [books]);
+  const filteredBooks = searchResults
+    ? searchResults.filter((book) => bookIds.has(book.id))
+    : books;
 
   return (
     <div>
@@ -5,61 +5,47 @@ import { useState } from "react";
 import Link from "next/link";
 import { format, isAfter } from "date-fns";
 import { fr } from "date-fns/locale";
-import { Loan, Book, Member } from "@/types";
+import { Loan, LoanStatus } from "@/types";
 import Button from "@/components/ui/Button";
 import { ArrowPathIcon } from "@heroicons/react/24/outline";
 
 interface LoanListProps {
   loans: Loan[];
-  books: Book[];
-  members: Member[];
+  status: LoanStatus | "all";
+  onStatusChange: (status: LoanStatus | "all") => void;
   onReturn: (loanId: string) => void;
 }
 
 export default function LoanList({
   loans,
-  books,
-  members,
+  status,
+  onStatusChange,
   onReturn,
 }: LoanListProps) {
   const [filterTerm, setFilterTerm] = useState("");
-  const [filterStatus, setFilterStatus] = useState("all");
 
-  // Fonction pour obtenir des informations sur les livres et les membres
-  const getBookTitle = (bookId: string): string => {
-    const book = books.find((b) => b.id === bookId);
-    return book ? book.title : "Livre inconnu";
+  // Livres et membres sont intégrés aux emprunts par l'API (?expand=)
+  const getBookTitle = (loan: Loan): string => {
+    return loan.book ? loan.book.title : "Livre inconnu";
   };
 
-  const getMemberName = (memberId: string): string => {
-    const member = members.find((m) => m.id === memberId);
-    return member
-      ? `${member.first_name} ${member.last_name}`
+  const getMemberName = (loan: Loan): string => {
+    return loan.member
+      ? `${loan.member.first_name} ${loan.member.last_name}`
       : "Membre inconnu";
   };
 
-  // Filtrer les emprunts
+  // Filtrer les emprunts (le statut est filtré par le serveur)
   const filteredLoans = loans.filter((loan) => {
     // Filtre par terme de recherche (titre du livre ou nom du membre)
-    const searchMatch =
-      getBookTitle(loan.book_id)
+    return (
+      getBookTitle(loan)
         .toLowerCase()
         .includes(filterTerm.toLowerCase()) ||
-      getMemberName(loan.member_id)
+      getMemberName(loan)
         .toLowerCase()
-        .includes(filterTerm.toLowerCase());
-
-    // Filtre par statut
-    let statusMatch = true;
-    if (filterStatus === "active") {
-      statusMatch = !loan.returned;
-    } else if (filterStatus === "returned") {
-      statusMatch = loan.returned;
-    } else if (filterStatus === "overdue") {
-      statusMatch = !loan.returned && loan.is_overdue;
-    }
-
-    return searchMatch && statusMatch;
+        .includes(filterTerm.toLowerCase())
+    );
   });
 
   return (
@@ -72,8 +58,10 @@ export default function LoanList({
           <div className="flex gap-2">
             <select
               className="px-4 py-2 border border-gray-300 rounded-md focus:outline-none focus:ring-2 focus:ring-primary-500"
-              value={filterStatus}
-              onChange={(e) => setFilterStatus(e.target.value)}
+              value={status}
+              onChange={(e) =>
+                onStatusChange(e.target.value as LoanStatus | "all")
+              }
             >
               <option value="all">Tous les statuts</option>
               <option value="active">Actifs</option>
@@ -150,7 +138,7 @@ export default function LoanList({
                         href={`/books/${loan.book_id}`}
                         className="text-primary-600 hover:text-primary-900"
                       >
-                        {getBookTitle(loan.book_id)}
+                        {getBookTitle(loan)}
                       </Link>
                     </td>
                     <td className="px-6 py-4 whitespace-nowrap">
@@ -158,7 +146,7 @@ export default function LoanList({
                         href={`/members/${loan.member_id}`}
                         className="text-primary-600 hover:text-primary-900"
                       >
-                        {getMemberName(loan.member_id)}
+                        {getMemberName(loan)}
                       </Link>
                     </td>
                     <td className="px-6 py-4 whitespace-nowrap text-gray-500">
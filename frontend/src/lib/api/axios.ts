@@ -28,3 +28,22 @@ function getApiUrl() {
 
 const apiClient = axios.create({ baseURL: getApiUrl() });
 export default apiClient;
+
+// Les listes sont paginées côté serveur : on suit l'en-tête X-Next-Cursor
+export async function getAllPages<T>(
+  url: string,
+  params: Record<string, string | number> = {}
+): Promise<T[]> {
+  const items: T[] = [];
+  let cursor: string | undefined;
+
+  do {
+    const response = await apiClient.get(url, {
+      params: cursor ? { ...params, cursor } : params,
+    });
+    items.push(...response.data);
+    cursor = response.headers["x-next-cursor"];
+  } while (cursor);
+
+  return items;
+}
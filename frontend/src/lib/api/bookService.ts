@@ -1,9 +1,15 @@
 // src/lib/api/bookService.ts
 import { Book, BookFormData } from "@/types";
-import apiClient from "./axios";
+import apiClient, { getAllPages } from "./axios";
 
 export const getBooks = async (): Promise<Book[]> => {
-  const response = await apiClient.get("/books");
+  return getAllPages<Book>("/books", { limit: 1000 });
+};
+
+export const searchBooks = async (query: string): Promise<Book[]> => {
+  const response = await apiClient.get("/books/search", {
+    params: { q: query },
+  });
   return response.data;
 };
 
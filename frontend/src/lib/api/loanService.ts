@@ -1,9 +1,10 @@
-import { Loan, LoanFormData } from "@/types";
-import apiClient from "./axios";
+import { Loan, LoanFormData, LoanStatus } from "@/types";
+import apiClient, { getAllPages } from "./axios";
 
-export const getLoans = async (): Promise<Loan[]> => {
-  const response = await apiClient.get("/loans");
-  return response.data;
+export const getLoans = async (status?: LoanStatus): Promise<Loan[]> => {
+  // Les livres et membres sont joints par le serveur
+  const params = { limit: 1000, expand: "book,member" };
+  return getAllPages<Loan>("/loans", status ? { ...params, status } : params);
 };
 
 export const getLoan = async (id: string): Promise<Loan> => {
@@ -1,10 +1,9 @@
 // src/lib/api/memberService.ts
 import { Member, MemberFormData } from "@/types";
-import apiClient from "./axios";
+import apiClient, { getAllPages } from "./axios";
 
 export const getMembers = async (): Promise<Member[]> => {
-  const response = await apiClient.get("/members");
-  return response.data;
+  return getAllPages<Member>("/members", { limit: 1000 });
 };
 
 export const getMember = async (id: string): Promise<Member> => {
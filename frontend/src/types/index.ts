@@ -34,8 +34,13 @@ export interface Loan {
   return_date?: string;
   returned: boolean;
   is_overdue: boolean;
+  // Présents avec ?expand=book,member (null si le document n'existe plus)
+  book?: Pick<Book, "id" | "title" | "author"> | null;
+  member?: Pick<Member, "id" | "first_name" | "last_name"> | null;
 }
 
+export type LoanStatus = "active" | "returned" | "overdue";
+
 export interface BookFormData {
   title: string;
   author: string;
@@ -66,4 +71,5 @@ export interface Stats {
   availableBooks: number;
   totalMembers: number;
   activeLoans: number;
+  overdueLoans: number;
 }